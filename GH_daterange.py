@@ -1,52 +1,358 @@
 """
 This script calculates golden hour times for a given date range and 
-latitude. It defines golden hour as periods when the sun is between -4 
+location. It defines golden hour as periods when the sun is between -4 
 and 6 degrees elevation, producing great lighting conditions for 
-photography.
+photography. Times are shown in the location's time zone when one is 
+given, otherwise in UTC.
+
+Run without arguments it asks for one date range and location. With 
+--batch it reads any number of queries, one per line, from a file or stdin 
+("start end latitude [longitude [time zone]]", comma or space separated, 
+or a JSON object with those keys) and streams the answers to stdout as 
+text or JSON lines (--format jsonl). Queries are cut into chunks of days 
+that run on a process pool and go through the result cache, and only a 
+few chunks are in flight at once, so memory stays flat however long the 
+ranges are. Bad queries are reported on stderr and the exit code is 1.
 """
 
-from idealtrip import calculate_golden_hours
+from idealtrip import (calculate_golden_hours, golden_hours_from_segments,
+                       validate_latitude, validate_longitude, timezone_key, table_available,
+                       GOLDEN_HOUR_MIN_ELEVATION, GOLDEN_HOUR_MAX_ELEVATION)
+from boundary_solver import golden_hours_range, resolve_timezone
+from golden_hours import GoldenHours
+import instrumentation
+import result_cache
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import cpus
 from datetime import datetime, timedelta
-from typing import Dict
+from multiprocessing.pool import ThreadPool
+from typing import Iterable, Iterator, List, Mapping, NamedTuple, Optional, TextIO, Tuple
+
+DATE_FORMAT = '%Y-%m-%d'
+FORMATS = ("text", "jsonl")
+POOL_MODES = ("process", "thread", "serial")
+CHUNK_DAYS = 31  # days per pool task
+IN_FLIGHT = 4  # chunks queued per worker; bounds memory and output delay
 
-def format_golden_hours(date: datetime, times: Dict) -> str:
+def _format_period(date: datetime, start: datetime, end: datetime) -> str:
+    """'7:30 AM to 8:45 AM', marking an end after midnight '(next day)'."""
+    period = f"{start.strftime('%I:%M %p')} to {end.strftime('%I:%M %p')}"
+    if end.date() > date.date():
+        period += " (next day)"
+    return period
+
+def format_golden_hours(date: datetime, times: Mapping) -> str:
     """
     Formats golden hour times into a human-readable string.
     
     Args:
         date (datetime): The date for which golden hours were calculated
-        times (Dict): Dictionary containing morning_start, morning_end, 
-                      evening_start, and evening_end times
+        times (Mapping): A GoldenHours result, or a dictionary containing 
+                         morning_start, morning_end, evening_start and 
+                         evening_end times
     
     Returns:
         str: Formatted string containing date and golden hour periods in 
              AM/PM format. Example: 
              "2024-01-01: 7:30 AM to 8:45 AM; 4:15 PM to 5:30 PM"
+             An evening that ends after midnight is marked "(next day)".
+             Days that aren't one morning and one evening (near the 
+             poles) list every segment with its kind instead, e.g. 
+             "2024-01-01: Midday 10:02 AM to 1:58 PM"
     """
-    # Format morning golden hour if it exists
-    if times['morning_start']:
-        morning = (
-            f"{times['morning_start'].strftime('%I:%M %p')} to "
-            f"{times['morning_end'].strftime('%I:%M %p')}"
-        )
+    day = date.strftime('%Y-%m-%d')
+    if isinstance(times, GoldenHours):
+        mornings, evenings = times.of_kind("morning"), times.of_kind("evening")
+        if len(mornings) + len(evenings) < len(times.segments) or \
+                len(mornings) > 1 or len(evenings) > 1:
+            periods = "; ".join(f"{kind.capitalize()} {_format_period(date, start, end)}"
+                                for start, end, kind in times.segments)
+            return f"{day}: {periods}"
+        morning, evening = (mornings or [None])[0], (evenings or [None])[0]
     else:
-        morning = "No morning golden hour"
-    
-    # Format evening golden hour if it exists
-    if times['evening_start']:
-        evening = (
-            f"{times['evening_start'].strftime('%I:%M %p')} to "
-            f"{times['evening_end'].strftime('%I:%M %p')}"
-        )
+        morning = ((times['morning_start'], times['morning_end'])
+                   if times['morning_start'] else None)
+        evening = ((times['evening_start'], times['evening_end'])
+                   if times['evening_start'] else None)
+
+    # Format each golden hour if it exists
+    morning = _format_period(date, *morning) if morning else "No morning golden hour"
+    evening = _format_period(date, *evening) if evening else "No evening golden hour"
+    
+    return f"{day}: {morning}; {evening}"
+
+def golden_hours_for_range(start_date: datetime, end_date: datetime,
+                           latitude: float, longitude: float = 0,
+                           tz=None) -> Iterator[Tuple[datetime, GoldenHours]]:
+    """
+    Yields (date, times) for each day from start_date to end_date.
+    
+    Interpolates from the prebuilt lookup table when there is one (UTC days 
+    at longitude 0 only), which answers a whole range almost instantly. 
+    Otherwise each day's search is seeded with the previous day's boundaries 
+    (boundary_solver's golden_hours_range). With a time zone, days are local 
+    days, times are local and an evening golden hour that runs past 
+    midnight is kept whole.
+    """
+    tz = resolve_timezone(tz)
+    if table_available(longitude, tz):
+        current_date = start_date
+        while current_date <= end_date:
+            yield current_date, calculate_golden_hours(current_date, latitude, "table")
+            current_date += timedelta(days=1)
+        return
+    
+    days = golden_hours_range(start_date, end_date, latitude, longitude,
+                              GOLDEN_HOUR_MIN_ELEVATION, GOLDEN_HOUR_MAX_ELEVATION,
+                              tz=tz, whole_segments=tz is not None)
+    for date, segments in days:
+        yield date, golden_hours_from_segments(segments, date, longitude)
+
+class Query(NamedTuple):
+    """One date range and location to answer in batch mode."""
+    start: datetime
+    end: datetime
+    latitude: float
+    longitude: float = 0.0
+    tz: Optional[str] = None  # zoneinfo key, None for UTC
+
+def parse_query(line: str) -> Query:
+    """
+    Parse a batch query line.
+    
+    Args:
+        line (str): "start end latitude [longitude [tz]]" separated by 
+                    commas or spaces, dates as YYYY-MM-DD, or a JSON object 
+                    with start, end, latitude, longitude and tz keys
+    
+    Returns:
+        Query: The validated query
+    
+    Raises:
+        ValueError: If a field is missing or out of range
+    """
+    line = line.strip()
+    if line.startswith("{"):
+        fields = json.loads(line)
+        values = [fields.get(key) for key in Query._fields]
     else:
-        evening = "No evening golden hour"
+        values = line.replace(",", " ").split()
+    if len(values) < 3 or len(values) > 5:
+        raise ValueError("Expected start, end, latitude and optionally longitude and time zone")
+    values += [None] * (5 - len(values))
+    start, end, latitude, longitude, tz = values
+    try:
+        start = datetime.strptime(str(start), DATE_FORMAT)
+        end = datetime.strptime(str(end), DATE_FORMAT)
+    except ValueError:
+        raise ValueError("Dates must be YYYY-MM-DD") from None
+    if end < start:
+        raise ValueError("End date must be after start date")
+    try:
+        latitude = float(latitude)
+        longitude = float(longitude) if longitude not in (None, "") else 0.0
+    except (TypeError, ValueError):
+        raise ValueError("Latitude and longitude must be numbers") from None
+    validate_latitude(latitude)
+    validate_longitude(longitude)
+    return Query(start, end, latitude, longitude, timezone_key(tz or None))
+
+def read_queries(lines: Iterable[str]) -> Iterator[Tuple[int, object]]:
+    """
+    Yields (line number, Query or the ValueError it raised) for each query 
+    line, lazily. Blank lines, # comments and a CSV header are skipped.
+    """
+    for number, line in enumerate(lines, 1):
+        text = line.strip()
+        if not text or text.startswith("#") or text.lower().startswith("start"):
+            continue
+        try:
+            yield number, parse_query(text)
+        except ValueError as e:
+            yield number, e
+
+def cached_range(start: datetime, end: datetime, latitude: float, longitude: float = 0,
+                 tz: Optional[str] = None) -> List[Tuple[datetime, GoldenHours]]:
+    """
+    golden_hours_for_range as a list, through the result cache unless the 
+    lookup table answers it anyway.
+    """
+    if table_available(longitude, tz):
+        return list(golden_hours_for_range(start, end, latitude))
+    zone = resolve_timezone(tz)
+    params = (start.strftime(DATE_FORMAT), end.strftime(DATE_FORMAT), float(latitude),
+              float(longitude), tz)
+    return result_cache.cached(
+        "golden_hours_range", params,
+        lambda: list(golden_hours_for_range(start, end, latitude, longitude, zone)),
+        encode=lambda days: [times.to_json() for _, times in days],
+        decode=lambda value: [(times.date, times)
+                              for times in (GoldenHours.from_json(v, zone) for v in value)])
+
+def json_record(number: int, query: Query, date: datetime, times: GoldenHours) -> str:
+    """One JSON line for a day: the query's line number, location and segments."""
+    return json.dumps({
+        "query": number, "date": date.strftime(DATE_FORMAT), "latitude": query.latitude,
+        "longitude": query.longitude, "tz": query.tz,
+        "segments": [{"start": start.isoformat(), "end": end.isoformat(), "kind": kind}
+                     for start, end, kind in times.segments],
+        "total_hours": round(times.total_hours, 4),
+    })
+
+def _chunk_worker(job: tuple) -> Tuple[List[str], Optional[dict]]:
+    """
+    Output lines for one chunk of a query's days, formatted in the worker, 
+    plus the worker's instrumentation stats.
+    """
+    number, query, start, end, output_format = job
+    lines = []
+    if output_format == "text" and start == query.start:
+        lines.append(f"# {number}: {query.latitude}, {query.longitude} ({query.tz or 'UTC'})")
+    for date, times in cached_range(start, end, query.latitude, query.longitude, query.tz):
+        if output_format == "jsonl":
+            lines.append(json_record(number, query, date, times))
+        else:
+            lines.append(format_golden_hours(date, times))
+    return lines, instrumentation.collect()
+
+def _chunk_jobs(number: int, query: Query, output_format: str,
+                chunk_days: int) -> Iterator[tuple]:
+    """Cut a query into jobs of at most chunk_days days."""
+    start = query.start
+    while start <= query.end:
+        end = min(start + timedelta(days=chunk_days - 1), query.end)
+        yield number, query, start, end, output_format
+        start = end + timedelta(days=1)
+
+class _Deferred:
+    """Stands in for an AsyncResult in serial mode; runs the job on get()."""
+    def __init__(self, job: tuple):
+        self.job = job
+    def get(self):
+        return _chunk_worker(self.job)
+
+def run_batch(lines: Iterable[str], output: TextIO = sys.stdout,
+              output_format: str = "text", mode: str = "process", workers: int = None,
+              chunk_days: int = CHUNK_DAYS, errors: TextIO = sys.stderr) -> int:
+    """
+    Answer every query in lines, writing the results in query order.
     
-    return f"{date.strftime('%Y-%m-%d')}: {morning}; {evening}"
+    Queries are read by a separate thread as the pool works, so results 
+    appear while later queries are still being read (or typed), and at 
+    most IN_FLIGHT chunks per worker are queued at a time.
+    
+    Args:
+        lines: Query lines (see parse_query), e.g. an open file or stdin
+        output: Where to write the results; flushed after every chunk
+        output_format: "text" (format_golden_hours lines under a "# line: 
+                       latitude, longitude (tz)" header per query) or 
+                       "jsonl" (one JSON object per day)
+        mode: "process", "thread" or "serial"
+        workers: Pool size (default: 80% of CPUs)
+        chunk_days: Days per pool task
+        errors: Where to report queries that can't be answered
+    
+    Returns:
+        int: Number of queries that failed
+    """
+    if output_format not in FORMATS:
+        raise ValueError(f"Format must be one of {FORMATS}")
+    if mode not in POOL_MODES:
+        raise ValueError(f"Mode must be one of {POOL_MODES}")
+    if chunk_days < 1:
+        raise ValueError("chunk_days must be at least 1")
+    workers = workers or cpus.default_workers()
+    pool = None
+    if mode != "serial":
+        pool = (multiprocessing.Pool if mode == "process" else ThreadPool)(processes=workers)
+    pending = queue.Queue(maxsize=IN_FLIGHT * workers)
+
+    def feed():
+        try:
+            for number, query in read_queries(lines):
+                if isinstance(query, ValueError):
+                    pending.put((number, query))
+                    continue
+                for job in _chunk_jobs(number, query, output_format, chunk_days):
+                    pending.put((number, _Deferred(job) if pool is None
+                                 else pool.apply_async(_chunk_worker, (job,))))
+        except Exception as e:  # e.g. the input isn't text; reported like a bad query
+            pending.put((0, e))
+        finally:
+            pending.put(None)
 
-def main():
+    failed = set()
+    reader = threading.Thread(target=feed, daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = pending.get()
+            if item is None:
+                break
+            number, result = item
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                chunk, stats = result.get()
+            except (ValueError, TypeError, OSError) as e:
+                if number not in failed:
+                    errors.write(f"line {number}: {e}\n")
+                    errors.flush()
+                failed.add(number)
+                continue
+            instrumentation.merge(stats)
+            output.write("".join(line + "\n" for line in chunk))
+            output.flush()
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    return len(failed)
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    """Parse command line options; no options means the interactive prompts."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch", nargs="?", const="-", metavar="FILE",
+                        help="read queries from FILE, or stdin if no FILE or '-', "
+                             "instead of prompting")
+    parser.add_argument("--format", choices=FORMATS, default="text",
+                        help="batch output as text or JSON lines (default: text)")
+    parser.add_argument("--mode", choices=POOL_MODES, default="process",
+                        help="run batch queries on a process pool (default), a thread "
+                             "pool or serially")
+    parser.add_argument("--workers", type=int, help="pool size (default: 80%% of CPUs)")
+    parser.add_argument("--chunk-days", type=int, default=CHUNK_DAYS,
+                        help=f"days per pool task (default: {CHUNK_DAYS})")
+    return parser.parse_args(argv)
+
+def batch_main(args: argparse.Namespace) -> int:
+    """Run --batch mode and return the exit code."""
+    instrumentation.start("GH_daterange")
+    try:
+        if args.batch == "-":
+            failed = run_batch(sys.stdin, sys.stdout, args.format, args.mode, args.workers,
+                               args.chunk_days)
+        else:
+            with open(args.batch, encoding="utf-8") as file:
+                failed = run_batch(file, sys.stdout, args.format, args.mode, args.workers,
+                                   args.chunk_days)
+    except BrokenPipeError:
+        # output closed early (e.g. piped into head); keep the exit quiet
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    return 1 if failed else 0
+
+def interactive():
     """
-    Main program execution:
-    1. Prompts user for date range and latitude
+    Interactive program execution:
+    1. Prompts user for date range and location
     2. Validates input
     3. Calculates and displays golden hours for each day in range
     """
@@ -79,19 +385,49 @@ def main():
             continue
         break
 
+    # Longitude and time zone are optional; blank means 0 and UTC
+    while True:
+        answer = input("Enter longitude in degrees, east positive (blank for 0): ").strip()
+        longitude = float(answer) if answer else 0.0
+        if not -180 <= longitude <= 180:
+            print("Longitude must be between -180 and 180 degrees\n")
+            continue
+        break
+
+    while True:
+        answer = input("Enter time zone, e.g. Europe/Oslo (blank for UTC): ").strip()
+        try:
+            tz = resolve_timezone(answer or None)
+        except ValueError as e:
+            print(f"{e}\n")
+            continue
+        break
+
     print("\n" + "=" * 54 + "\n")
-    print("Here are your golden hour times:\n")
+    print(f"Here are your golden hour times ({tz.key if tz else 'UTC'}):\n")
     
     # Calculate and display golden hours for each day in range
-    current_date = start_date
-    while current_date <= end_date:
-        times = calculate_golden_hours(current_date, latitude)
-        print(format_golden_hours(current_date, times))
-        current_date += timedelta(days=1)
+    # (instrumented runs time this part, not the prompts above)
+    instrumentation.start("GH_daterange")
+    with instrumentation.stage("GH_daterange.range"):
+        for date, times in golden_hours_for_range(start_date, end_date, latitude,
+                                                  longitude, tz):
+            with instrumentation.stage("GH_daterange.print"):
+                print(format_golden_hours(date, times))
     
     print("\n" + "=" * 54 + "\n")
     
     input("\nPress Enter to exit...")
 
+def main(argv: list = None) -> int:
+    """Prompt for one query, or with --batch answer many without prompting."""
+    args = parse_args(argv)
+    if args.batch is None:
+        interactive()
+        return 0
+    return batch_main(args)
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    multiprocessing.freeze_support()  # pool workers of the PyInstaller executable
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
\ No newline at end of file
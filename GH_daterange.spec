@@ -6,11 +6,11 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    hiddenimports=['tzdata'],  # zoneinfo's time zone database on Windows
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['psutil', 'pyarrow', 'networkx', 'osmnx', 'folium', 'geopy', 'dotenv', 'requests'],  # never used by GH_daterange
     noarchive=False,
     optimize=0,
 )
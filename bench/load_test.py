@@ -0,0 +1,191 @@
+"""
+Load test for query_service on localhost.
+
+Starts the service in a subprocess (or uses one that is already running with
+--port), keeps --concurrency keep-alive connections busy until --requests
+have been answered, and reports the throughput and latency percentiles. The
+results are written to bench/results/ as JSON, like bench.run's.
+
+The queries are a fixed mix a planning tool might send: mostly golden hour
+times for a few weeks of dates over a grid of latitudes, some sunrise
+azimuth questions and a few full-year durations. Only --distinct of them are
+different, so the run measures the batching and in-memory cache as well as
+the calculations; raise --distinct to measure the calculations alone.
+
+Usage (from the repository root):
+    python -m bench.load_test
+    python -m bench.load_test --requests 5000 --concurrency 64 --mode thread
+    python -m bench.load_test --port 8765        # against a running service
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+if __package__ in (None, ""):  # run as python bench/load_test.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.run import RESULTS_DIR, write_json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST = "127.0.0.1"
+REQUESTS = 2000
+CONCURRENCY = 32
+DISTINCT = 500  # different queries in the mix
+SEED = 2023
+STARTUP_TIMEOUT = 60  # seconds to wait for the service to listen
+
+
+def make_queries(count: int = REQUESTS, distinct: int = DISTINCT,
+                 seed: int = SEED) -> List[str]:
+    """count request targets drawn from `distinct` different queries."""
+    rng = random.Random(seed)
+    pool = []
+    for i in range(distinct):
+        latitude = round(rng.uniform(30, 75), 1)
+        if i % 20 == 19:
+            pool.append(f"/durations?latitude={latitude}&year=2024")
+        elif i % 5 == 4:
+            longitude = round(rng.uniform(-20, 30), 1)
+            event = rng.choice(("rise", "set"))
+            pool.append(f"/azimuth?latitude={latitude}&longitude={longitude}"
+                        f"&event={event}&year=2024")
+        else:
+            day = date(2024, 6, 1) + timedelta(days=rng.randrange(42))
+            pool.append(f"/golden_hours?date={day.isoformat()}&latitude={latitude}")
+    return [rng.choice(pool) for _ in range(count)]
+
+
+async def fetch(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                target: str) -> Tuple[int, bytes]:
+    """Send one GET on an open keep-alive connection and read the reply."""
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: {HOST}\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def _client(host: str, port: int, targets: List[str], next_index: List[int],
+                  latencies: List[float], statuses: Dict[int, int]) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while next_index[0] < len(targets):
+            target = targets[next_index[0]]
+            next_index[0] += 1
+            start = time.perf_counter()
+            status, _ = await fetch(reader, writer, target)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run_load(host: str, port: int, targets: List[str],
+                   concurrency: int = CONCURRENCY) -> Dict:
+    """
+    Send every target over `concurrency` connections.
+
+    Returns:
+        dict: request count, wall seconds, requests per second, latency
+              percentiles in milliseconds and the count of each status
+    """
+    latencies, statuses = [], {}
+    next_index = [0]  # shared by the clients, so each target is sent once
+    start = time.perf_counter()
+    await asyncio.gather(*[_client(host, port, targets, next_index, latencies, statuses)
+                           for _ in range(concurrency)])
+    seconds = time.perf_counter() - start
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {"requests": len(latencies), "concurrency": concurrency, "seconds": seconds,
+            "per_second": len(latencies) / seconds,
+            "p50_ms": cuts[49] * 1000, "p90_ms": cuts[89] * 1000, "p99_ms": cuts[98] * 1000,
+            "statuses": {str(status): count for status, count in sorted(statuses.items())}}
+
+
+def start_service(mode: str = "process", workers: Optional[int] = None,
+                  extra: List[str] = ()) -> Tuple[subprocess.Popen, int]:
+    """Start query_service on a free port; returns the process and the port."""
+    command = [sys.executable, os.path.join(ROOT, "query_service.py"), "--port", "0",
+               "--mode", mode, *extra]
+    if workers:
+        command += ["--workers", str(workers)]
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    line = ""
+    while time.monotonic() < deadline:
+        line = process.stdout.readline()
+        if line.startswith("Serving on") or not line:
+            break
+    if not line.startswith("Serving on"):
+        process.kill()
+        raise RuntimeError("query_service didn't start")
+    port = int(line.split()[2].rsplit(":", 1)[1])
+    return process, port
+
+
+def stop_service(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def format_result(result: Dict) -> str:
+    return (f"{result['requests']} requests in {result['seconds']:.2f} s "
+            f"({result['per_second']:.0f}/s) over {result['concurrency']} connections; "
+            f"latency p50 {result['p50_ms']:.1f} ms, p90 {result['p90_ms']:.1f} ms, "
+            f"p99 {result['p99_ms']:.1f} ms; statuses {result['statuses']}")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test query_service on localhost.")
+    parser.add_argument("--port", type=int,
+                        help="port of a running service (default: start one)")
+    parser.add_argument("--mode", default="process", choices=("process", "thread", "serial"),
+                        help="pool mode of the service started (default: process)")
+    parser.add_argument("--workers", type=int, help="pool size of the service started")
+    parser.add_argument("--requests", type=int, default=REQUESTS,
+                        help=f"requests to send (default: {REQUESTS})")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help=f"open connections (default: {CONCURRENCY})")
+    parser.add_argument("--distinct", type=int, default=DISTINCT,
+                        help=f"different queries in the mix (default: {DISTINCT})")
+    parser.add_argument("--output", help="results file (default: bench/results/<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    targets = make_queries(args.requests, args.distinct)
+    process, port = (None, args.port) if args.port else start_service(args.mode, args.workers)
+    try:
+        result = asyncio.run(run_load(HOST, port, targets, args.concurrency))
+    finally:
+        if process is not None:
+            stop_service(process)
+    result.update(mode=args.mode if process else None, distinct=args.distinct)
+    print(format_result(result))
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"load_{time.strftime('%Y%m%d%H%M%S')}.json")
+    write_json({"load_test": result}, output)
+    print(f"Results written to {output}")
+    return 0 if set(result["statuses"]) == {"200"} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Benchmarks for the hot paths, with regression tracking.
+
+Each benchmark times one call on a fixed, representative input (with the
+persistent result cache turned off, so the calculation itself is measured).
+The call is repeated REPEAT times and the median and minimum are recorded.
+
+Results are written as JSON. When a baseline exists (bench/baseline.json by
+default), every benchmark's median is compared with it and the run fails
+(exit code 1) if any of them got more than THRESHOLD slower. No baseline is
+committed, since timings only compare on one machine; without one the run
+says that the comparison was skipped, and --require-baseline makes that an
+error (exit code 2) for scripts that expect a comparison.
+
+Usage (from the repository root):
+    python -m bench.run                      # run, compare with the baseline
+    python -m bench.run --save-baseline      # run and store a new baseline
+    python -m bench.run --require-baseline   # fail if there is nothing to compare with
+    python -m bench.run --only twilight_hours_day calculate_golden_hours
+
+Baselines are only comparable on the machine that recorded them.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+if __package__ in (None, ""):  # run as python bench/run.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+REPEAT = 5
+THRESHOLD = 0.25  # fraction slower than the baseline median that counts as a regression
+
+
+def bench_twilight_hours_day() -> Callable[[], object]:
+    from main import twilight_hours_day
+    date = datetime(2023, 6, 21)
+    return lambda: [twilight_hours_day(latitude, date) for latitude in (0, 45, 66.5, 80)]
+
+
+def bench_twilight_hours_year() -> Callable[[], object]:
+    from main import twilight_hours_year
+    return lambda: twilight_hours_year(59.91)
+
+
+def bench_twilight_hours_year_numpy() -> Callable[[], object]:
+    from main import twilight_hours_year
+    return lambda: twilight_hours_year(59.91, engine="numpy")
+
+
+def bench_calculate_golden_hours() -> Callable[[], object]:
+    from idealtrip import calculate_golden_hours
+    dates = [datetime(2023, 5, 11 + day) for day in range(10)]
+    return lambda: [calculate_golden_hours(date, 65.46) for date in dates]
+
+
+def bench_golden_hours_range() -> Callable[[], object]:
+    from boundary_solver import golden_hours_range
+    return lambda: list(golden_hours_range(datetime(2023, 1, 1), datetime(2023, 3, 31), 69.49))
+
+
+def bench_find_due_east_sunrises() -> Callable[[], object]:
+    from astral import LocationInfo
+    from east_west_rise_set import find_due_east_sunrises
+    location = LocationInfo("Oslo", "Norway", "Europe/Oslo", 59.91, 10.75)
+    return lambda: find_due_east_sunrises(location, year=2023)
+
+
+def bench_split_route() -> Callable[[], object]:
+    from routing import split_sections
+    route = [[59.91 + i * 1e-4, 10.75 + i * 1e-4] for i in range(20_000)]
+    times = [1.8 * i for i in range(20_000)]
+    return lambda: split_sections(route, times, 12)
+
+
+def bench_optimize_itinerary() -> Callable[[], object]:
+    from itinerary import optimize_itinerary
+    # a drive north through Norway, 40 hours at a steady pace; several
+    # hundred candidate stops over a four-week window
+    route = [[58.0 + 13.0 * i / 400, 8.0 + 12.0 * i / 400] for i in range(401)]
+    times = [40 * 3600 * i / 400 for i in range(401)]
+    return lambda: optimize_itinerary(route, datetime(2023, 5, 1), datetime(2023, 5, 28),
+                                      times=times, num_days=7, max_drive_hours=7, spacing=400)
+
+
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {
+    "twilight_hours_day": bench_twilight_hours_day,
+    "twilight_hours_year": bench_twilight_hours_year,
+    "twilight_hours_year_numpy": bench_twilight_hours_year_numpy,
+    "calculate_golden_hours": bench_calculate_golden_hours,
+    "golden_hours_range": bench_golden_hours_range,
+    "find_due_east_sunrises": bench_find_due_east_sunrises,
+    "split_route": bench_split_route,
+    "optimize_itinerary": bench_optimize_itinerary,
+}
+
+
+def time_benchmark(setup: Callable[[], Callable[[], object]], repeat: int = REPEAT) -> Dict:
+    """
+    Time one benchmark.
+
+    The setup runs once (imports and input construction are not timed),
+    then the call is made once to warm up and repeat times under the clock.
+
+    Returns:
+        dict: median and min seconds plus the repeat count, or a
+              "skipped" reason if a dependency is missing
+    """
+    try:
+        call = setup()
+    except ImportError as e:
+        return {"skipped": f"missing dependency: {e.name}"}
+    call()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+    return {"median": statistics.median(times), "min": min(times), "repeat": repeat}
+
+
+def run(names: Optional[List[str]] = None, repeat: int = REPEAT) -> Dict:
+    """Run the named benchmarks (all by default) and return the results document."""
+    names = names or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmark(s): {', '.join(unknown)}")
+    results = {}
+    # measure the calculations, not the result cache
+    previous = os.environ.get("GOLDENHOUR_CACHE")
+    os.environ["GOLDENHOUR_CACHE"] = "0"
+    try:
+        for name in names:
+            results[name] = time_benchmark(BENCHMARKS[name], repeat)
+            print(format_result(name, results[name]), flush=True)
+    finally:
+        if previous is None:
+            del os.environ["GOLDENHOUR_CACHE"]
+        else:
+            os.environ["GOLDENHOUR_CACHE"] = previous
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.node(),
+        },
+        "benchmarks": results,
+    }
+
+
+def format_result(name: str, result: Dict) -> str:
+    if "skipped" in result:
+        return f"{name:28} skipped ({result['skipped']})"
+    return (f"{name:28} median {result['median'] * 1000:9.2f} ms   "
+            f"min {result['min'] * 1000:9.2f} ms")
+
+
+def compare(results: Dict, baseline: Dict, threshold: float = THRESHOLD) -> List[str]:
+    """
+    Compare a run with a baseline.
+
+    Returns:
+        list: One message per benchmark whose median is more than threshold
+              slower than the baseline's; benchmarks missing from either side
+              are ignored
+    """
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        reference = baseline.get("benchmarks", {}).get(name)
+        if not reference or "median" not in reference or "median" not in result:
+            continue
+        ratio = result["median"] / reference["median"]
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}: {result['median'] * 1000:.2f} ms vs baseline "
+                               f"{reference['median'] * 1000:.2f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def write_json(document: Dict, path: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(document, file, indent=2)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the golden hour hot paths.")
+    parser.add_argument("--only", nargs="+", metavar="NAME", choices=list(BENCHMARKS),
+                        help="benchmarks to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=REPEAT,
+                        help=f"timed calls per benchmark (default: {REPEAT})")
+    parser.add_argument("--output", help="results file (default: bench/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=BASELINE_PATH,
+                        help="baseline to compare with (default: bench/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store this run as the baseline instead of comparing")
+    parser.add_argument("--require-baseline", action="store_true",
+                        help="exit with an error if there is no baseline to compare with")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help=f"allowed slowdown as a fraction (default: {THRESHOLD})")
+    args = parser.parse_args(argv)
+
+    results = run(args.only, args.repeat)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"bench_{datetime.now().strftime('%Y%m%d%H%M%S')}.json")
+    write_json(results, output)
+    print(f"Results written to {output}")
+
+    if args.save_baseline:
+        write_json(results, args.baseline)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline found at {args.baseline}; comparison SKIPPED. "
+              "Store one with --save-baseline.")
+        return 2 if args.require_baseline else 0
+
+    with open(args.baseline) as file:
+        regressions = compare(results, json.load(file), args.threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
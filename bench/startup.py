@@ -0,0 +1,119 @@
+"""
+Startup-time budgets for the entry points.
+
+Every run of a script pays for its imports before it does anything, so each
+entry point has a budget for its import time, measured with
+python -X importtime (the cumulative time on the module's own line, best of
+REPEAT fresh interpreters). Budgets are a few times what the entry points
+take on a typical machine, so they catch a heavy import creeping back in
+rather than small changes; timings depend on the machine, so only this
+script checks them.
+
+Which modules an import loads doesn't depend on the machine, and
+tests/test_startup.py checks that with eager_imports(): no entry point may
+import the optional dependencies in DEFERRED at startup, and the entry
+points in NUMPY_FREE may not import NumPy. GH_daterange and idealtrip only
+load it for the lookup table or the numpy engine; the other entry points
+compute with NumPy on every run, so they import it at the top.
+
+Usage (from the repository root):
+    python -m bench.startup                    # report; exit 1 over budget
+    python -m bench.startup --only GH_daterange main
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPEAT = 3
+BUDGETS_MS: Dict[str, float] = {
+    "GH_daterange": 300,
+    "idealtrip": 300,
+    "lookup_table": 350,
+    "east_west_rise_set": 400,
+    "trip_split": 400,
+    "main": 450,
+    "query_service": 550,
+}
+DEFERRED = ("psutil", "pyarrow", "networkx", "osmnx", "folium", "geopy", "dotenv", "requests")
+NUMPY_FREE = ("GH_daterange", "idealtrip")
+
+
+def _run(code: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    return subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+def loaded_modules(module: str, then: str = "") -> Set[str]:
+    """Names of the modules loaded in a fresh interpreter by importing
+    `module` and then running the statement `then`."""
+    result = _run(f"import sys, {module}\n{then}\nprint(' '.join(sys.modules))")
+    return set(result.stdout.split())
+
+
+def eager_imports(module: str, then: str = "") -> List[str]:
+    """The modules from DEFERRED (and NumPy for NUMPY_FREE) that importing
+    `module` and running `then` loaded."""
+    forbidden = DEFERRED + (("numpy",) if module in NUMPY_FREE else ())
+    loaded = loaded_modules(module, then)
+    return sorted(name for name in forbidden if name in loaded)
+
+
+def import_time(module: str, repeat: int = REPEAT) -> float:
+    """Best cumulative import time of a module in fresh interpreters, in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        for line in _run(f"import {module}", importtime=True).stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) == 3 and parts[2].strip() == module:
+                times.append(int(parts[1]) / 1000)
+    return min(times)
+
+
+def check(names: Optional[List[str]] = None, repeat: int = REPEAT) -> Tuple[Dict, List[str]]:
+    """
+    Measure the named entry points (all by default) against their budgets.
+
+    Returns:
+        tuple: {name: {"ms", "budget_ms", "eager"}} with eager listing the
+               deferred modules that were imported anyway, and one message
+               per problem found
+    """
+    names = names or list(BUDGETS_MS)
+    unknown = [name for name in names if name not in BUDGETS_MS]
+    if unknown:
+        raise ValueError(f"Unknown entry point(s): {', '.join(unknown)}")
+    results, problems = {}, []
+    for name in names:
+        milliseconds, eager = import_time(name, repeat), eager_imports(name)
+        results[name] = {"ms": milliseconds, "budget_ms": BUDGETS_MS[name], "eager": eager}
+        if milliseconds > BUDGETS_MS[name]:
+            problems.append(f"{name}: imports in {milliseconds:.0f} ms, "
+                            f"budget {BUDGETS_MS[name]:.0f} ms")
+        if eager:
+            problems.append(f"{name}: imports {', '.join(eager)} at startup")
+    return results, problems
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check the entry points' import times.")
+    parser.add_argument("--only", nargs="+", metavar="NAME", choices=list(BUDGETS_MS),
+                        help="entry points to check (default: all)")
+    parser.add_argument("--repeat", type=int, default=REPEAT,
+                        help=f"fresh imports per entry point (default: {REPEAT})")
+    args = parser.parse_args(argv)
+
+    results, problems = check(args.only, args.repeat)
+    for name, result in results.items():
+        eager = f"   eager: {', '.join(result['eager'])}" if result["eager"] else ""
+        print(f"{name:20} {result['ms']:7.1f} ms   budget {result['budget_ms']:5.0f} ms{eager}")
+    for message in problems:
+        print(f"OVER BUDGET {message}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
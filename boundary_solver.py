@@ -0,0 +1,482 @@
+"""
+Find the times when the sun enters and leaves the golden hour band.
+
+Rather than sampling the sun's elevation every PRECISION minutes across the
+whole day, the day is cut into short monotonic pieces (an hourly grid plus
+solar noon and solar midnight, where the elevation curve turns around). Any
+piece whose end points straddle the -4 or +6 degree threshold holds a
+crossing, which is then refined by false position to within TOLERANCE. A typical
+day costs a few dozen elevation evaluations instead of 1,440 (1 minute scan)
+or 14,400 (0.1 minute scan).
+
+Days without any crossing (polar day and polar night) and days with more than
+two golden hour segments (near the poles, around the equinoxes) fall out of
+the same bookkeeping.
+
+Accuracy: every boundary is within TOLERANCE of the true crossing, so results
+match a brute-force scan with a step of N minutes to within N minutes (plus
+TOLERANCE) per boundary. The only crossings that can be missed are pairs
+closer together than one grid step near a turning point of the elevation
+curve, which only happens within a degree or so of the poles.
+
+Days are UTC days by default (naive datetimes, as in astral). Given a time
+zone (a zoneinfo key such as "Europe/Oslo", or any tzinfo), each day is the
+local calendar day instead, 23 or 25 hours long on DST changes, and times
+come back as aware local datetimes. With whole_segments, a segment still in
+progress at the end of the day is followed to its real end and reported on
+the day it started, instead of being cut at midnight and reported again the
+next day. The extra search only runs on days that end inside the band.
+"""
+
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from astral import Observer
+from astral.sun import elevation, noon, midnight
+import instrumentation
+
+MIN_ELEVATION = -4  # degrees
+MAX_ELEVATION = 6  # degrees
+GRID_STEP = timedelta(hours=1)
+TOLERANCE = timedelta(seconds=1)
+SEED_WINDOW = timedelta(minutes=2)  # search window around a predicted crossing
+FALSE_POSITION_STEPS = 8  # before _refine gives up and bisects
+CROSS_DAY_SPAN = timedelta(hours=12)  # how far whole_segments follows a segment past midnight
+
+Segment = Tuple[datetime, datetime]
+TimeZone = Union[str, tzinfo, None]
+
+# every elevation call counts towards the "elevation" counter when
+# instrumentation is on
+elevation = instrumentation.counted("elevation", elevation)
+
+
+def _turning_points(observer: Observer, start: datetime, end: datetime) -> List[datetime]:
+    """
+    Return solar noon and solar midnight times that fall inside [start, end].
+
+    The elevation curve is monotonic between these points, which is what
+    makes bracketing on a coarse grid safe. astral's noon for a date falls
+    on that UTC date and its midnight up to a day earlier, so a window that
+    spans UTC dates first..last needs noon for each of them and midnight for
+    each of them plus the next (three calls for a UTC day).
+    """
+    points = []
+    first, last = start.date(), end.date()
+    days = [first + timedelta(days=n) for n in range((last - first).days + 1)]
+    candidates = [noon(observer, day) for day in days]
+    candidates += [midnight(observer, day) for day in days + [last + timedelta(days=1)]]
+    for candidate in sorted(candidates):
+        candidate = candidate.replace(tzinfo=None)
+        if start < candidate < end:
+            points.append(candidate)
+    return points
+
+
+def resolve_timezone(tz: TimeZone) -> Optional[tzinfo]:
+    """
+    Turn a zoneinfo key (e.g. "America/Anchorage") or tzinfo into a tzinfo.
+
+    Raises:
+        ValueError: If the key isn't a known time zone
+    """
+    if tz is None or isinstance(tz, tzinfo):
+        return tz
+    try:
+        return ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError) as e:
+        raise ValueError(f"Unknown time zone: {tz}") from e
+
+
+def day_window(date: datetime, tz: TimeZone = None) -> Tuple[datetime, datetime]:
+    """
+    First and last instant of a day as naive UTC datetimes (what astral expects).
+
+    Without a time zone the day is the UTC day 00:00 to 23:59:59.999999;
+    with one it is the local calendar day, which can be 23 or 25 hours long.
+    """
+    tz = resolve_timezone(tz)
+    if tz is None:
+        return (datetime.combine(date, datetime.min.time()),
+                datetime.combine(date, datetime.max.time()))
+    local_start = datetime.combine(date, datetime.min.time(), tzinfo=tz)
+    next_start = datetime.combine(date + timedelta(days=1), datetime.min.time(), tzinfo=tz)
+    to_utc = lambda t: t.astimezone(timezone.utc).replace(tzinfo=None)
+    return to_utc(local_start), to_utc(next_start) - timedelta(microseconds=1)
+
+
+def to_local(segments: List[Segment], tz: Optional[tzinfo]) -> List[Segment]:
+    """Convert naive UTC segments to aware datetimes in tz (unchanged if tz is None)."""
+    if tz is None:
+        return segments
+    convert = lambda t: t.replace(tzinfo=timezone.utc).astimezone(tz)
+    return [(convert(start), convert(end)) for start, end in segments]
+
+
+def _bisect(observer: Observer, threshold: float, low: datetime, high: datetime,
+            low_elevation: float, tolerance: timedelta) -> datetime:
+    """
+    Refine a threshold crossing bracketed by [low, high].
+
+    Returns the earliest time (within tolerance) at which the sun is on the
+    far side of the threshold from where it was at `low`.
+    """
+    low_above = low_elevation >= threshold
+    while high - low > tolerance:
+        middle = low + (high - low) / 2
+        if (elevation(observer, middle) >= threshold) == low_above:
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+def _interpolate(observer: Observer, threshold: float, low: datetime, high: datetime,
+                 low_elevation: float, high_elevation: float,
+                 tolerance: timedelta) -> datetime:
+    """
+    Refine a crossing in a short bracket by linear interpolation.
+
+    Over a few minutes the elevation is very nearly linear in time, so the
+    interpolated guess is checked with a bracket one tolerance wide around
+    it; only if that misses does it fall back to bisection. Same result
+    convention as _bisect.
+    """
+    fraction = (threshold - low_elevation) / (high_elevation - low_elevation)
+    guess = low + (high - low) * fraction
+    before = max(low, guess - tolerance / 2)
+    after = min(high, guess + tolerance / 2)
+    low_above = low_elevation >= threshold
+    before_elevation = elevation(observer, before)
+    if (before_elevation >= threshold) != low_above:
+        return _bisect(observer, threshold, low, before, low_elevation, tolerance)
+    after_elevation = elevation(observer, after)
+    if (after_elevation >= threshold) == low_above:
+        return _bisect(observer, threshold, after, high, after_elevation, tolerance)
+    return after
+
+
+def _refine(observer: Observer, threshold: float, low: datetime, high: datetime,
+            low_elevation: float, high_elevation: float, tolerance: timedelta) -> datetime:
+    """
+    Refine a crossing bracketed by a grid step, by false position.
+
+    Elevation is smooth over a grid step, so interpolating between the ends
+    of the bracket closes in far faster than halving it. The Illinois rule
+    (halving the offset of an end that is kept twice in a row) stops one end
+    from sticking. Once the bracket is within SEED_WINDOW, _interpolate
+    finishes it; a bracket that won't shrink is bisected. Same result
+    convention as _bisect.
+    """
+    low_offset, high_offset = low_elevation - threshold, high_elevation - threshold
+    low_above = low_offset >= 0
+    kept = 0  # +1 when low was kept last, -1 when high was
+    for _ in range(FALSE_POSITION_STEPS):
+        if high - low <= SEED_WINDOW:
+            return _interpolate(observer, threshold, low, high, low_elevation,
+                                high_elevation, tolerance)
+        guess = low + (high - low) * (low_offset / (low_offset - high_offset))
+        guess_elevation = elevation(observer, guess)
+        if (guess_elevation >= threshold) == low_above:
+            low, low_elevation, low_offset = guess, guess_elevation, guess_elevation - threshold
+            if kept == -1:
+                high_offset /= 2
+            kept = -1
+        else:
+            high, high_elevation, high_offset = guess, guess_elevation, guess_elevation - threshold
+            if kept == 1:
+                low_offset /= 2
+            kept = 1
+    return _bisect(observer, threshold, low, high, low_elevation, tolerance)
+
+
+def find_crossings(observer: Observer, start: datetime, end: datetime,
+                   thresholds: Tuple[float, ...] = (MIN_ELEVATION, MAX_ELEVATION),
+                   tolerance: timedelta = TOLERANCE) -> List[Tuple[datetime, float, bool]]:
+    """
+    Find every time in [start, end] when the sun crosses one of the thresholds.
+
+    Args:
+        observer: Astral observer (latitude, longitude, elevation)
+        start: Beginning of the search window
+        end: End of the search window
+        thresholds: Elevations in degrees to look for
+        tolerance: Maximum error of each returned crossing time
+
+    Returns:
+        list: (time, threshold, rising) tuples sorted by time, where rising is
+              True when the sun is climbing through the threshold
+    """
+    grid = [start]
+    current = start + GRID_STEP
+    while current < end:
+        grid.append(current)
+        current += GRID_STEP
+    grid.append(end)
+    grid = sorted(grid + _turning_points(observer, start, end))
+
+    elevations = [elevation(observer, t) for t in grid]
+    crossings = []
+    for i in range(len(grid) - 1):
+        low_elev, high_elev = elevations[i], elevations[i + 1]
+        for threshold in thresholds:
+            if (low_elev >= threshold) != (high_elev >= threshold):
+                time = _refine(observer, threshold, grid[i], grid[i + 1],
+                               low_elev, high_elev, tolerance)
+                crossings.append((time, threshold, high_elev > low_elev))
+    crossings.sort(key=lambda crossing: crossing[0])
+    return crossings
+
+
+def _assemble_segments(start_time: datetime, end_time: datetime, in_range: bool,
+                       crossings: List[Tuple[datetime, float, bool]],
+                       min_elevation: float) -> List[Segment]:
+    """Turn the day's crossings into (start, end) segments inside the band."""
+    segment_start = start_time if in_range else None
+    segments = []
+    for time, threshold, rising in crossings:
+        # Rising through the lower edge or setting through the upper edge
+        # enters the band; the other two directions leave it
+        entering = rising == (threshold == min_elevation)
+        if entering and not in_range:
+            segment_start = time
+            in_range = True
+        elif not entering and in_range:
+            segments.append((segment_start, time))
+            in_range = False
+
+    if in_range:
+        segments.append((segment_start, end_time))
+    return segments
+
+
+def _whole_segments(observer: Observer, start_time: datetime, end_time: datetime,
+                    segments: List[Segment], thresholds: Tuple[float, float],
+                    tolerance: timedelta) -> List[Segment]:
+    """
+    Give each segment to the day it starts on.
+
+    A segment cut off at the end of the day is followed (up to
+    CROSS_DAY_SPAN) to where it really ends. A segment already in progress
+    at the start of the day belongs to the previous day, which follows it
+    the same way, so it is dropped here (or, in the rare case that it lasts
+    longer than CROSS_DAY_SPAN, only the part the previous day didn't
+    report is kept).
+    """
+    segments = list(segments)
+    if segments and segments[0][0] == start_time and segments[0][1] != end_time:
+        owned_until = start_time + CROSS_DAY_SPAN
+        if segments[0][1] <= owned_until:
+            segments.pop(0)
+        else:
+            segments[0] = (owned_until, segments[0][1])
+    if segments and segments[-1][1] == end_time:
+        limit = end_time + CROSS_DAY_SPAN
+        crossings = find_crossings(observer, end_time, limit, thresholds, tolerance)
+        following = _assemble_segments(end_time, limit, True, crossings, thresholds[0])
+        segments[-1] = (segments[-1][0], following[0][1])
+    return segments
+
+
+def golden_hour_segments(observer: Observer, date: datetime,
+                         min_elevation: float = MIN_ELEVATION,
+                         max_elevation: float = MAX_ELEVATION,
+                         tolerance: timedelta = TOLERANCE, tz: TimeZone = None,
+                         whole_segments: bool = False) -> List[Segment]:
+    """
+    Calculate the golden hour segments for a single day.
+
+    The day runs from 00:00 to 23:59:59.999999 (naive times are UTC, as in
+    astral). A segment that is already in progress at midnight starts at
+    00:00, and one still in progress at the end of the day ends at
+    23:59:59.999999.
+
+    Args:
+        observer: Astral observer (latitude, longitude, elevation)
+        date: Date to calculate golden hour for
+        min_elevation: Lower edge of the band in degrees
+        max_elevation: Upper edge of the band in degrees
+        tolerance: Maximum error of each boundary time
+        tz: Time zone whose local day to use; times are then aware local
+            datetimes
+        whole_segments: Report segments that cross midnight whole, on the
+                        day they start
+
+    Returns:
+        list: (start, end) datetime tuples in chronological order
+    """
+    return band_segments(observer, date, [(min_elevation, max_elevation)], tolerance, tz,
+                         whole_segments)[0]
+
+
+def band_segments(observer: Observer, date: datetime,
+                  bands: Sequence[Tuple[float, float]], tolerance: timedelta = TOLERANCE,
+                  tz: TimeZone = None, whole_segments: bool = False) -> List[List[Segment]]:
+    """
+    Segments of several elevation bands for a single day, from one search.
+
+    The edges of every band are bracketed on the same grid of elevation
+    samples, so each extra band only adds the refinement of its own
+    crossings (bands that share an edge, such as blue hour and golden hour
+    at -4 degrees, share that too). Conventions are those of
+    golden_hour_segments.
+
+    Args:
+        observer: Astral observer (latitude, longitude, elevation)
+        date: Date to calculate the bands for
+        bands: (min_elevation, max_elevation) of each band in degrees
+        tolerance: Maximum error of each boundary time
+        tz: Time zone whose local day to use
+        whole_segments: Report segments that cross midnight whole
+
+    Returns:
+        list: For each band, in order, its (start, end) segments
+    """
+    instrumentation.count("days")
+    tz = resolve_timezone(tz)
+    start_time, end_time = day_window(date, tz)
+    thresholds = tuple(sorted({edge for band in bands for edge in band}))
+
+    start_elevation = elevation(observer, start_time)
+    crossings = find_crossings(observer, start_time, end_time, thresholds, tolerance)
+    result = []
+    for min_elevation, max_elevation in bands:
+        own = [crossing for crossing in crossings
+               if crossing[1] == min_elevation or crossing[1] == max_elevation]
+        in_range = min_elevation <= start_elevation <= max_elevation
+        segments = _assemble_segments(start_time, end_time, in_range, own, min_elevation)
+        if whole_segments:
+            segments = _whole_segments(observer, start_time, end_time, segments,
+                                       (min_elevation, max_elevation), tolerance)
+        result.append(to_local(segments, tz))
+    return result
+
+
+def _band(elev: float, thresholds: Tuple[float, ...]) -> int:
+    """Number of thresholds at or below the elevation."""
+    return sum(elev >= threshold for threshold in thresholds)
+
+
+def _track_crossings(observer: Observer, start_time: datetime, end_time: datetime,
+                     previous: list, before: Optional[list],
+                     thresholds: Tuple[float, ...], tolerance: timedelta,
+                     window: timedelta):
+    """
+    Find the day's crossings near where yesterday's crossings predict them.
+
+    Each of yesterday's crossings is moved forward a day (plus yesterday's
+    day-to-day drift when the day before had the same crossings) and
+    searched for within +/- window, where a linear interpolation is usually
+    enough to pin it down. The prediction is accepted only if every
+    window straddles its threshold in the expected direction and the sun
+    stays in the same band between windows, checked at the start and end of
+    the day and at solar noon and midnight, where new segments first appear.
+
+    Returns:
+        tuple: (start elevation, crossings), or None if the prediction
+               failed and the day has to be bracketed from scratch
+    """
+    windows = []
+    for i, (time, threshold, rising) in enumerate(previous):
+        predicted = time + timedelta(days=1)
+        if (before is not None and len(before) == len(previous)
+                and before[i][1:] == (threshold, rising)):
+            predicted += time - before[i][0] - timedelta(days=1)
+        low, high = predicted - window, predicted + window
+        if low <= start_time or high >= end_time or (windows and low <= windows[-1][1]):
+            return None
+        windows.append((low, high, threshold, rising))
+
+    start_elevation = elevation(observer, start_time)
+    samples = [(start_time, _band(start_elevation, thresholds), None),
+               (end_time, _band(elevation(observer, end_time), thresholds), None)]
+    for point in _turning_points(observer, start_time, end_time):
+        if any(low <= point <= high for low, high, _, _ in windows):
+            return None
+        samples.append((point, _band(elevation(observer, point), thresholds), None))
+
+    crossings = []
+    for index, (low, high, threshold, rising) in enumerate(windows):
+        low_elevation = elevation(observer, low)
+        high_elevation = elevation(observer, high)
+        if ((low_elevation >= threshold) == (high_elevation >= threshold)
+                or (high_elevation > low_elevation) != rising):
+            return None
+        samples.append((low, _band(low_elevation, thresholds), index))
+        samples.append((high, _band(high_elevation, thresholds), index))
+        time = _interpolate(observer, threshold, low, high, low_elevation,
+                            high_elevation, tolerance)
+        crossings.append((time, threshold, rising))
+
+    # Outside the windows the sun must not change band
+    samples.sort(key=lambda sample: sample[0])
+    for (_, band_a, window_a), (_, band_b, window_b) in zip(samples, samples[1:]):
+        if band_a != band_b and (window_a is None or window_a != window_b):
+            return None
+    return start_elevation, crossings
+
+
+def golden_hours_range(start: datetime, end: datetime, latitude: float,
+                       longitude: float = 0,
+                       min_elevation: float = MIN_ELEVATION,
+                       max_elevation: float = MAX_ELEVATION,
+                       tolerance: timedelta = TOLERANCE,
+                       window: timedelta = SEED_WINDOW, tz: TimeZone = None,
+                       whole_segments: bool = False
+                       ) -> Iterator[Tuple[datetime, List[Segment]]]:
+    """
+    Golden hour segments for every day from start to end (inclusive).
+
+    Consecutive days have nearly the same boundaries, so each day's search is
+    seeded with the previous day's crossing times and only a narrow window
+    around each prediction is searched, which takes about four elevation
+    evaluations per boundary instead of about twenty. A day is bracketed from scratch (as
+    in golden_hour_segments) whenever the prediction fails, e.g. around the
+    polar transitions when a segment appears or disappears. Results are the
+    same as golden_hour_segments, to within tolerance.
+
+    Args:
+        start: First date
+        end: Last date
+        latitude: Latitude in degrees
+        longitude: Longitude in degrees, east positive
+        min_elevation: Lower edge of the band in degrees
+        max_elevation: Upper edge of the band in degrees
+        tolerance: Maximum error of each boundary time
+        window: Half-width of the search window around each prediction
+        tz: Time zone whose local days to use, as in golden_hour_segments
+        whole_segments: As in golden_hour_segments
+
+    Yields:
+        tuple: (date, list of (start, end) segments) for each day
+    """
+    observer = Observer(latitude=latitude, longitude=longitude)
+    thresholds = (min_elevation, max_elevation)
+    tz = resolve_timezone(tz)
+    previous, before = None, None
+    date = datetime.combine(start, datetime.min.time())
+    last = datetime.combine(end, datetime.min.time())
+    while date <= last:
+        start_time, end_time = day_window(date, tz)
+
+        tracked = None
+        if previous is not None:
+            tracked = _track_crossings(observer, start_time, end_time, previous, before,
+                                       thresholds, tolerance, window)
+        instrumentation.count("days")
+        if tracked is not None:
+            instrumentation.count("days_tracked")
+            start_elevation, crossings = tracked
+        else:
+            start_elevation = elevation(observer, start_time)
+            crossings = find_crossings(observer, start_time, end_time, thresholds, tolerance)
+
+        in_range = min_elevation <= start_elevation <= max_elevation
+        segments = _assemble_segments(start_time, end_time, in_range, crossings, min_elevation)
+        if whole_segments:
+            segments = _whole_segments(observer, start_time, end_time, segments, thresholds,
+                                       tolerance)
+        yield date, to_local(segments, tz)
+
+        before, previous = previous, crossings
+        date += timedelta(days=1)
@@ -0,0 +1,26 @@
+"""
+CPU count for sizing worker pools.
+
+Counts the CPUs this process is allowed to run on (its affinity mask where
+the OS has one, so taskset, cgroups cpusets and container limits are
+respected) rather than every CPU in the machine, using only the standard
+library. psutil used to be imported by every script just for this.
+"""
+
+import os
+
+POOL_FRACTION = 0.8  # share of the CPUs a pool uses by default
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on (at least 1)."""
+    if hasattr(os, "sched_getaffinity"):  # Linux
+        return max(1, len(os.sched_getaffinity(0)))
+    if hasattr(os, "process_cpu_count"):  # Python 3.13+, affinity-aware on Windows too
+        return os.process_cpu_count() or 1
+    return os.cpu_count() or 1
+
+
+def default_workers(fraction: float = POOL_FRACTION) -> int:
+    """Default pool size: POOL_FRACTION of the available CPUs, at least 1."""
+    return max(1, int(available_cpus() * fraction))
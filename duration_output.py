@@ -0,0 +1,380 @@
+"""
+Streaming output for main.py's full-year duration grids.
+
+Worker results arrive as (latitude, day-chunk) pieces in whatever order the
+pool finishes them. ReorderBuffer holds on to pieces only until every
+latitude of the oldest outstanding chunk has arrived, then releases that
+chunk's rows in date order, so memory is bounded by how far the pool runs
+ahead rather than by latitudes x days.
+
+DurationCSVWriter writes those rows as they are released and flushes after
+each chunk, so an interrupted run leaves a valid file that can be resumed
+from its last complete date.
+
+For large grids the CSV text itself becomes the bottleneck, so the same rows
+can be written to a columnar file instead: Parquet (when pyarrow is
+installed) with a date32 column and one float32 column per latitude, or an
+uncompressed NPZ with dates, latitudes and a (latitudes, days) float32 array.
+read_columnar() loads either without copying the duration data: Parquet
+through a memory-mapped Arrow table, NPZ by memory-mapping the arrays inside
+the archive.
+
+With several light bands (main.py --bands) each date's hours are a list with
+one entry per band, and every writer gives each (date, band) its own row: a
+Band column after Date in CSV and Parquet, a bands array alongside dates in
+NPZ.
+"""
+
+import csv  # todo: use pandas for xlsx
+import importlib.util
+import os
+import struct
+import zipfile
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+
+DATE_FORMAT = '%Y-%m-%d'
+FORMATS = ("csv", "parquet", "npz", "columnar")  # columnar: parquet if available, else npz
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "npz": ".npz"}
+
+Row = Tuple[str, Dict[float, Any]]  # (date, {latitude: hours, or a list of hours per band})
+
+
+def has_pyarrow() -> bool:
+    """Whether pyarrow is installed, without importing it."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _pyarrow(purpose: str = "Parquet output"):
+    """
+    Import pyarrow and pyarrow.parquet on first use.
+
+    Parquet output is optional and pyarrow is slow to import, so CSV and
+    NPZ runs never load it.
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError(f"{purpose} needs pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+class ReorderBuffer:
+    """Collects per-latitude chunks and releases complete dates in order."""
+
+    def __init__(self, latitudes: Iterable[float], chunk_starts: Iterable[int]):
+        self.latitudes = list(dict.fromkeys(latitudes))
+        self.order = deque(sorted(set(chunk_starts)))
+        self.pending = {first_day: {} for first_day in self.order}
+
+    def add(self, task: tuple, rows: list) -> List[Row]:
+        """
+        Add one task's rows and return any dates that are now complete.
+
+        Args:
+            task: (latitude, first_day, num_days) tuple from main.make_tasks
+            rows: [date, latitude, hours] rows for that task
+
+        Returns:
+            list: (date, {latitude: hours}) tuples in date order
+        """
+        latitude, first_day, _ = task
+        self.pending[first_day][latitude] = rows
+
+        ready = []
+        while self.order and len(self.pending[self.order[0]]) == len(self.latitudes):
+            chunk = self.pending.pop(self.order.popleft())
+            first = chunk[self.latitudes[0]]
+            for i, (date, _, _) in enumerate(first):
+                ready.append((date, {lat: chunk[lat][i][2] for lat in self.latitudes}))
+        return ready
+
+    def __len__(self) -> int:
+        """Number of chunks still waiting for at least one latitude."""
+        return len(self.order)
+
+
+def header(latitudes: List[float], bands: Optional[List[str]] = None) -> List[str]:
+    """CSV header row: Date (and Band) followed by one column per latitude."""
+    return ["Date"] + (["Band"] if bands else []) + [f"{lat}\u00B0" for lat in latitudes]
+
+
+def band_rows(rows: List[Row], latitudes: List[float], bands: Optional[List[str]]):
+    """(date, band or None, [hours per latitude]) for every output row."""
+    for date, lat_data in rows:
+        if not bands:
+            yield date, None, [lat_data.get(lat, 0) for lat in latitudes]
+            continue
+        for b, band in enumerate(bands):
+            yield date, band, [lat_data[lat][b] if lat in lat_data else 0
+                               for lat in latitudes]
+
+
+def last_complete_date(path: str, latitudes: List[float],
+                       bands: Optional[List[str]] = None) -> Optional[datetime]:
+    """
+    Find where an interrupted CSV run stopped.
+
+    A partially written last line is cut off, and with bands so are the rows
+    of a last date that doesn't have all of its bands. The header must match
+    the latitudes (and bands) of the run being resumed.
+
+    Returns:
+        datetime: Last complete date in the file, or None if it has no rows
+    """
+    with open(path, 'rb+') as file:
+        data = file.read()
+        end = data.rfind(b'\n') + 1
+        if bands:
+            lines = data[:end].splitlines(keepends=True)[1:]
+            last_date = lines[-1].split(b',', 1)[0] if lines else None
+            partial = 0
+            while partial < len(lines) and \
+                    lines[-1 - partial].split(b',', 1)[0] == last_date:
+                partial += 1
+            if 0 < partial < len(bands):
+                end -= sum(len(line) for line in lines[-partial:])
+        if end < len(data):
+            file.truncate(end)
+
+    with open(path, newline='') as file:
+        reader = csv.reader(file)
+        existing = next(reader, None)
+        if existing is None:
+            return None
+        if existing != header(latitudes, bands):
+            raise ValueError(f"{path} was written for different latitudes or bands")
+        last = None
+        for row in reader:
+            if len(row) == len(existing):
+                last = row[0]
+    return datetime.strptime(last, DATE_FORMAT) if last else None
+
+
+class DurationCSVWriter:
+    """Writes date rows as they become available, one column per latitude."""
+
+    def __init__(self, path: str, latitudes: List[float], append: bool = False,
+                 bands: Optional[List[str]] = None):
+        self.path = path
+        self.latitudes = list(latitudes)
+        self.bands = bands
+        append = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, mode='a' if append else 'w', newline='')
+        self.writer = csv.writer(self.file)
+        if not append:
+            self.writer.writerow(header(self.latitudes, bands))
+        self.rows_written = 0
+
+    def write(self, rows: List[Row]) -> None:
+        """Write complete dates and flush them to disk."""
+        for date, band, hours in band_rows(rows, self.latitudes, self.bands):
+            self.writer.writerow([date] + ([band] if band else []) + hours)
+        self.rows_written += len(rows)
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def resolve_format(output_format: str) -> str:
+    """Turn "columnar" into the best available columnar format."""
+    if output_format not in FORMATS:
+        raise ValueError(f"Format must be one of {FORMATS}")
+    if output_format == "columnar":
+        return "parquet" if has_pyarrow() else "npz"
+    if output_format == "parquet" and not has_pyarrow():
+        raise ImportError("Parquet output needs pyarrow (pip install pyarrow)")
+    return output_format
+
+
+class _ColumnarWriter(ABC):
+    """
+    Collects dates in memory and writes them in one piece on close.
+
+    A columnar file is only readable once it is complete, and a single
+    block per column is what lets the reader hand out zero-copy views.
+    Latitudes are deduplicated.
+    """
+
+    def __init__(self, path: str, latitudes: List[float], bands: Optional[List[str]] = None):
+        self.path = path
+        self.latitudes = list(dict.fromkeys(latitudes))
+        self.bands = bands
+        self.rows_written = 0
+        self.dates, self.hours = [], []
+
+    def write(self, rows: List[Row]) -> None:
+        """Add complete dates to the file being built."""
+        if not rows:
+            return
+        expanded = list(band_rows(rows, self.latitudes, self.bands))
+        self.dates.append(np.array([date for date, _, _ in expanded], dtype="datetime64[D]"))
+        self.hours.append(np.array([hours for _, _, hours in expanded], dtype=np.float32)
+                          .reshape(len(expanded), len(self.latitudes)).T)
+        self.rows_written += len(rows)
+
+    def close(self) -> None:
+        dates = np.concatenate(self.dates) if self.dates else np.empty(0, "datetime64[D]")
+        hours = (np.concatenate(self.hours, axis=1) if self.hours
+                 else np.empty((len(self.latitudes), 0), np.float32))
+        # every date has all bands, in order
+        bands = np.tile(np.array(self.bands), len(dates) // len(self.bands)) \
+            if self.bands else None
+        self._save(dates, np.ascontiguousarray(hours), bands)
+
+    @abstractmethod
+    def _save(self, dates: np.ndarray, hours: np.ndarray, bands: Optional[np.ndarray]) -> None:
+        """Write the whole file from its columns."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DurationParquetWriter(_ColumnarWriter):
+    """
+    Parquet file with a date32 column (and a Band string column) and one
+    float32 column per latitude.
+    """
+
+    def __init__(self, path: str, latitudes: List[float], bands: Optional[List[str]] = None):
+        _pyarrow()
+        super().__init__(path, latitudes, bands)
+
+    def _save(self, dates: np.ndarray, hours: np.ndarray, bands: Optional[np.ndarray]) -> None:
+        pyarrow = _pyarrow()
+        fields = [pyarrow.field("Date", pyarrow.date32())]
+        arrays = [pyarrow.array(dates, pyarrow.date32())]
+        if bands is not None:
+            fields.append(pyarrow.field("Band", pyarrow.string()))
+            arrays.append(pyarrow.array(bands.tolist(), pyarrow.string()))
+        fields += [pyarrow.field(f"{lat}\u00B0", pyarrow.float32(), nullable=False)
+                   for lat in self.latitudes]
+        metadata = {"latitudes": ",".join(repr(float(lat)) for lat in self.latitudes)}
+        schema = pyarrow.schema(fields, metadata=metadata)
+        arrays += [pyarrow.array(c) for c in hours]
+        table = pyarrow.Table.from_arrays(arrays, schema=schema)
+        pyarrow.parquet.write_table(table, self.path, row_group_size=max(1, len(dates)))
+
+
+class DurationNPZWriter(_ColumnarWriter):
+    """
+    Uncompressed NPZ with dates, latitudes and (latitudes, days) hours, plus
+    a bands array the length of dates when there are several bands.
+    """
+
+    def _save(self, dates: np.ndarray, hours: np.ndarray, bands: Optional[np.ndarray]) -> None:
+        extra = {} if bands is None else {"bands": bands}
+        # np.savez rather than savez_compressed: stored members can be memory-mapped
+        with open(self.path, "wb") as file:
+            np.savez(file, dates=dates, latitudes=np.array(self.latitudes, dtype=np.float64),
+                     hours=hours, **extra)
+
+
+def open_writer(path: str, latitudes: List[float], output_format: str = "csv",
+                append: bool = False, bands: Optional[List[str]] = None):
+    """
+    Open a duration writer for the given format.
+
+    Args:
+        path: Output file
+        latitudes: Column latitudes, in order
+        output_format: One of FORMATS
+        append: Continue an existing file (CSV only)
+        bands: Band names when each date's hours are a list per band
+
+    Returns:
+        A writer with write(rows) and close(), usable as a context manager
+    """
+    output_format = resolve_format(output_format)
+    if output_format == "csv":
+        return DurationCSVWriter(path, latitudes, append, bands)
+    if append:
+        raise ValueError("Only CSV output can be resumed")
+    if output_format == "parquet":
+        return DurationParquetWriter(path, latitudes, bands)
+    return DurationNPZWriter(path, latitudes, bands)
+
+
+class DurationGrid(NamedTuple):
+    """Full-year durations read back from a columnar file."""
+    dates: np.ndarray  # datetime64[D]
+    latitudes: np.ndarray  # float64
+    columns: List[np.ndarray]  # float32 hours, one array per latitude
+    bands: Optional[np.ndarray] = None  # band of each row, when there are several
+
+    def hours(self) -> np.ndarray:
+        """All durations as one (days, latitudes) array (a copy)."""
+        return np.stack(self.columns, axis=1) if self.columns else np.empty((len(self.dates), 0))
+
+
+def _npz_memmap(path: str, name: str) -> np.ndarray:
+    """Memory-map one array stored uncompressed inside an .npz archive."""
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(name + ".npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        with np.load(path) as data:
+            return data[name]
+    with open(path, "rb") as file:
+        # local file header: 30 fixed bytes, then the name and extra fields
+        file.seek(info.header_offset + 26)
+        name_length, extra_length = struct.unpack("<HH", file.read(4))
+        file.seek(name_length + extra_length, os.SEEK_CUR)
+        version = np.lib.format.read_magic(file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+        offset = file.tell()
+    if 0 in shape:
+        return np.empty(shape, dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape,
+                     order="F" if fortran_order else "C")
+
+
+def read_columnar(path: str) -> DurationGrid:
+    """
+    Load a Parquet or NPZ duration file without copying the durations.
+
+    Parquet is read through a memory-mapped Arrow table and each float32
+    column is exposed as a read-only NumPy view; NPZ arrays are memory-mapped
+    straight out of the archive.
+    """
+    if path.endswith(".npz"):
+        hours = _npz_memmap(path, "hours")
+        with zipfile.ZipFile(path) as archive:
+            has_bands = "bands.npy" in archive.namelist()
+        return DurationGrid(np.asarray(_npz_memmap(path, "dates")),
+                            np.asarray(_npz_memmap(path, "latitudes")), list(hours),
+                            np.asarray(_npz_memmap(path, "bands")) if has_bands else None)
+
+    pyarrow = _pyarrow("Reading Parquet")
+    table = pyarrow.parquet.read_table(path, memory_map=True)
+    if any(column.num_chunks != 1 for column in table.columns):
+        table = table.combine_chunks()  # written elsewhere with several row groups
+    latitudes = np.array(table.schema.metadata[b"latitudes"].decode().split(","),
+                         dtype=np.float64)
+    first = 2 if table.schema.names[1:2] == ["Band"] else 1
+    if table.num_rows == 0:
+        return DurationGrid(np.empty(0, "datetime64[D]"), latitudes,
+                            [np.empty(0, np.float32) for _ in latitudes],
+                            np.empty(0, str) if first == 2 else None)
+    dates = table.column(0).chunk(0).to_numpy(zero_copy_only=False).astype("datetime64[D]")
+    bands = np.array(table.column(1).to_pylist()) if first == 2 else None
+    columns = [table.column(i).chunk(0).to_numpy(zero_copy_only=True)
+               for i in range(first, table.num_columns)]
+    return DurationGrid(dates, latitudes, columns, bands)
@@ -1,53 +1,439 @@
-from astral import LocationInfo
-from astral.sun import sun, azimuth
+"""
+Find the days when the sun rises (or sets) in a given direction.
+
+Sunrise azimuth only depends on the sun's declination, so it moves
+monotonically between the solstices. Instead of working out sunrise for all
+365 days, the year is cut at the solstices into monotonic pieces and each
+piece holds at most one crossing of the target azimuth, found by bisection on
+the day of the year. Days without a sunrise (polar night and polar day) sit
+at the solstice ends of the pieces; their edges are found by bisection too,
+and those days are skipped rather than raising.
+
+The target can be any azimuth (90 for due east sunrises, 270 for due west
+sunsets, or the bearing of a street or ridge), and many locations can be
+solved at once on a process pool.
+
+With --all (or a filter such as --region) it writes a report for every city
+in astral's geocoder database instead: the best sunrise and sunset alignment
+day in each half of the year, computed for all cities and days at once with
+solar_engine.rise_set_azimuths. Run python east_west_rise_set.py --help for
+the options.
+"""
+
+import argparse
+import csv
+import multiprocessing
+import os
+import re
 from datetime import datetime, timedelta
-from astral.geocoder import database, lookup
 from heapq import nsmallest
+from multiprocessing.pool import ThreadPool
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+import cpus
+from astral import LocationInfo, Observer
+from astral.sun import sunrise, sunset, azimuth
+from astral.geocoder import all_locations, database, lookup
+import solar_engine
+
+EVENTS = ("rise", "set")
+POOL_MODES = ("process", "thread", "serial")
+SOLSTICES = ((6, 21), (12, 21))  # turning points of the rise/set azimuth
+CITY_CHUNK = 64  # cities per task in the batch report
+REPORT_COLUMNS = ["city", "region", "timezone", "latitude", "longitude",
+                  "sunrise_1", "sunrise_1_offset", "sunrise_2", "sunrise_2_offset",
+                  "sunset_1", "sunset_1_offset", "sunset_2", "sunset_2_offset"]
+
+class AzimuthDay(NamedTuple):
+    """The sunrise or sunset on one day, compared with a target azimuth."""
+    date: datetime
+    time: datetime  # sunrise/sunset, UTC
+    azimuth: float
+    target: float
+
+    @property
+    def difference(self) -> float:
+        """Absolute angle between the sun's azimuth and the target, in degrees."""
+        return abs(_offset(self.azimuth, self.target))
+
+def _offset(value: float, target: float) -> float:
+    """Signed angle from target to value, in [-180, 180)."""
+    return (value - target + 180) % 360 - 180
+
+class _Year:
+    """Sunrise or sunset azimuths for one location and year, worked out on demand."""
+
+    def __init__(self, observer: Observer, target: float, event: str, year: int):
+        if event not in EVENTS:
+            raise ValueError(f"Event must be one of {EVENTS}")
+        self.observer = observer
+        self.target = target
+        self.event = event
+        self.start = datetime(year, 1, 1)
+        self.days = (datetime(year + 1, 1, 1) - self.start).days
+        self.cache = {}
+
+    def day(self, index: int) -> Optional[AzimuthDay]:
+        """The event on day index of the year, or None if it doesn't happen."""
+        if index not in self.cache:
+            date = self.start + timedelta(days=index)
+            event = sunrise if self.event == "rise" else sunset
+            try:
+                when = event(self.observer, date)
+            except ValueError:  # sun never rises or never sets that day
+                self.cache[index] = None
+            else:
+                self.cache[index] = AzimuthDay(date, when, azimuth(self.observer, when),
+                                               self.target)
+        return self.cache[index]
+
+    def offset(self, index: int) -> float:
+        return _offset(self.day(index).azimuth, self.target)
+
+    def _defined_near(self, index: int, low: int, high: int) -> Optional[int]:
+        """
+        Closest day to index, strictly between low and high, that has the event.
+
+        Isolated days without one also happen away from the poles, when the
+        event moves across midnight UTC.
+        """
+        for step in range(high - low):
+            for candidate in (index + step, index - step):
+                if low < candidate < high and self.day(candidate) is not None:
+                    return candidate
+        return None
+
+    def _edge(self, defined: int, undefined: int) -> int:
+        """Last day with the event, going from a day with it towards one without."""
+        while abs(undefined - defined) > 1:
+            middle = (defined + undefined) // 2
+            if self.day(middle) is None:
+                undefined = middle
+            else:
+                defined = middle
+        return defined
+
+    def pieces(self) -> List[Tuple[int, int]]:
+        """
+        Monotonic stretches of the year, trimmed to days that have the event.
+
+        The year is cut at the solstices; within each piece the days without
+        the event are at the ends, so a piece is trimmed by bisecting from a
+        day in the middle that has it.
+        """
+        cuts = [0] + [(datetime(self.start.year, m, d) - self.start).days
+                      for m, d in SOLSTICES] + [self.days - 1]
+        pieces = []
+        for low, high in zip(cuts, cuts[1:]):
+            middle = (low + high) // 2  # about an equinox
+            if self.day(middle) is None:
+                # only within a fraction of a degree of the poles
+                candidates = [i for i in range(low, high + 1, 7) if self.day(i) is not None]
+                if not candidates:
+                    continue
+                middle = candidates[len(candidates) // 2]
+            first = low if self.day(low) is not None else self._edge(middle, low)
+            last = high if self.day(high) is not None else self._edge(middle, high)
+            pieces.append((first, last))
+        return pieces
+
+    def crossing(self, low: int, high: int) -> Optional[int]:
+        """Day closest to the target in a monotonic piece, if the piece crosses it."""
+        low_offset, high_offset = self.offset(low), self.offset(high)
+        if low_offset == 0:
+            return low
+        # the offsets also change sign on the far side of the compass, which
+        # isn't a crossing
+        if (low_offset < 0) == (high_offset < 0) or abs(low_offset) + abs(high_offset) >= 180:
+            return None
+        while high - low > 1:
+            middle = self._defined_near((low + high) // 2, low, high)
+            if middle is None:
+                break
+            if (self.offset(middle) < 0) == (low_offset < 0):
+                low = middle
+            else:
+                high = middle
+        return min(low, high, key=lambda i: abs(self.offset(i)))
+
+def azimuth_crossings(observer: Observer, target: float = 90, event: str = "rise",
+                      year: int = datetime.now().year) -> List[AzimuthDay]:
+    """
+    Days when the sun rises (or sets) closest to the target azimuth.
+
+    Typically two per year, one on either side of the solstice where the
+    azimuth turns around. Target azimuths the sun never reaches at this
+    latitude give no days.
+
+    Args:
+        observer: Astral observer (latitude, longitude, elevation)
+        target: Azimuth in degrees clockwise from north (90 = due east)
+        event: "rise" or "set"
+        year: Year to search
+
+    Returns:
+        list: AzimuthDay for the day nearest each crossing, in date order
+    """
+    sun_year = _Year(observer, target, event, year)
+    crossings = []
+    for low, high in sun_year.pieces():
+        index = sun_year.crossing(low, high)
+        if index is not None and (not crossings or crossings[-1].date != sun_year.day(index).date):
+            crossings.append(sun_year.day(index))
+    return crossings
+
+def find_closest_days(observer: Observer, target: float = 90, event: str = "rise",
+                      n: int = 6, year: int = datetime.now().year) -> List[Tuple[datetime, float]]:
+    """
+    The n days of the year when sunrise (or sunset) is closest to the target azimuth.
+
+    Matches checking every day of the year, but only looks at days near a
+    crossing or near the ends of a monotonic piece, where the closest days
+    must be. Days without a sunrise/sunset are skipped.
+
+    Returns:
+        list: (date, difference in degrees) tuples, closest first
+    """
+    sun_year = _Year(observer, target, event, year)
+    candidates = set()
+    for low, high in sun_year.pieces():
+        index = sun_year.crossing(low, high)
+        centers = [low, high] if index is None else [index]
+        for center in centers:
+            candidates.update(range(max(low, center - n), min(high, center + n) + 1))
+    days = [sun_year.day(i) for i in sorted(candidates) if sun_year.day(i) is not None]
+    closest = nsmallest(n, days, key=lambda day: day.difference)
+    return [(day.date, day.difference) for day in closest]
 
 def find_due_east_sunrises(location: LocationInfo, n: int = 6, year: int = datetime.now().year):
     """
     Find the n days of the year when sunrise azimuth is closest to due east (90 degrees)
     for a given location.
-    
+
     Args:
         location: Astral LocationInfo object with latitude/longitude
         n: Number of days to return
         year: Year to check (defaults to current year)
-    
+
     Returns:
         List of (date, difference) tuples for the n closest days
     """
-    days = []
-    
-    # Check each day of the year
-    start_date = datetime(year, 1, 1)
-    for day_offset in range(365):
-        current_date = start_date + timedelta(days=day_offset)
-        
-        # Get sun information for the day
-        s = sun(location.observer, current_date)
-        
-        # Calculate absolute difference from 90 degrees (due east)
-        difference = abs(azimuth(location.observer, s['sunrise']) - 90)
-        days.append((current_date, difference))
-    
-    # Return n days with smallest difference
-    return nsmallest(n, days, key=lambda x: x[1])
-
-def main():
+    return find_closest_days(location.observer, 90, "rise", n, year)
+
+def find_due_west_sunsets(location: LocationInfo, n: int = 6, year: int = datetime.now().year):
+    """Like find_due_east_sunrises, for sunsets closest to due west (270 degrees)."""
+    return find_closest_days(location.observer, 270, "set", n, year)
+
+def _crossings_worker(job: tuple) -> List[AzimuthDay]:
+    latitude, longitude, target, event, year = job
+    return azimuth_crossings(Observer(latitude, longitude), target, event, year)
+
+def azimuth_crossings_batch(locations: list, target: float = 90, event: str = "rise",
+                            year: int = datetime.now().year, mode: str = "process",
+                            workers: int = None) -> List[List[AzimuthDay]]:
+    """
+    azimuth_crossings for many locations, spread over a process pool.
+
+    Args:
+        locations: LocationInfo/Observer objects or (latitude, longitude) tuples
+        target: Azimuth in degrees clockwise from north
+        event: "rise" or "set"
+        year: Year to search
+        mode: "process", "thread" or "serial"
+        workers: Pool size (default: 80% of CPUs)
+
+    Returns:
+        list: The crossings for each location, in the order given
+    """
+    if mode not in POOL_MODES:
+        raise ValueError(f"Mode must be one of {POOL_MODES}")
+    if event not in EVENTS:
+        raise ValueError(f"Event must be one of {EVENTS}")
+    jobs = []
+    for location in locations:
+        if isinstance(location, (LocationInfo, Observer)):
+            jobs.append((location.latitude, location.longitude, target, event, year))
+        else:
+            jobs.append((location[0], location[1], target, event, year))
+
+    workers = workers or cpus.default_workers()
+    if mode == "serial" or workers == 1 or len(jobs) <= 1:
+        return list(map(_crossings_worker, jobs))
+    pool_class = multiprocessing.Pool if mode == "process" else ThreadPool
+    with pool_class(processes=min(workers, len(jobs))) as pool:
+        return list(pool.imap(_crossings_worker, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+
+def filter_locations(locations: List[LocationInfo], region: str = None, name: str = None,
+                     min_latitude: float = -90, max_latitude: float = 90) -> List[LocationInfo]:
+    """
+    Select cities by region or timezone, name and latitude.
+
+    Args:
+        locations: Cities to choose from
+        region: Case-insensitive text to find in the region or timezone
+                (e.g. "Norway" or "Europe/")
+        name: Case-insensitive regular expression to find in the city name
+        min_latitude: Southernmost latitude to keep
+        max_latitude: Northernmost latitude to keep
+    """
+    pattern = re.compile(name, re.IGNORECASE) if name else None
+    selected = []
+    for location in locations:
+        if region and region.lower() not in f"{location.region}|{location.timezone}".lower():
+            continue
+        if pattern and not pattern.search(location.name):
+            continue
+        if min_latitude <= location.latitude <= max_latitude:
+            selected.append(location)
+    return selected
+
+def _best_days(azimuths: np.ndarray, target: float, halves: List[np.ndarray]):
+    """Index and difference of the closest day in each half of the year, per city."""
+    difference = np.abs((azimuths - target + 180) % 360 - 180)
+    difference = np.where(np.isnan(difference), np.inf, difference)
+    result = []
+    for half in halves:
+        index = np.nonzero(half)[0][np.argmin(difference[half], axis=0)]
+        result.append((index, difference[index, np.arange(difference.shape[1])]))
+    return result
+
+def _alignment_worker(job: tuple) -> List[Tuple]:
+    """Best sunrise/sunset days for one chunk of cities."""
+    latitudes, longitudes, year, sunrise_target, sunset_target = job
+    days = np.arange(np.datetime64(f"{year}-01-01"), np.datetime64(f"{year + 1}-01-01"))
+    rise, set_ = solar_engine.rise_set_azimuths(days, latitudes, longitudes)
+    # the azimuth turns around at the solstices: one crossing on each side
+    june, december = (np.datetime64(f"{year}-{m:02d}-{d:02d}") for m, d in SOLSTICES)
+    second_half = (days >= june) & (days < december)
+    halves = [~second_half, second_half]
+    columns = _best_days(rise, sunrise_target, halves) + _best_days(set_, sunset_target, halves)
+    rows = []
+    for city in range(len(latitudes)):
+        row = []
+        for index, difference in columns:
+            if np.isinf(difference[city]):  # the sun never rises or sets
+                row += ['', '']
+            else:
+                row += [str(days[index[city]]), round(float(difference[city]), 3)]
+        rows.append(tuple(row))
+    return rows
+
+def alignment_report(locations: List[LocationInfo], year: int = datetime.now().year,
+                     sunrise_target: float = 90, sunset_target: float = 270,
+                     mode: str = "process", workers: int = None,
+                     chunk: int = CITY_CHUNK) -> List[Dict]:
+    """
+    Best sunrise and sunset alignment days for many cities in one pass.
+
+    For each city the report gives the day in each half of the year (either
+    side of the June solstice) when the sun rises closest to
+    sunrise_target and sets closest to sunset_target, with the difference in
+    degrees. Azimuths are computed for every city and day at once with
+    solar_engine (agreeing with astral to about 0.01 degrees), in chunks of
+    cities spread over a process pool.
+
+    Returns:
+        list: A dict per city with the REPORT_COLUMNS keys, in input order
+    """
+    if mode not in POOL_MODES:
+        raise ValueError(f"Mode must be one of {POOL_MODES}")
+    jobs = [([loc.latitude for loc in locations[i:i + chunk]],
+             [loc.longitude for loc in locations[i:i + chunk]],
+             year, sunrise_target, sunset_target)
+            for i in range(0, len(locations), chunk)]
+
+    workers = workers or cpus.default_workers()
+    if mode == "serial" or workers == 1 or len(jobs) <= 1:
+        results = list(map(_alignment_worker, jobs))
+    else:
+        pool_class = multiprocessing.Pool if mode == "process" else ThreadPool
+        with pool_class(processes=min(workers, len(jobs))) as pool:
+            results = list(pool.imap(_alignment_worker, jobs))
+
+    rows = [row for chunk_rows in results for row in chunk_rows]
+    return [dict(zip(REPORT_COLUMNS, (loc.name, loc.region, loc.timezone,
+                                      round(loc.latitude, 4), round(loc.longitude, 4)) + row))
+            for loc, row in zip(locations, rows)]
+
+def write_report(rows: List[Dict], path: str, sort_by: str = None) -> None:
+    """Write report rows as CSV, optionally sorted by one of REPORT_COLUMNS."""
+    if sort_by:
+        if sort_by not in REPORT_COLUMNS:
+            raise ValueError(f"Sort column must be one of {REPORT_COLUMNS}")
+        # blanks (no sunrise/sunset) sort last
+        rows = sorted(rows, key=lambda row: (row[sort_by] == '', row[sort_by]))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=REPORT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    """Parse command line options for the batch report."""
+    parser = argparse.ArgumentParser(
+        description="Days when the sun rises due east and sets due west. Without "
+                    "options, asks for one city.")
+    parser.add_argument("--all", action="store_true",
+                        help="write a report for every city in astral's database")
+    parser.add_argument("--region", help="only cities whose region or timezone contains this")
+    parser.add_argument("--name", help="only cities whose name matches this regular expression")
+    parser.add_argument("--min-latitude", type=float, default=-90)
+    parser.add_argument("--max-latitude", type=float, default=90)
+    parser.add_argument("--year", type=int, default=datetime.now().year)
+    parser.add_argument("--sunrise-azimuth", type=float, default=90,
+                        help="sunrise direction in degrees from north (default: 90)")
+    parser.add_argument("--sunset-azimuth", type=float, default=270,
+                        help="sunset direction in degrees from north (default: 270)")
+    parser.add_argument("--sort", choices=REPORT_COLUMNS, help="column to sort the report by")
+    parser.add_argument("--output", help="report file (default: timestamped CSV in data_output)")
+    parser.add_argument("--mode", choices=POOL_MODES, default="process")
+    parser.add_argument("--workers", type=int, help="number of workers (default: 80%% of CPUs)")
+    args = parser.parse_args(argv)
+    args.batch = bool(args.all or args.region or args.name or args.min_latitude > -90
+                      or args.max_latitude < 90)
+    return args
+
+def batch_main(args: argparse.Namespace) -> str:
+    """Write the alignment report for the selected cities and return its path."""
+    start_time = datetime.now()
+    locations = filter_locations(list(all_locations(database())), args.region, args.name,
+                                 args.min_latitude, args.max_latitude)
+    if not locations:
+        raise SystemExit("No cities match the filters")
+    rows = alignment_report(locations, args.year, args.sunrise_azimuth, args.sunset_azimuth,
+                            args.mode, args.workers)
+    output = args.output
+    if not output:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        output = os.path.join(script_dir, "data_output", f"azimuth_alignment_{timestamp}.csv")
+    write_report(rows, output, args.sort)
+    print(f"{len(rows)} cities written to {output} in {datetime.now() - start_time}")
+    return output
+
+def main(argv: list = None):
+    args = parse_args(argv)
+    if args.batch:
+        batch_main(args)
+        return
+
     # Get location input from user
     city = input("Enter city name: ")
-    
+
     # Create LocationInfo object
     location = lookup(city, database())
-    
+
     # Find 6 sunrise dates closest to due east
     closest_days = find_due_east_sunrises(location)
-    
+
     # Print results
     print(f"\nDates with sunrise closest to due east:")
     for date, difference in closest_days:
         print(f"{date.strftime('%B %d, %Y')}: {difference:.2f} degrees from due east")
 
+    print(f"\nDates with sunset closest to due west:")
+    for date, difference in find_due_west_sunsets(location):
+        print(f"{date.strftime('%B %d, %Y')}: {difference:.2f} degrees from due west")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,110 @@
+"""
+Optional refraction and horizon-dip corrections for the golden hour band.
+
+By default the band edges (-4 and 6 degrees) are compared with astral's
+apparent elevation, which includes the NOAA refraction model for an observer
+at sea level. An ElevationModel changes what the edges mean:
+- refraction: "astral" (NOAA, the default), "bennett" or "saemundsson"
+  (scaled for pressure and temperature), or "none" (geometric elevation).
+  Bennett and Saemundsson are only applied above `cutoff` degrees (5 by
+  default); below it the sun's light is too spread out and too dependent on
+  the air near the horizon for any formula to be trusted, so edges there are
+  geometric, as the usual twilight definitions are.
+- height: metres above the surrounding terrain or sea. A raised observer's
+  horizon is lower by the dip (1.76 arcminutes x sqrt(height)), and the band
+  is measured from that horizon.
+
+Rather than correcting every elevation sample, each edge is converted once
+into the astral elevation that corresponds to it: the visible edge minus the
+dip gives the apparent elevation, the chosen refraction formula gives the
+geometric elevation, and astral's own refraction turns that back into the
+value astral reports. Apparent elevation rises with geometric elevation, so
+the sun crosses the converted edge at the same moment it crosses the real
+one. boundary_solver and solar_engine then run unchanged, with the same
+number of elevation calls as without a model.
+"""
+
+import math
+from typing import NamedTuple, Tuple
+
+MODELS = ("astral", "bennett", "saemundsson", "none")
+CUTOFF = 5.0  # degrees; Bennett/Saemundsson aren't used below this
+DIP_ARCMIN = 1.76  # arcminutes per sqrt(metre), including terrestrial refraction
+STANDARD_PRESSURE = 1010.0  # hPa
+STANDARD_TEMPERATURE = 10.0  # degrees C
+ITERATIONS = 8  # fixed-point steps to invert Saemundsson (converges in 3-4)
+
+
+def dip(height: float) -> float:
+    """Dip of the visible horizon in degrees for an observer height in metres."""
+    return DIP_ARCMIN * math.sqrt(max(height, 0.0)) / 60
+
+
+def bennett(apparent: float) -> float:
+    """Refraction in degrees for an apparent elevation (Bennett 1982)."""
+    return 1 / math.tan(math.radians(apparent + 7.31 / (apparent + 4.4))) / 60
+
+
+def saemundsson(geometric: float) -> float:
+    """Refraction in degrees for a geometric elevation (Saemundsson 1986)."""
+    return 1.02 / math.tan(math.radians(geometric + 10.3 / (geometric + 5.11))) / 60
+
+
+class ElevationModel(NamedTuple):
+    """How the band edges relate to the sun's geometric elevation."""
+    refraction: str = "astral"  # one of MODELS
+    height: float = 0.0  # metres above the horizon the observer sees
+    pressure: float = STANDARD_PRESSURE  # hPa
+    temperature: float = STANDARD_TEMPERATURE  # degrees C
+    cutoff: float = CUTOFF  # degrees; edges below it aren't refracted
+
+    def validate(self) -> None:
+        """Raise ValueError for an unknown model or impossible conditions."""
+        if self.refraction not in MODELS:
+            raise ValueError(f"Refraction model must be one of {MODELS}")
+        if self.height < 0:
+            raise ValueError("Observer height can't be negative")
+        if self.pressure <= 0 or self.temperature <= -273.15:
+            raise ValueError("Pressure and absolute temperature must be positive")
+
+    @property
+    def scale(self) -> float:
+        """Refraction relative to standard pressure and temperature."""
+        return (self.pressure / STANDARD_PRESSURE) * \
+            ((273.15 + STANDARD_TEMPERATURE) / (273.15 + self.temperature))
+
+    def geometric(self, visible: float) -> float:
+        """Geometric elevation of the sun's centre when it is at `visible`."""
+        import solar_engine  # NumPy; not needed until a model is used
+        apparent = visible - dip(self.height)
+        if self.refraction == "astral":
+            return solar_engine.geometric_elevation(apparent)
+        if self.refraction == "none" or apparent < self.cutoff:
+            return apparent
+        if self.refraction == "bennett":
+            return apparent - self.scale * bennett(apparent)
+        geometric = apparent - self.scale * bennett(apparent)
+        for _ in range(ITERATIONS):
+            geometric = apparent - self.scale * saemundsson(geometric)
+        return geometric
+
+    def threshold(self, visible: float) -> float:
+        """The astral (NOAA-refracted) elevation that is `visible` under this model."""
+        if self.refraction == "astral":
+            return visible - dip(self.height)
+        import solar_engine
+        geometric = self.geometric(visible)
+        return geometric + float(solar_engine.refraction(geometric))
+
+    def thresholds(self, min_elevation: float, max_elevation: float) -> Tuple[float, float]:
+        """Band edges to hand to boundary_solver or solar_engine."""
+        return self.threshold(min_elevation), self.threshold(max_elevation)
+
+
+def band_thresholds(min_elevation: float, max_elevation: float,
+                    model: "ElevationModel" = None) -> Tuple[float, float]:
+    """The band edges unchanged without a model, else converted for the model."""
+    if model is None:
+        return min_elevation, max_elevation
+    model.validate()
+    return model.thresholds(min_elevation, max_elevation)
@@ -0,0 +1,323 @@
+"""
+Cached, rate-limited geocoding for trip_split.
+
+Addresses are looked up through a pluggable backend:
+- NominatimBackend queries OpenStreetMap through geopy (imported on first
+  use), at most one request per second as the Nominatim usage policy asks
+- GazetteerBackend looks addresses up in a local dictionary or CSV file,
+  for offline use and for tests
+
+Every answer is stored in a small SQLite database next to the result cache
+(GOLDENHOUR_CACHE_DIR or data_output/.cache), keyed by the backend and the
+normalized address. Found coordinates are kept for TTL seconds. Addresses the
+backend could not find are cached too (negative entries), for the shorter
+NEGATIVE_TTL, so a typo is not sent to the server on every run. Timeouts and
+other errors are never cached. GOLDENHOUR_CACHE=0 turns the cache off.
+
+geocode_addresses() answers what it can from the cache and sends the rest
+through a small thread pool. All threads share one rate limiter, so requests
+are started no faster than the backend allows, but a slow response does not
+hold up the next request. Results come back in input order, one per address,
+each with either coordinates or an error message.
+"""
+
+import csv
+import logging
+import os
+import sqlite3
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import instrumentation
+import result_cache
+
+TTL = 30 * 24 * 3600  # seconds found coordinates stay cached
+NEGATIVE_TTL = 24 * 3600  # seconds "not found" answers stay cached
+WORKERS = 4  # concurrent lookups; the rate limiter still spaces their starts
+RETRIES = 2  # extra attempts after a timeout or unavailable server
+BACKOFF = 2.0  # seconds before the first retry, doubled for each further retry
+USER_AGENT = "goldenhour_v2_trip_planner/1.0"
+DB_NAME = "geocode.sqlite"
+NOT_FOUND = "address not found"
+
+Coordinates = Tuple[float, float]
+
+logger = logging.getLogger(__name__)
+
+
+class GeocodeError(Exception):
+    """A temporary backend failure (timeout, server unavailable) worth retrying."""
+
+
+class GeocodeResult(NamedTuple):
+    """One address of geocode_addresses output."""
+    address: str
+    coordinates: Optional[Coordinates]  # (latitude, longitude), None on error
+    error: Optional[str]
+    cached: bool  # True if answered from the cache without a lookup
+
+    @property
+    def ok(self) -> bool:
+        return self.coordinates is not None
+
+
+def normalize(address: str) -> str:
+    """Cache key for an address: case and whitespace differences are ignored."""
+    return " ".join(address.split()).casefold()
+
+
+class NominatimBackend:
+    """OpenStreetMap Nominatim through geopy."""
+
+    name = "nominatim"
+
+    def __init__(self, user_agent: str = USER_AGENT, timeout: float = 10,
+                 min_interval: float = 1.0):
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self._geolocator = None
+        self._lock = threading.Lock()
+
+    def _get_geolocator(self):
+        with self._lock:
+            if self._geolocator is None:
+                from geopy.geocoders import Nominatim
+                self._geolocator = Nominatim(user_agent=self.user_agent, timeout=self.timeout)
+            return self._geolocator
+
+    def geocode(self, address: str) -> Optional[Coordinates]:
+        """Coordinates of an address, or None if Nominatim has no match."""
+        from geopy.exc import GeocoderRateLimited, GeocoderTimedOut, GeocoderUnavailable
+        try:
+            location = self._get_geolocator().geocode(address)
+        except (GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited) as e:
+            raise GeocodeError(str(e) or type(e).__name__) from e
+        if location is None:
+            return None
+        return (location.latitude, location.longitude)
+
+
+class GazetteerBackend:
+    """Offline lookups from a fixed address -> (latitude, longitude) table."""
+
+    name = "gazetteer"
+    min_interval = 0.0
+
+    def __init__(self, places: Dict[str, Coordinates]):
+        self.places = {normalize(address): (float(lat), float(lon))
+                       for address, (lat, lon) in places.items()}
+
+    @classmethod
+    def from_csv(cls, path: str) -> "GazetteerBackend":
+        """Read a CSV with Address, Latitude and Longitude columns."""
+        with open(path, newline="", encoding="utf-8") as file:
+            return cls({row["Address"]: (row["Latitude"], row["Longitude"])
+                        for row in csv.DictReader(file)})
+
+    def geocode(self, address: str) -> Optional[Coordinates]:
+        return self.places.get(normalize(address))
+
+
+class RateLimiter:
+    """Spaces calls to wait() at least min_interval seconds apart across threads."""
+
+    def __init__(self, min_interval: float, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.min_interval = min_interval
+        self._clock = clock
+        self._sleep = sleep
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Block until this caller's slot comes up."""
+        if self.min_interval <= 0:
+            return
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._next)
+            self._next = slot + self.min_interval
+        if slot > now:
+            self._sleep(slot - now)
+
+
+class GeocodeCache:
+    """SQLite cache of geocoding answers with separate TTLs for hits and misses."""
+
+    def __init__(self, path: str, ttl: float = TTL, negative_ttl: float = NEGATIVE_TTL,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._clock = clock
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocodes (backend TEXT, query TEXT, "
+                "latitude REAL, longitude REAL, fetched REAL, PRIMARY KEY (backend, query))")
+
+    def get(self, backend: str, address: str) -> Tuple[bool, Optional[Coordinates]]:
+        """
+        Look an address up.
+
+        Returns:
+            tuple: (hit, coordinates); coordinates is None for a cached
+                   "not found" answer. Expired entries are misses.
+        """
+        row = self._conn.execute(
+            "SELECT latitude, longitude, fetched FROM geocodes WHERE backend = ? AND query = ?",
+            (backend, normalize(address))).fetchone()
+        if row is None:
+            return False, None
+        latitude, longitude, fetched = row
+        ttl = self.negative_ttl if latitude is None else self.ttl
+        if self._clock() - fetched > ttl:
+            return False, None
+        return True, None if latitude is None else (latitude, longitude)
+
+    def put(self, backend: str, address: str, coordinates: Optional[Coordinates]) -> None:
+        """Store coordinates, or None to remember that the address was not found."""
+        latitude, longitude = coordinates if coordinates is not None else (None, None)
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?)",
+                (backend, normalize(address), latitude, longitude, self._clock()))
+
+    def expire(self) -> int:
+        """Delete expired entries; returns how many were removed."""
+        now = self._clock()
+        with self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM geocodes WHERE (latitude IS NOT NULL AND fetched < ?) "
+                "OR (latitude IS NULL AND fetched < ?)",
+                (now - self.ttl, now - self.negative_ttl))
+        return cursor.rowcount
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM geocodes").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def get_cache() -> Optional[GeocodeCache]:
+    """
+    Return this thread's geocode cache, or None if caching is disabled.
+
+    Uses the same switch, directory and thread-local connections as
+    result_cache.
+    """
+    if os.environ.get("GOLDENHOUR_CACHE", "1").lower() in ("0", "off", "false", "no"):
+        return None
+    return result_cache.per_thread(os.path.join(result_cache.default_directory(), DB_NAME),
+                                   GeocodeCache)
+
+
+def _lookup(backend, limiter: RateLimiter, address: str, retries: int,
+            backoff: float) -> Tuple[Optional[Coordinates], Optional[str], bool]:
+    """
+    Geocode one address, retrying temporary failures.
+
+    Returns:
+        tuple: (coordinates, error, cacheable); "not found" is cacheable,
+               errors are not
+    """
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        limiter.wait()
+        instrumentation.count("geocode_requests")
+        try:
+            coordinates = backend.geocode(address)
+        except GeocodeError as e:
+            error = f"geocoder unavailable after {attempt + 1} attempt(s): {e}"
+            logger.warning(f"Geocoding {address!r} failed ({e}), "
+                           f"{'retrying' if attempt < retries else 'giving up'}")
+            continue
+        except Exception as e:
+            return None, f"geocoding failed: {e}", False
+        if coordinates is None:
+            return None, NOT_FOUND, True
+        return (float(coordinates[0]), float(coordinates[1])), None, True
+    return None, error, False
+
+
+def geocode_addresses(addresses: Iterable[str], backend=None,
+                      cache: Optional[GeocodeCache] = None, use_cache: bool = True,
+                      workers: int = WORKERS, retries: int = RETRIES,
+                      backoff: float = BACKOFF) -> List[GeocodeResult]:
+    """
+    Geocode many addresses, using the cache and a rate-limited thread pool.
+
+    Repeated addresses (ignoring case and whitespace) are looked up once.
+
+    Args:
+        addresses: Free-form address strings
+        backend: Object with name, min_interval and geocode(address)
+                 (default: NominatimBackend)
+        cache: GeocodeCache to use (default: get_cache())
+        use_cache: False to skip the cache entirely
+        workers: Concurrent lookups
+        retries: Extra attempts after a GeocodeError
+        backoff: Seconds before the first retry
+
+    Returns:
+        list: A GeocodeResult for every address, in input order
+    """
+    addresses = list(addresses)
+    backend = backend if backend is not None else NominatimBackend()
+    if use_cache and cache is None:
+        cache = get_cache()
+    elif not use_cache:
+        cache = None
+
+    answers = {}  # normalized address -> (coordinates, error, cached)
+    pending = {}  # normalized address -> address to look up
+    hits = 0
+    for address in addresses:
+        key = normalize(address)
+        if key in answers or key in pending:
+            continue
+        if not key:
+            answers[key] = (None, "empty address", False)
+            continue
+        if cache is not None:
+            with instrumentation.stage("geocoding.cache_get"):
+                hit, coordinates = cache.get(backend.name, address)
+            if hit:
+                answers[key] = (coordinates, None if coordinates else NOT_FOUND, True)
+                hits += 1
+                continue
+        pending[key] = address
+
+    limiter = RateLimiter(backend.min_interval)
+    lookup = lambda address: _lookup(backend, limiter, address, retries, backoff)
+    queries = list(pending.values())
+    start = time.perf_counter()
+    if workers <= 1 or len(queries) <= 1:
+        looked_up = map(lookup, queries)
+        pool = None
+    else:
+        pool = ThreadPool(processes=min(workers, len(queries)))
+        looked_up = pool.imap(lookup, queries)
+    try:
+        for key, (coordinates, error, cacheable) in zip(pending, looked_up):
+            answers[key] = (coordinates, error, False)
+            if cacheable and cache is not None:
+                cache.put(backend.name, pending[key], coordinates)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    instrumentation.add_time("geocoding.lookups", time.perf_counter() - start)
+
+    results = [GeocodeResult(address, *answers[normalize(address)]) for address in addresses]
+    failed = sum(1 for result in results if not result.ok)
+    logger.info(f"Geocoded {len(addresses)} addresses: {hits} "
+                f"from cache, {len(pending)} looked up, {failed} failed")
+    return results
@@ -0,0 +1,184 @@
+"""
+Compact result type for one day of golden hour.
+
+GoldenHours holds every (start, end) segment of a day, however many there
+are, with a kind for each:
+- "morning": the sun climbs through the band
+- "evening": the sun sinks through the band
+- "midday": the sun turns around inside the band at solar noon (polar
+  twilight, when it never gets higher than the band)
+- "midnight": the sun turns around inside the band at solar midnight (near
+  the midnight sun)
+- "all day": the segment covers the whole day
+
+Kinds are decided by where a segment lies relative to local solar noon and
+midnight (from the longitude and the equation of time, within a minute or
+so), so they don't depend on which engine found the segment.
+
+The class uses __slots__ and keeps the boundaries in one flat tuple and the
+kinds in a short string, so a bulk run holds three small objects per day
+instead of a four-entry dict. It still reads like the old result dict
+(result['morning_start'] and so on, None where there is no segment), with the
+first segment in the morning slots and the second in the evening slots, so
+existing callers keep working. Use .segments to see all of them.
+
+to_json()/from_json() store a day as seconds from midnight, which is quicker
+to write and read than ISO strings.
+"""
+
+import math
+from collections.abc import Mapping
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence, Tuple
+
+KINDS = {"m": "morning", "e": "evening", "d": "midday", "n": "midnight", "a": "all day"}
+CODES = {name: code for code, name in KINDS.items()}
+LEGACY_KEYS = ("morning_start", "morning_end", "evening_start", "evening_end")
+DAY = timedelta(days=1)
+
+
+
+def solar_noon(date: datetime, longitude: float = 0) -> datetime:
+    """Approximate solar noon (naive UTC) from the longitude and equation of time."""
+    gamma = 2 * math.pi / 365 * (date.timetuple().tm_yday - 1)
+    equation_of_time = 229.18 * (0.000075 + 0.001868 * math.cos(gamma)
+                                 - 0.032077 * math.sin(gamma)
+                                 - 0.014615 * math.cos(2 * gamma)
+                                 - 0.040849 * math.sin(2 * gamma))
+    midnight = datetime(date.year, date.month, date.day)
+    return midnight + timedelta(minutes=720 - 4 * longitude - equation_of_time)
+
+
+def _utc(time: datetime) -> datetime:
+    """Naive UTC for comparisons (aware times are converted)."""
+    if time.tzinfo is None:
+        return time
+    return time.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def classify(start: datetime, end: datetime, noon: datetime, whole_day: bool = False) -> str:
+    """Kind code of a segment given the day's solar noon (naive UTC)."""
+    if whole_day:
+        return "a"
+    start, end = _utc(start), _utc(end)
+    # the solar noon or midnight nearest the segment
+    middle = start + (end - start) / 2
+    turns = round((middle - noon) / (DAY / 2))
+    turn = noon + turns * (DAY / 2)
+    if start < turn < end:
+        return "d" if turns % 2 == 0 else "n"
+    # before noon or after midnight the sun is climbing
+    return "m" if (middle < turn) == (turns % 2 == 0) else "e"
+
+
+class GoldenHours(Mapping):
+    """Every golden hour segment of one day."""
+
+    __slots__ = ("date", "_bounds", "_kinds")
+
+    def __init__(self, date: Optional[datetime], bounds: Tuple[datetime, ...] = (),
+                 kinds: str = ""):
+        """
+        Args:
+            date: The day
+            bounds: Flat tuple (start1, end1, start2, end2, ...)
+            kinds: One KINDS code per segment
+        """
+        self.date = date
+        self._bounds = tuple(bounds)
+        self._kinds = kinds
+
+    @classmethod
+    def from_segments(cls, date: Optional[datetime], segments: Sequence[Tuple[datetime, datetime]],
+                      longitude: float = 0) -> "GoldenHours":
+        """Build from (start, end) segments, classifying each one."""
+        if not segments:
+            return cls(date, (), "")
+        day = date if date is not None else _utc(segments[0][0])
+        noon = solar_noon(day, longitude)
+        whole_day = (len(segments) == 1
+                     and segments[0][1] - segments[0][0] >= DAY - timedelta(seconds=1))
+        bounds = tuple(t for segment in segments for t in segment)
+        kinds = "".join(classify(start, end, noon, whole_day) for start, end in segments)
+        return cls(date, bounds, kinds)
+
+    @property
+    def segments(self) -> List[Tuple[datetime, datetime, str]]:
+        """(start, end, kind) for every segment, in order."""
+        bounds = self._bounds
+        return [(bounds[2 * i], bounds[2 * i + 1], KINDS[code])
+                for i, code in enumerate(self._kinds)]
+
+    @property
+    def durations(self) -> List[float]:
+        """Seconds in each segment."""
+        bounds = self._bounds
+        return [(bounds[i + 1] - bounds[i]).total_seconds() for i in range(0, len(bounds), 2)]
+
+    @property
+    def total_hours(self) -> float:
+        return sum(self.durations) / 3600
+
+    def of_kind(self, kind: str) -> List[Tuple[datetime, datetime]]:
+        """(start, end) of the segments of one kind."""
+        code = CODES[kind]
+        return [(self._bounds[2 * i], self._bounds[2 * i + 1])
+                for i, c in enumerate(self._kinds) if c == code]
+
+    def __len__(self) -> int:
+        return len(LEGACY_KEYS)
+
+    def __iter__(self):
+        return iter(LEGACY_KEYS)
+
+    def __getitem__(self, key: str) -> Optional[datetime]:
+        """The old dict interface: first segment in the morning slots, second in the evening."""
+        index = LEGACY_KEYS.index(key) if key in LEGACY_KEYS else None
+        if index is None:
+            raise KeyError(key)
+        return self._bounds[index] if index < len(self._bounds) else None
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, GoldenHours):
+            return self._bounds == other._bounds and self._kinds == other._kinds
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (GoldenHours, (self.date, self._bounds, self._kinds))
+
+    def __repr__(self) -> str:
+        date = self.date.strftime("%Y-%m-%d") if self.date else None
+        parts = ", ".join(f"{kind} {start.strftime('%H:%M:%S')}-{end.strftime('%H:%M:%S')}"
+                          for start, end, kind in self.segments)
+        return f"GoldenHours({date}: {parts or 'none'})"
+
+    def to_json(self) -> list:
+        """[date, [seconds after midnight, ...], kinds] (aware times keep their tz)."""
+        if not self._bounds:
+            return [self.date.isoformat() if self.date else None, [], ""]
+        first = self._bounds[0]
+        midnight = datetime.combine(self.date or first, datetime.min.time(),
+                                    tzinfo=first.tzinfo)
+        origin = _utc(midnight)
+        return [midnight.isoformat(),
+                [(_utc(t) - origin).total_seconds() for t in self._bounds], self._kinds]
+
+    @classmethod
+    def from_json(cls, value: list, tz=None) -> "GoldenHours":
+        """Inverse of to_json; aware times are given tz (a tzinfo) if passed."""
+        midnight_text, seconds, kinds = value
+        if midnight_text is None:
+            return cls(None, (), kinds)
+        midnight = datetime.fromisoformat(midnight_text)
+        date = midnight.replace(tzinfo=None)
+        bounds = tuple(midnight + timedelta(seconds=s) for s in seconds)
+        if tz is not None:
+            bounds = tuple(t.astimezone(tz) for t in bounds)
+        return cls(date, bounds, kinds)
+
+    def format_segments(self, time_format: str = "%H:%M", first: int = 0) -> str:
+        """"kind start-end" for each segment from first on, "; " separated, for CSV output."""
+        return "; ".join(f"{kind} {start.strftime(time_format)}-{end.strftime(time_format)}"
+                         for start, end, kind in self.segments[first:])
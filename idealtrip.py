@@ -1,22 +1,34 @@
 import csv
 import logging
+import multiprocessing
 import os
+import time
 from datetime import datetime, timedelta
-from typing import List, Tuple, Dict
+from multiprocessing.pool import ThreadPool
+from typing import List, NamedTuple, Optional, Tuple, Dict
+import cpus
 from astral import LocationInfo
-from astral.sun import elevation
+from boundary_solver import golden_hour_segments, golden_hours_range, resolve_timezone
+import result_cache
+import instrumentation
+import elevation_model
+from golden_hours import GoldenHours
+# solar_engine and lookup_table need NumPy, so they are imported by the
+# engines that use them rather than here
 
 # Constants
 INPUT_DIR = "data_input"
 OUTPUT_DIR = "data_output"
-PRECISION = 0.1  # minutes
+PRECISION = 1 / 60  # minutes; tolerance of each golden hour boundary
 GOLDEN_HOUR_MIN_ELEVATION = -4
 GOLDEN_HOUR_MAX_ELEVATION = 6
+ENGINES = ("astral", "numpy", "table")
+POOL_MODES = ("process", "thread", "serial")
+BATCH_CHUNKSIZE = 4  # rows handed to a worker at a time
 DATE_FORMAT = '%Y-%m-%d'
 TIME_FORMAT = '%Y%m%d%H%M%S'
 OUTPUT_TIME_FORMAT = '%H:%M'  # New constant for time output
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def read_latitude_data(filepath: str) -> List[Tuple[datetime, float]]:
@@ -50,53 +62,306 @@ def validate_latitude(latitude: float) -> None:
     if not -90 <= latitude <= 90:
         raise ValueError("Latitude must be between -90 and 90 degrees")
 
-def calculate_golden_hours(date: datetime, latitude: float) -> Dict:
+def golden_hours_from_segments(segments: List[Tuple[datetime, datetime]],
+                               date: Optional[datetime] = None,
+                               longitude: float = 0) -> GoldenHours:
+    """
+    Convert (start, end) segments into a GoldenHours result, keeping every
+    segment and classifying each as morning, evening, midday, midnight or
+    all day. It still reads like the old morning/evening dictionary, with
+    None for missing times.
+    """
+    return GoldenHours.from_segments(date, segments, longitude)
+
+def validate_longitude(longitude: float) -> None:
+    """Validate longitude is within valid range."""
+    if not isinstance(longitude, (int, float)):
+        raise TypeError("Longitude must be a number")
+    if not -180 <= longitude <= 180:
+        raise ValueError("Longitude must be between -180 and 180 degrees")
+
+def timezone_key(tz) -> Optional[str]:
+    """Name of a time zone for cache keys and output (None stays None)."""
+    tz = resolve_timezone(tz)
+    return None if tz is None else getattr(tz, "key", None) or str(tz)
+
+def table_available(longitude: float = 0, tz=None) -> bool:
+    """
+    Whether the default lookup table can answer: UTC days at longitude 0 and
+    a table has been built. Checked without importing lookup_table (NumPy).
+    """
+    return longitude == 0 and tz is None and os.path.exists(result_cache.table_path())
+
+def calculate_golden_hours(date: datetime, latitude: float, engine: str = "astral",
+                           longitude: float = 0, tz=None,
+                           correction: Optional[elevation_model.ElevationModel] = None
+                           ) -> GoldenHours:
     """
     Calculate golden hour times for given date and latitude.
-    Returns a dictionary with morning and evening start/end times.
+    Returns a GoldenHours with every segment of the day; it also reads like
+    a dictionary of morning and evening start/end times.
+
+    engine selects the elevation model: "astral" (boundary_solver) or
+    "numpy" (solar_engine), which agree to within a couple of seconds, or
+    "table", which interpolates from the prebuilt lookup_table (within
+    lookup_table.MAX_ERROR_MINUTES, exact near polar transitions). The
+    table only covers longitude 0.
+
+    With tz (a zoneinfo key such as "Europe/Oslo") the date is the local
+    calendar day, times are aware local datetimes and an evening golden
+    hour that runs past midnight is returned whole. Only the astral engine
+    supports time zones.
+
+    correction (an elevation_model.ElevationModel) measures the band edges
+    with another refraction formula or from a raised observer's horizon.
+    It moves the edges rather than correcting each sample, so it costs
+    nothing extra; the lookup table doesn't support it.
     """
     if not isinstance(date, datetime):
         raise TypeError("Date must be a datetime object")
     validate_latitude(latitude)
+    validate_longitude(longitude)
+    if engine not in ENGINES:
+        raise ValueError(f"Engine must be one of {ENGINES}")
+    tz = resolve_timezone(tz)
+    if tz is not None and engine != "astral":
+        raise ValueError("Only the astral engine supports time zones")
+    low, high = elevation_model.band_thresholds(GOLDEN_HOUR_MIN_ELEVATION,
+                                                GOLDEN_HOUR_MAX_ELEVATION, correction)
 
-    location = LocationInfo(
-        name="Custom Location", 
-        region="Custom Region", 
-        latitude=latitude, 
-        longitude=0
-    )
-    
-    start_time = datetime.combine(date, datetime.min.time())
-    end_time = datetime.combine(date, datetime.max.time())
-    current_time = start_time
-    gh_times = []
-
-    while current_time <= end_time:
-        current_elevation = elevation(location.observer, current_time)
-        
-        in_range = (GOLDEN_HOUR_MIN_ELEVATION <= current_elevation <= GOLDEN_HOUR_MAX_ELEVATION)
-        out_of_range = (current_elevation < GOLDEN_HOUR_MIN_ELEVATION or 
-                       current_elevation > GOLDEN_HOUR_MAX_ELEVATION)
-        
-        if current_time == start_time and in_range:
-            gh_times.append(current_time)
-        
-        if len(gh_times) % 2 == 0 and in_range:
-            gh_times.append(current_time)
-        elif len(gh_times) % 2 == 1 and out_of_range:
-            gh_times.append(current_time)
+    if engine == "table":
+        import lookup_table
+        if longitude != 0:
+            raise ValueError("Lookup table only covers longitude 0")
+        table = lookup_table.default_table()
+        if table is None:
+            raise FileNotFoundError(
+                f"{lookup_table.default_path()} not found; run lookup_table.py to build it")
+        if (table.min_elevation, table.max_elevation) != (low, high):
+            raise ValueError("Lookup table was built for different elevation thresholds")
+        return table.golden_hours(date, latitude)
+
+    def compute() -> GoldenHours:
+        with instrumentation.stage("calculate_golden_hours.location"):
+            location = LocationInfo(
+                name="Custom Location", 
+                region="Custom Region", 
+                latitude=latitude, 
+                longitude=longitude
+            )
         
-        current_time += timedelta(minutes=PRECISION)
+        if engine == "numpy":
+            import solar_engine
+            segments = solar_engine.golden_hour_segments(
+                [date],
+                [latitude],
+                longitude,
+                min_elevation=low,
+                max_elevation=high,
+                tolerance=PRECISION * 60
+            )[0][0]
+        else:
+            segments = golden_hour_segments(
+                location.observer,
+                date,
+                low,
+                high,
+                timedelta(minutes=PRECISION),
+                tz=tz,
+                whole_segments=tz is not None
+            )
+        return golden_hours_from_segments(segments, date, longitude)
 
-    if (GOLDEN_HOUR_MIN_ELEVATION <= elevation(location.observer, end_time) <= 
-        GOLDEN_HOUR_MAX_ELEVATION):
-        gh_times.append(end_time)
+    params = (
+        date.strftime(DATE_FORMAT), float(latitude), float(longitude),
+        GOLDEN_HOUR_MIN_ELEVATION,
+        GOLDEN_HOUR_MAX_ELEVATION, PRECISION, engine
+    )
+    if tz is not None:
+        params += (timezone_key(tz),)
+    if correction is not None:
+        params += (tuple(correction),)
+    return result_cache.cached(
+        "golden_hours", params, compute,
+        encode=GoldenHours.to_json,
+        decode=lambda value: GoldenHours.from_json(value, tz)
+    )
 
-    keys = ['morning_start', 'morning_end', 'evening_start', 'evening_end']
-    return {k: t for k, t in zip(keys, gh_times + [''] * (4 - len(gh_times)))}
+class BatchResult(NamedTuple):
+    """One row of golden_hours_batch output."""
+    date: datetime
+    latitude: float
+    longitude: float
+    times: GoldenHours
+    seconds: float  # time spent calculating this row
+    reused: bool  # True if an identical earlier row was calculated instead
+    timezone: Optional[str] = None  # zoneinfo key of local-time rows
+
+def _batch_worker(job: tuple) -> Tuple[GoldenHours, float, Dict]:
+    """
+    Calculate one unique (date, latitude, longitude, timezone, engine,
+    correction) row and time it. Also returns the worker's instrumentation stats (None when
+    off).
+    """
+    date, latitude, longitude, tz, engine, correction = job
+    start = time.perf_counter()
+    if engine != "astral" and (tz is not None or (engine == "table" and longitude != 0)):
+        engine = "astral"  # the table only covers longitude 0, only astral does time zones
+    if engine == "table" and correction is not None:
+        engine = "numpy"  # the table is for uncorrected edges
+    times = calculate_golden_hours(date, latitude, engine, longitude, tz, correction)
+    seconds = time.perf_counter() - start
+    instrumentation.add_time("calculate_golden_hours", seconds)
+    return times, seconds, instrumentation.collect()
+
+def golden_hours_batch(rows: List[Tuple], engine: str = "astral", mode: str = "process",
+                       workers: int = None, chunksize: int = BATCH_CHUNKSIZE,
+                       correction: Optional[elevation_model.ElevationModel] = None
+                       ) -> List[BatchResult]:
+    """
+    Calculate golden hours for many (date, latitude[, longitude[, tz]]) rows
+    at once.
+
+    Identical rows are only calculated once, and the unique rows are spread
+    over a process pool (or thread pool, or run serially). Results come back
+    in the same order as the input, one per row, including repeated dates.
+
+    Args:
+        rows: (date, latitude), (date, latitude, longitude) or (date,
+              latitude, longitude, tz) tuples, tz being a zoneinfo key or None
+        engine: As for calculate_golden_hours; rows the engine can't do
+                (away from longitude 0 for "table", with a time zone for
+                "table" and "numpy") are calculated with "astral", and
+                "table" rows with a correction with "numpy"
+        mode: "process", "thread" or "serial"
+        workers: Pool size (default: 80% of CPUs)
+        chunksize: Rows handed to a worker at a time
+        correction: Refraction and horizon dip model for every row, as for
+                    calculate_golden_hours
+
+    Returns:
+        list: A BatchResult for every input row, in input order
+    """
+    if mode not in POOL_MODES:
+        raise ValueError(f"Mode must be one of {POOL_MODES}")
+    if engine not in ENGINES:
+        raise ValueError(f"Engine must be one of {ENGINES}")
+
+    keys = []
+    for row in rows:
+        date, latitude = row[0], row[1]
+        longitude = row[2] if len(row) > 2 else 0
+        tz = timezone_key(row[3]) if len(row) > 3 else None
+        if not isinstance(date, datetime):
+            raise TypeError("Date must be a datetime object")
+        validate_latitude(latitude)
+        validate_longitude(longitude)
+        keys.append((date, float(latitude), float(longitude), tz))
+    unique = list(dict.fromkeys(keys))
+    jobs = [key + (engine, correction) for key in unique]
+
+    workers = workers or cpus.default_workers()
+    if mode == "serial" or workers == 1 or len(jobs) <= 1:
+        results = list(map(_batch_worker, jobs))
+    else:
+        pool_class = multiprocessing.Pool if mode == "process" else ThreadPool
+        with pool_class(processes=min(workers, len(jobs))) as pool:
+            # imap keeps the input order
+            results = list(pool.imap(_batch_worker, jobs, chunksize=chunksize))
+
+    for _, _, stats in results:
+        instrumentation.merge(stats)
+    by_key = dict(zip(unique, results))
+    output, seen = [], set()
+    for key in keys:
+        times, seconds, _ = by_key[key]
+        date, latitude, longitude, tz = key
+        output.append(BatchResult(date, latitude, longitude, times, seconds, key in seen, tz))
+        seen.add(key)
+
+    if output:
+        slowest = max(output, key=lambda result: result.seconds)
+        total = sum(seconds for _, seconds, _ in results)
+        logger.info(f"Batch of {len(output)} rows ({len(unique)} unique): "
+                    f"{total:.2f} s calculating, {total / len(unique) * 1000:.1f} ms per "
+                    f"unique row, slowest {slowest.date.strftime(DATE_FORMAT)} at "
+                    f"{slowest.latitude} ({slowest.seconds * 1000:.1f} ms)")
+    return output
+
+def _range_worker(job: tuple) -> Tuple[List[Tuple[datetime, GoldenHours]], Dict]:
+    """
+    Golden hours for every day of one location's date range, seeded day to
+    day by boundary_solver.golden_hours_range. Also returns the worker's
+    instrumentation stats.
+    """
+    start, end, latitude, longitude, tz = job
+    days = golden_hours_range(start, end, latitude, longitude, GOLDEN_HOUR_MIN_ELEVATION,
+                              GOLDEN_HOUR_MAX_ELEVATION, timedelta(minutes=PRECISION),
+                              tz=tz, whole_segments=tz is not None)
+    return ([(date, golden_hours_from_segments(segments, date, longitude))
+             for date, segments in days],
+            instrumentation.collect())
+
+def golden_hours_range_batch(locations: List[Tuple], start: datetime, end: datetime,
+                             mode: str = "process",
+                             workers: int = None) -> List[List[Tuple[datetime, GoldenHours]]]:
+    """
+    Golden hours for every day from start to end at many locations.
+
+    Each location's days are solved in one pass that seeds every day from
+    the one before, so a location anywhere (and in any time zone) costs
+    about as much as one at longitude 0. Locations are spread over a
+    process pool (or thread pool, or run serially).
+
+    Args:
+        locations: (latitude, longitude) or (latitude, longitude, tz)
+                   tuples, tz being a zoneinfo key; with a time zone the
+                   days are local days and times are aware local datetimes
+        start: First date
+        end: Last date (inclusive)
+        mode: "process", "thread" or "serial"
+        workers: Pool size (default: 80% of CPUs)
+
+    Returns:
+        list: For each location, in input order, a list of (date, times)
+              with times in the format of calculate_golden_hours
+    """
+    if mode not in POOL_MODES:
+        raise ValueError(f"Mode must be one of {POOL_MODES}")
+    jobs = []
+    for location in locations:
+        latitude, longitude = location[0], location[1]
+        tz = timezone_key(location[2]) if len(location) > 2 else None
+        validate_latitude(latitude)
+        validate_longitude(longitude)
+        jobs.append((start, end, float(latitude), float(longitude), tz))
+
+    workers = workers or cpus.default_workers()
+    if mode == "serial" or workers == 1 or len(jobs) <= 1:
+        results = list(map(_range_worker, jobs))
+    else:
+        pool_class = multiprocessing.Pool if mode == "process" else ThreadPool
+        with pool_class(processes=min(workers, len(jobs))) as pool:
+            results = list(pool.imap(_range_worker, jobs))
+    for _, stats in results:
+        instrumentation.merge(stats)
+    return [days for days, _ in results]
+
+def csv_row(result: BatchResult) -> List:
+    """
+    Output row for one batch result: the first two segments in the morning
+    and evening columns, any further ones (near the poles) as
+    "kind HH:MM-HH:MM" in the last column.
+    """
+    fmt = OUTPUT_TIME_FORMAT
+    times = result.times
+    return ([result.date.strftime(DATE_FORMAT), result.latitude]
+            + [t.strftime(fmt) if t else '' for t in times.values()]
+            + [times.format_segments(fmt, first=2)])
 
 def main():
     """Main program execution."""
+    instrumentation.start("idealtrip")
     try:
         script_dir = os.path.dirname(os.path.abspath(__file__))
         input_dir = os.path.join(script_dir, INPUT_DIR)
@@ -111,32 +376,33 @@ def main():
             f'GH_times_{datetime.now().strftime(TIME_FORMAT)}.csv'
         )
         
-        latitude_dates = read_latitude_data(input_file)
-        golden_hours = {
-            date: calculate_golden_hours(date, latitude) 
-            for date, latitude in latitude_dates
-        }
+        with instrumentation.stage("idealtrip.read"):
+            latitude_dates = read_latitude_data(input_file)
+        engine = "table" if table_available() else "astral"
+        # one output row per input row, so trips that cover several
+        # latitudes on the same date keep all of them
+        with instrumentation.stage("idealtrip.batch"):
+            golden_hours = golden_hours_batch(latitude_dates, engine)
         
-        with open(output_file, 'w', newline='') as file:
+        with instrumentation.stage("idealtrip.write"), \
+                open(output_file, 'w', newline='') as file:
             writer = csv.writer(file)
-            header = ['Date', 'Morning Start', 'Morning End', 'Evening Start', 'Evening End']
+            header = ['Date', 'Latitude', 'Morning Start', 'Morning End', 'Evening Start',
+                      'Evening End', 'Other Segments']
             writer.writerow(header)
             
-            for date, times in golden_hours.items():
-                fmt = OUTPUT_TIME_FORMAT
-                row = [
-                    date.strftime(DATE_FORMAT),
-                    times['morning_start'].strftime(fmt) if times['morning_start'] else '',
-                    times['morning_end'].strftime(fmt) if times['morning_end'] else '',
-                    times['evening_start'].strftime(fmt) if times['evening_start'] else '',
-                    times['evening_end'].strftime(fmt) if times['evening_end'] else ''
-                ]
-                writer.writerow(row)
+            for result in golden_hours:
+                writer.writerow(csv_row(result))
             
             logger.info(f"Output written to {output_file}")
+        
+        cache = result_cache.get_cache()
+        if cache is not None:
+            cache.log_stats()
     except Exception as e:
         logger.error(f"Program failed: {str(e)}")
         raise
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     main()
\ No newline at end of file
@@ -0,0 +1,255 @@
+"""
+Opt-in counters, stage timers and profiling for the golden hour scripts.
+
+Instrumentation is off unless GOLDENHOUR_PROFILE is set (to anything other
+than 0/off/false), or a script enables it from the command line (main.py
+--instrument). When it is off, count() and stage() return immediately, so
+the calls can stay in the hot paths.
+
+When it is on:
+- count(name) adds to a named counter, e.g. every astral elevation call
+  made by boundary_solver and every day it solves
+- stage(name) is a context manager that adds the time spent inside it to a
+  named stage, e.g. LocationInfo construction, cache lookups, CSV writes
+- start() at the top of a script's main() arranges for report() to run at
+  exit: a JSON report in data_output/ (or GOLDENHOUR_PROFILE_DIR) plus a
+  summary in the log, and with
+  GOLDENHOUR_PROFILE_DUMP=<file> (or main.py --profile <file>) a cProfile
+  dump that can be read with pstats
+
+Pool workers count in their own process; the scripts send collect() back
+with each task's result and merge() it into the parent's totals. Thread pool
+workers share the process's totals, so every update holds _lock.
+"""
+
+import atexit
+import contextlib
+import cProfile
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+ENV_VAR = "GOLDENHOUR_PROFILE"
+DUMP_ENV_VAR = "GOLDENHOUR_PROFILE_DUMP"
+DIR_ENV_VAR = "GOLDENHOUR_PROFILE_DIR"
+
+logger = logging.getLogger(__name__)
+
+
+def _env_enabled() -> bool:
+    return os.environ.get(ENV_VAR, "0").lower() not in ("", "0", "off", "false", "no")
+
+
+_enabled = _env_enabled()
+_counters = Counter()
+_stages = defaultdict(lambda: [0, 0.0])  # name -> [calls, seconds]
+_run = {}  # label, start time, report path and profiler of the running script
+_lock = threading.Lock()  # guards _counters and _stages
+_NULL_STAGE = contextlib.nullcontext()
+
+
+def enabled() -> bool:
+    """True when instrumentation is collecting."""
+    return _enabled
+
+
+def enable(profile_path: Optional[str] = None) -> None:
+    """
+    Turn instrumentation on for this process and any worker it starts.
+
+    Args:
+        profile_path: Also write a cProfile dump here at exit
+    """
+    global _enabled
+    _enabled = True
+    os.environ[ENV_VAR] = "1"
+    if profile_path:
+        os.environ[DUMP_ENV_VAR] = profile_path
+
+
+def count(name: str, n: int = 1) -> None:
+    """Add n to a named counter."""
+    if _enabled:
+        with _lock:
+            _counters[name] += n
+
+
+def counted(name: str, function: Callable) -> Callable:
+    """Wrap a function so every call adds to the named counter."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if _enabled:
+            with _lock:
+                _counters[name] += 1
+        return function(*args, **kwargs)
+    return wrapper
+
+
+def add_time(name: str, seconds: float) -> None:
+    """Add one call taking the given seconds to a named stage."""
+    if _enabled:
+        with _lock:
+            totals = _stages[name]
+            totals[0] += 1
+            totals[1] += seconds
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        add_time(self.name, time.perf_counter() - self.start)
+
+
+def stage(name: str):
+    """Context manager that adds its wall time to a named stage."""
+    return _Stage(name) if _enabled else _NULL_STAGE
+
+
+def collect() -> Optional[Dict]:
+    """
+    Take this process's counts and stage times, resetting them.
+
+    Returns:
+        dict: {"counters": ..., "stages": ...} to pass to merge() in the
+              parent process, or None when instrumentation is off
+    """
+    if not _enabled:
+        return None
+    with _lock:
+        stats = {"counters": dict(_counters),
+                 "stages": {k: list(v) for k, v in _stages.items()}}
+        _counters.clear()
+        _stages.clear()
+    return stats
+
+
+def merge(stats: Optional[Dict]) -> None:
+    """Add stats from collect() (usually from a worker) to this process's totals."""
+    if not stats:
+        return
+    with _lock:
+        _counters.update(stats["counters"])
+        for name, (calls, seconds) in stats["stages"].items():
+            totals = _stages[name]
+            totals[0] += calls
+            totals[1] += seconds
+
+
+def snapshot() -> Dict:
+    """Current totals as a JSON-serializable report."""
+    with _lock:
+        totals = {name: tuple(value) for name, value in _stages.items()}
+        counters = dict(sorted(_counters.items()))
+    stages = {name: {"calls": calls, "seconds": round(seconds, 6),
+                     "mean_ms": round(1000 * seconds / calls, 4) if calls else 0}
+              for name, (calls, seconds) in sorted(totals.items(),
+                                                   key=lambda item: -item[1][1])}
+    derived = {}
+    if counters.get("days"):
+        derived["elevations_per_day"] = round(counters.get("elevation", 0) / counters["days"], 2)
+    report = {"counters": counters, "stages": stages, "derived": derived}
+    if _run:
+        report = {"label": _run["label"], "pid": os.getpid(),
+                  "started": _run["started"].isoformat(timespec="seconds"),
+                  "wall_seconds": round(time.perf_counter() - _run["clock"], 6),
+                  **report}
+    return report
+
+
+def summary(report: Dict) -> str:
+    """Human-readable version of a report."""
+    lines = [f"Instrumentation report{' for ' + report['label'] if 'label' in report else ''}"]
+    if "wall_seconds" in report:
+        lines.append(f"  wall time {report['wall_seconds']:.3f} s")
+    for name, value in report["counters"].items():
+        lines.append(f"  {name:32} {value:>12,}")
+    for name, value in report["derived"].items():
+        lines.append(f"  {name:32} {value:>12}")
+    for name, stage_totals in report["stages"].items():
+        lines.append(f"  {name:32} {stage_totals['seconds']:>10.3f} s  "
+                     f"{stage_totals['calls']:>9,} calls  {stage_totals['mean_ms']:.3f} ms each")
+    return "\n".join(lines)
+
+
+def default_report_path(label: str) -> str:
+    """profile_<label>_<timestamp>.json in GOLDENHOUR_PROFILE_DIR or data_output."""
+    directory = os.environ.get(DIR_ENV_VAR)
+    if not directory:
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_output")
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    return os.path.join(directory, f"profile_{label}_{timestamp}.json")
+
+
+def start(label: str, report_path: Optional[str] = None) -> None:
+    """
+    Begin an instrumented run of a script, if instrumentation is on.
+
+    Starts cProfile when a dump file was requested and registers report()
+    to run at exit. Only the script's own process should call this.
+    """
+    if not _enabled or _run:
+        return
+    _run.update(label=label, started=datetime.now(), clock=time.perf_counter(),
+                report_path=report_path or default_report_path(label), profiler=None)
+    dump_path = os.environ.get(DUMP_ENV_VAR)
+    if dump_path:
+        _run["profiler"] = cProfile.Profile()
+        _run["profiler"].enable()
+    atexit.register(report)
+
+
+def report() -> Optional[Dict]:
+    """
+    Finish the run: write the JSON report and cProfile dump and log a summary.
+
+    Returns:
+        dict: The report, or None if no run was started
+    """
+    if not _run or _run.get("done"):
+        return None
+    _run["done"] = True
+    profiler = _run.get("profiler")
+    result = snapshot()
+    if profiler is not None:
+        profiler.disable()
+        dump_path = os.environ[DUMP_ENV_VAR]
+        profiler.dump_stats(dump_path)
+        result["profile"] = dump_path
+
+    path = _run["report_path"]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(result, file, indent=2)
+    logger.info(summary(result))
+    logger.info(f"Instrumentation report written to {path}")
+    return result
+
+
+def reset() -> None:
+    """Forget all counts, stages and the current run (mainly for tests)."""
+    with _lock:
+        _counters.clear()
+        _stages.clear()
+    _run.clear()
+
+
+def disable() -> None:
+    """Turn instrumentation off again."""
+    global _enabled
+    _enabled = False
+    os.environ.pop(ENV_VAR, None)
+    os.environ.pop(DUMP_ENV_VAR, None)
@@ -0,0 +1,223 @@
+"""
+Choose trip dates and overnight stops that maximize golden hour.
+
+Given a driving route (coordinates plus the cumulative travel time at each
+point, as routing.route returns), a window of possible start dates, a daily
+driving limit and a number of days, optimize_itinerary() picks the start date
+and the place to stop each night so that the total golden hour at the
+overnight stops is as long as possible.
+
+Candidate stops are points along the route every CANDIDATE_SPACING seconds of
+driving, plus the destination. Golden hour at each candidate latitude is
+looked up for every date in the window at once, from the lookup_table when
+it has been built and otherwise with solar_engine (latitudes rounded to
+LATITUDE_STEP, which changes durations by well under a minute).
+
+The search is dynamic programming over (day, stop), run for every start date
+at once: the best total for stopping at stop j on day d is the best total at
+any stop within one day's drive before j on day d - 1, plus the golden hour
+at j on that date. The "any stop within reach" maximum is a sliding window
+over the stops, answered for every stop with a sparse table, so a day costs
+O(starts x stops x log(stops)) array operations. Hundreds of stops over a
+multi-week window take a fraction of a second, mostly in the golden hour
+lookup.
+"""
+
+import math
+from datetime import datetime, timedelta
+from typing import Callable, List, NamedTuple, Optional, Sequence
+import numpy as np
+import lookup_table
+import routing
+import solar_engine
+
+CANDIDATE_SPACING = 15 * 60  # seconds of driving between candidate stops
+LATITUDE_STEP = 0.1  # degrees; latitudes are rounded to this for solar_engine
+DEFAULT_MAX_DRIVE_HOURS = 8.0
+
+DurationLookup = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+class Stop(NamedTuple):
+    """A candidate overnight stop along the route."""
+    time: float  # seconds of driving from the start
+    latitude: float
+    longitude: float
+
+
+class ItineraryDay(NamedTuple):
+    """One day of an itinerary: drive, then spend the night at stop."""
+    date: datetime
+    stop: Stop
+    drive_hours: float
+    golden_hours: float  # golden hour at the stop on this date
+
+
+class Itinerary(NamedTuple):
+    """Best start date and overnight stops."""
+    start_date: datetime
+    days: List[ItineraryDay]
+    total_golden_hours: float
+
+    def latitude_dates(self) -> List[tuple]:
+        """(date, latitude) of each night, as idealtrip.read_latitude_data returns them."""
+        return [(day.date, round(day.stop.latitude, routing.LATITUDE_DECIMALS))
+                for day in self.days]
+
+
+def candidate_stops(coordinates: Sequence[Sequence[float]], times: Sequence[float],
+                    spacing: float = CANDIDATE_SPACING) -> List[Stop]:
+    """Points every spacing seconds of driving along the route, start and end included."""
+    total = float(times[-1] - times[0])
+    count = max(1, math.ceil(total / spacing))
+    targets = [times[0] + min(k * spacing, total) for k in range(count + 1)]
+    return [Stop(point.time - times[0], point.latitude, point.longitude)
+            for point in routing.points_at(coordinates, times, targets)]
+
+
+def golden_hour_matrix(dates: np.ndarray, latitudes: np.ndarray,
+                       table: Optional[lookup_table.GoldenHourTable] = None) -> np.ndarray:
+    """
+    Golden hour hours for every date and latitude (longitude 0).
+
+    Uses the lookup table when it is available and was built for the
+    default thresholds, otherwise solar_engine on rounded latitudes.
+
+    Returns:
+        ndarray: Hours with shape (len(dates), len(latitudes))
+    """
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    table = table if table is not None else lookup_table.default_table()
+    if table is not None and (table.min_elevation, table.max_elevation) == (
+            solar_engine.MIN_ELEVATION, solar_engine.MAX_ELEVATION):
+        return table.durations(dates[:, None], latitudes[None, :])
+    rounded, inverse = np.unique(np.round(latitudes / LATITUDE_STEP) * LATITUDE_STEP,
+                                 return_inverse=True)
+    return solar_engine.golden_hour_durations(dates, rounded)[:, inverse.ravel()]
+
+
+def _window_max(values: np.ndarray, first: np.ndarray, last: np.ndarray):
+    """
+    Maximum of values[:, first[j]:last[j] + 1] for every j, and where it is.
+
+    values has shape (starts, stops); empty windows give -inf. Uses a
+    sparse table, so every window is answered with two lookups.
+    """
+    starts, count = values.shape
+    levels = [values.T]
+    positions = [np.broadcast_to(np.arange(count)[:, None], (count, starts))]
+    width = 1
+    while 2 * width <= count:
+        previous, where = levels[-1], positions[-1]
+        shifted = np.full_like(previous, -np.inf)
+        shifted[:count - width] = previous[width:]
+        shifted_where = np.zeros_like(where)
+        shifted_where[:count - width] = where[width:]
+        right = shifted > previous
+        levels.append(np.where(right, shifted, previous))
+        positions.append(np.where(right, shifted_where, where))
+        width *= 2
+    levels, positions = np.stack(levels), np.stack(positions)
+
+    length = last - first + 1
+    valid = length > 0
+    level = np.where(valid, np.floor(np.log2(np.maximum(length, 1))), 0).astype(int)
+    left = np.where(valid, first, 0)
+    right = np.where(valid, last - (1 << level) + 1, 0)
+    a, b = levels[level, left], levels[level, right]
+    use_b = b > a
+    best = np.where(use_b, b, a)
+    where = np.where(use_b, positions[level, right], positions[level, left])
+    best[~valid] = -np.inf
+    return best.T, where.T
+
+
+def optimize_itinerary(coordinates: Sequence[Sequence[float]], earliest_start: datetime,
+                       latest_start: datetime, times: Optional[Sequence[float]] = None,
+                       total_time: Optional[float] = None, num_days: Optional[int] = None,
+                       max_drive_hours: float = DEFAULT_MAX_DRIVE_HOURS,
+                       spacing: float = CANDIDATE_SPACING,
+                       durations: Optional[DurationLookup] = None) -> Itinerary:
+    """
+    Pick the start date and overnight stops with the most golden hour.
+
+    Every day the trip moves forward along the route by at most
+    max_drive_hours of driving and ends at a candidate stop; the last night
+    is spent at the destination.
+
+    Args:
+        coordinates: [latitude, longitude] of each route point
+        earliest_start: First possible start date
+        latest_start: Last possible start date
+        times: Cumulative travel time at each point (routing.Route.times);
+               without it total_time is spread evenly over the points
+        total_time: Route travel time in seconds, needed when times is None
+        num_days: Driving days (default: the fewest that fit the limit)
+        max_drive_hours: Daily driving limit
+        spacing: Seconds of driving between candidate stops
+        durations: Called with (dates, latitudes) arrays and returning hours
+                   of shape (len(dates), len(latitudes)) (default:
+                   golden_hour_matrix)
+
+    Returns:
+        Itinerary: The best start date and one ItineraryDay per day
+
+    Raises:
+        ValueError: If the route can't be driven in num_days within the limit
+    """
+    if times is None:
+        if total_time is None:
+            raise ValueError("Need either times or total_time")
+        last = max(len(coordinates) - 1, 1)
+        times = [total_time * i / last for i in range(len(coordinates))]
+    if latest_start < earliest_start:
+        raise ValueError("Latest start date is before the earliest")
+    if max_drive_hours <= 0:
+        raise ValueError("Daily driving limit must be positive")
+
+    limit = max_drive_hours * 3600
+    stops = candidate_stops(coordinates, times, min(spacing, limit))
+    stop_times = np.array([stop.time for stop in stops])
+    total = stop_times[-1]
+    fewest = max(1, math.ceil(total / limit - 1e-9))
+    num_days = num_days or fewest
+    if num_days < fewest:
+        raise ValueError(f"The route needs at least {fewest} days at "
+                         f"{max_drive_hours} hours a day")
+    if num_days > len(stops) - 1:
+        raise ValueError(f"Only {len(stops) - 1} stretches between candidate stops; "
+                         f"use a smaller spacing for {num_days} days")
+
+    starts = (latest_start.date() - earliest_start.date()).days + 1
+    first_date = np.datetime64(earliest_start.date(), "D")
+    dates = first_date + np.arange(starts + num_days - 1)
+    hours = (durations or golden_hour_matrix)(dates, np.array([s.latitude for s in stops]))
+
+    # stop j can be reached in a day from stops first[j] .. j - 1
+    first = np.searchsorted(stop_times, stop_times - limit - 1e-6, side="left")
+    last = np.arange(len(stops)) - 1
+    best = np.full((starts, len(stops)), -np.inf)
+    best[:, 0] = 0.0
+    parents = []
+    for day in range(num_days):
+        reached, parent = _window_max(best, first, last)
+        best = reached + hours[day:day + starts]
+        parents.append(parent)
+
+    totals = best[:, -1]
+    start = int(np.argmax(totals))  # earliest start among ties
+    if not np.isfinite(totals[start]):
+        raise ValueError("No itinerary fits the daily driving limit")
+
+    path = [len(stops) - 1]
+    for parent in reversed(parents):
+        path.append(int(parent[start, path[-1]]))
+    path.reverse()
+    start_date = datetime.combine(earliest_start.date(), datetime.min.time()) + \
+        timedelta(days=start)
+    days = [ItineraryDay(start_date + timedelta(days=day), stops[j],
+                         (stops[j].time - stops[i].time) / 3600,
+                         float(hours[start + day, j]))
+            for day, (i, j) in enumerate(zip(path, path[1:]))]
+    return Itinerary(start_date, days, float(totals[start]))
@@ -0,0 +1,121 @@
+"""
+Light phases as elevation bands, calculated together.
+
+A Band is a named range of solar elevation: golden hour (-4 to 6 degrees),
+blue hour (-6 to -4), civil, nautical and astronomical twilight, or any
+custom range ("name:min:max" on the command line). Elevations are the ones
+astral reports (with refraction), like the golden hour band everywhere else.
+
+All bands of a day come from a single search: boundary_solver.band_segments
+and solar_engine.band_durations bracket every band edge on the same set of
+elevation samples, and only the refinement of each crossing is per band.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from astral import Observer
+import boundary_solver
+import elevation_model
+import solar_engine
+from golden_hours import GoldenHours
+
+
+class Band(NamedTuple):
+    """A named range of solar elevation."""
+    name: str
+    min_elevation: float  # degrees
+    max_elevation: float  # degrees
+
+
+PRESETS = {
+    "golden": Band("golden", -4, 6),
+    "blue": Band("blue", -6, -4),
+    "civil": Band("civil", -6, 0),
+    "nautical": Band("nautical", -12, -6),
+    "astronomical": Band("astronomical", -18, -12),
+}
+GOLDEN = PRESETS["golden"]
+
+
+def parse_band(text: str) -> Band:
+    """
+    A preset name ("blue"), or "name:min:max", or "min:max" (named after
+    its range).
+    """
+    if text in PRESETS:
+        return PRESETS[text]
+    parts = text.split(":")
+    if len(parts) == 2:
+        parts = [text] + parts
+    if len(parts) != 3:
+        raise ValueError(f"Unknown band {text!r}: use one of {sorted(PRESETS)} or name:min:max")
+    try:
+        band = Band(parts[0], float(parts[1]), float(parts[2]))
+    except ValueError:
+        raise ValueError(f"Band {text!r} needs numeric elevations") from None
+    validate_bands([band])
+    return band
+
+
+def validate_bands(bands: Sequence[Band]) -> None:
+    """Raise ValueError for no bands, an empty range or a repeated name."""
+    if not bands:
+        raise ValueError("Need at least one band")
+    for band in bands:
+        if not band.min_elevation < band.max_elevation:
+            raise ValueError(f"Band {band.name!r}: minimum elevation must be below maximum")
+    names = [band.name for band in bands]
+    if len(set(names)) != len(names):
+        raise ValueError("Band names must be unique")
+
+
+def edges(bands: Sequence[Band],
+          correction: Optional[elevation_model.ElevationModel] = None) -> List[Tuple[float, float]]:
+    """(min, max) of each band, moved for the refraction/dip model if one is given."""
+    return [elevation_model.band_thresholds(band.min_elevation, band.max_elevation, correction)
+            for band in bands]
+
+
+def band_segments(date: datetime, latitude: float, bands: Sequence[Band] = (GOLDEN,),
+                  longitude: float = 0, tz=None,
+                  correction: Optional[elevation_model.ElevationModel] = None,
+                  tolerance: timedelta = boundary_solver.TOLERANCE) -> Dict[str, GoldenHours]:
+    """
+    Every segment of every band on one day.
+
+    Args:
+        date: The day (a local day when tz is given)
+        latitude: Latitude in degrees
+        bands: Bands to calculate
+        longitude: Longitude in degrees, east positive
+        tz: Time zone (zoneinfo key or tzinfo); segments crossing local
+            midnight are then kept whole, as in calculate_golden_hours
+        correction: Refraction and horizon dip model for the band edges
+        tolerance: Maximum error of each boundary
+
+    Returns:
+        dict: GoldenHours for each band name, in the order of bands
+    """
+    validate_bands(bands)
+    observer = Observer(latitude=latitude, longitude=longitude)
+    tz = boundary_solver.resolve_timezone(tz)
+    results = boundary_solver.band_segments(observer, date, edges(bands, correction),
+                                            tolerance, tz, whole_segments=tz is not None)
+    return {band.name: GoldenHours.from_segments(date, segments, longitude)
+            for band, segments in zip(bands, results)}
+
+
+def band_durations(dates, latitudes, bands: Sequence[Band] = (GOLDEN,), longitudes=0.0,
+                   correction: Optional[elevation_model.ElevationModel] = None,
+                   step: float = solar_engine.GRID_STEP,
+                   tolerance: float = solar_engine.TOLERANCE) -> np.ndarray:
+    """
+    Hours in each band for every date and latitude (UTC days), with solar_engine.
+
+    Returns:
+        ndarray: Hours with shape (len(bands), len(dates), len(latitudes))
+    """
+    validate_bands(bands)
+    return solar_engine.band_durations(dates, latitudes, longitudes, edges(bands, correction),
+                                       step, tolerance)
@@ -0,0 +1,261 @@
+"""
+Precomputed latitude x day-of-year golden hour lookup table.
+
+At longitude 0 and a fixed pair of thresholds, golden hour duration and
+start/end times are smooth functions of latitude and day of the year, so they
+can be computed once on a dense grid (0.1 degrees x 367 days by default) with
+solar_engine and then answered by bilinear interpolation.
+
+The table is stored as a float32 .npy file (memory-mapped on load) with a
+.json sidecar holding the grid and thresholds. Each cell holds
+[hours, boundary 1..4 in minutes after midnight, number of boundaries].
+
+Dates from other years are mapped onto the table by their position in the
+tropical year, so a table built for one year serves any nearby year.
+
+Interpolation is only trusted where every cell around the query point has the
+same kind of day (same number of segments, same segments touching midnight)
+and the corner boundary times are close together (MAX_SPREAD). Elsewhere,
+which means near the polar transitions where a segment appears, disappears or
+runs into midnight, the query falls back to the exact boundary_solver. Within
+the trusted region the interpolated boundaries are within MAX_ERROR_MINUTES
+of the exact ones (durations within about a minute in total).
+
+Build the default table with:
+    python lookup_table.py
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+import numpy as np
+from astral import Observer
+from boundary_solver import golden_hour_segments
+from golden_hours import GoldenHours
+import result_cache
+import solar_engine
+
+LATITUDE_STEP = 0.1  # degrees
+TABLE_YEAR = 2023
+TABLE_DAYS = 367  # one extra row so the last fractional day can interpolate
+TROPICAL_YEAR = 365.2422  # days
+MAX_SPREAD = 20.0  # minutes between corner cells before falling back
+MAX_ERROR_MINUTES = 0.5
+CHUNK = 60  # latitudes per solar_engine call while building
+
+HOURS, COUNT = 0, 5
+BOUNDARIES = slice(1, 5)
+
+logger = logging.getLogger(__name__)
+
+
+def default_path() -> str:
+    """Location of the default table, in the result cache directory."""
+    return result_cache.table_path()
+
+
+class GoldenHourTable:
+    """Golden hour durations and boundaries on a latitude x day grid."""
+
+    def __init__(self, data: np.ndarray, latitude_start: float, latitude_step: float,
+                 year: int = TABLE_YEAR, min_elevation: float = solar_engine.MIN_ELEVATION,
+                 max_elevation: float = solar_engine.MAX_ELEVATION):
+        self.data = data
+        self.latitude_start = latitude_start
+        self.latitude_step = latitude_step
+        self.year = year
+        self.min_elevation = min_elevation
+        self.max_elevation = max_elevation
+        self._stable = None
+
+    @property
+    def latitudes(self) -> np.ndarray:
+        return self.latitude_start + self.latitude_step * np.arange(self.data.shape[0])
+
+    @classmethod
+    def build(cls, latitude_start: float = -90.0, latitude_end: float = 90.0,
+              latitude_step: float = LATITUDE_STEP, year: int = TABLE_YEAR,
+              min_elevation: float = solar_engine.MIN_ELEVATION,
+              max_elevation: float = solar_engine.MAX_ELEVATION) -> "GoldenHourTable":
+        """
+        Compute a table with solar_engine.
+
+        Args:
+            latitude_start: First latitude row in degrees
+            latitude_end: Last latitude row in degrees (inclusive)
+            latitude_step: Spacing of the latitude rows in degrees
+            year: Year whose January 1st is the first day column
+            min_elevation: Lower edge of the band in degrees
+            max_elevation: Upper edge of the band in degrees
+
+        Returns:
+            GoldenHourTable: The new table (not yet saved)
+        """
+        count = int(round((latitude_end - latitude_start) / latitude_step)) + 1
+        latitudes = latitude_start + latitude_step * np.arange(count)
+        days = np.datetime64(f"{year}-01-01") + np.arange(TABLE_DAYS)
+
+        data = np.empty((count, TABLE_DAYS, 6), dtype=np.float32)
+        for first in range(0, count, CHUNK):
+            chunk = latitudes[first:first + CHUNK]
+            times, counts = solar_engine.golden_hour_boundaries(
+                days, chunk, 0.0, min_elevation, max_elevation)
+            padded = np.nan_to_num(times)
+            # pairs of (start, end) boundaries beyond the first two segments
+            # are rare enough to leave to the exact fallback
+            hours = ((padded[..., 1] - padded[..., 0]) + (padded[..., 3] - padded[..., 2])) / 3600
+            data[first:first + CHUNK, :, HOURS] = hours.T
+            data[first:first + CHUNK, :, BOUNDARIES] = (times / 60).transpose(1, 0, 2)
+            data[first:first + CHUNK, :, COUNT] = counts.T
+        return cls(data, float(latitude_start), float(latitude_step), year,
+                   min_elevation, max_elevation)
+
+    def save(self, path: str) -> None:
+        """Write the table as .npy plus a .json sidecar with the grid."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.save(path, self.data)
+        with open(os.path.splitext(path)[0] + ".json", "w") as file:
+            json.dump({
+                "latitude_start": self.latitude_start,
+                "latitude_step": self.latitude_step,
+                "year": self.year,
+                "min_elevation": self.min_elevation,
+                "max_elevation": self.max_elevation,
+            }, file)
+
+    @classmethod
+    def load(cls, path: str) -> "GoldenHourTable":
+        """Memory-map a table written by save()."""
+        with open(os.path.splitext(path)[0] + ".json") as file:
+            meta = json.load(file)
+        return cls(np.load(path, mmap_mode="r"), **meta)
+
+    def query(self, dates, latitudes):
+        """
+        Interpolate durations and boundaries for many (date, latitude) pairs.
+
+        Args:
+            dates: Array-like of dates (broadcast against latitudes)
+            latitudes: Array-like of latitudes in degrees
+
+        Returns:
+            tuple: (hours, boundaries in minutes after midnight with shape
+                   (..., 4), safe) where safe is False wherever the value is
+                   outside the table or too close to a polar transition to
+                   interpolate
+        """
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        dates, latitudes = np.broadcast_arrays(dates, latitudes)
+
+        offset = (dates - np.datetime64(f"{self.year}-01-01")).astype(np.float64)
+        position = np.mod(offset, TROPICAL_YEAR)
+        day = np.minimum(np.floor(position).astype(int), self.data.shape[1] - 2)
+        day_fraction = (position - day)[..., None]
+
+        row = (latitudes - self.latitude_start) / self.latitude_step
+        inside = (row >= 0) & (row <= self.data.shape[0] - 1)
+        lat = np.clip(np.floor(row).astype(int), 0, self.data.shape[0] - 2)
+        lat_fraction = np.clip(row - lat, 0.0, 1.0)[..., None]
+
+        corners = np.stack([self.data[lat, day], self.data[lat, day + 1],
+                            self.data[lat + 1, day], self.data[lat + 1, day + 1]])
+        weights = np.stack([(1 - lat_fraction) * (1 - day_fraction),
+                            (1 - lat_fraction) * day_fraction,
+                            lat_fraction * (1 - day_fraction),
+                            lat_fraction * day_fraction])
+        values = (corners * weights).sum(axis=0)
+
+        stable = self.stable
+        spread = np.nan_to_num(corners[..., BOUNDARIES].max(axis=0)
+                               - corners[..., BOUNDARIES].min(axis=0))
+        safe = (inside
+                & stable[lat, day] & stable[lat, day + 1]
+                & stable[lat + 1, day] & stable[lat + 1, day + 1]
+                & np.all(spread < MAX_SPREAD, axis=-1))
+        return values[..., HOURS], values[..., BOUNDARIES], safe
+
+    @property
+    def stable(self) -> np.ndarray:
+        """
+        Cells whose whole 3x3 neighbourhood has the same kind of day.
+
+        The kind of day is the number of boundaries plus whether the day
+        starts or ends inside the band. Where it changes (a segment appears,
+        disappears or reaches midnight) boundary times vary like a square
+        root and linear interpolation breaks down, so cells next to such a
+        change are not interpolated.
+        """
+        if self._stable is None:
+            count = self.data[..., COUNT]
+            boundaries = self.data[..., BOUNDARIES]
+            starts_in_band = boundaries[..., 0] == 0
+            ends_in_band = np.nanmax(np.where(np.isnan(boundaries), 0, boundaries), axis=-1) >= 1439.99
+            kind = count + 8 * starts_in_band + 16 * ends_in_band + 32 * (count > 4)
+            padded = np.pad(kind, 1, mode="edge")
+            stable = np.ones(kind.shape, dtype=bool)
+            for dlat in range(3):
+                for dday in range(3):
+                    stable &= padded[dlat:dlat + kind.shape[0], dday:dday + kind.shape[1]] == kind
+            self._stable = stable & (count <= 4)
+        return self._stable
+
+    def golden_hours(self, date: datetime, latitude: float) -> GoldenHours:
+        """
+        Golden hour times in the format of idealtrip.calculate_golden_hours.
+
+        Interpolates from the table, falling back to boundary_solver where
+        interpolation isn't trusted.
+        """
+        _, boundaries, safe = self.query(date, latitude)
+        day_start = datetime.combine(date, datetime.min.time())
+        if safe:
+            times = [day_start + timedelta(minutes=float(m)) for m in boundaries
+                     if not np.isnan(m)]
+            # boundaries at midnight are exact, not interpolated
+            times = [min(t, datetime.combine(date, datetime.max.time())) for t in times]
+        else:
+            segments = golden_hour_segments(Observer(latitude=latitude, longitude=0), date,
+                                            self.min_elevation, self.max_elevation)
+            times = [t for segment in segments for t in segment]
+        return GoldenHours.from_segments(date, list(zip(times[::2], times[1::2])))
+
+    def durations(self, dates, latitudes) -> np.ndarray:
+        """Golden hour hours for many (date, latitude) pairs, exact where needed."""
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        dates, latitudes = np.broadcast_arrays(dates, latitudes)
+        hours, _, safe = self.query(dates, latitudes)
+        hours = np.array(hours, dtype=np.float64)
+        for index in zip(*np.nonzero(~safe)):
+            segments = golden_hour_segments(
+                Observer(latitude=float(latitudes[index]), longitude=0),
+                dates[index].astype(datetime), self.min_elevation, self.max_elevation)
+            hours[index] = sum((end - start).total_seconds() for start, end in segments) / 3600
+        return hours
+
+
+_default_table = {}
+
+
+def default_table() -> Optional[GoldenHourTable]:
+    """Load the default table once per process, or None if it hasn't been built."""
+    path = default_path()
+    if path not in _default_table:
+        _default_table[path] = GoldenHourTable.load(path) if os.path.exists(path) else None
+    return _default_table[path]
+
+
+def main():
+    """Build and save the default table."""
+    logging.basicConfig(level=logging.INFO)
+    start_time = datetime.now()
+    table = GoldenHourTable.build()
+    table.save(default_path())
+    logger.info(f"Wrote {default_path()} {table.data.shape} in {datetime.now() - start_time}")
+
+
+if __name__ == "__main__":
+    main()
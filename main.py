@@ -10,20 +10,56 @@ The output file includes:
 - Daily golden hour durations for each latitude
 - Dates in YYYY-MM-DD format
 - Durations in decimal hours
+
+Latitudes, longitude, year, thresholds and precision can be set from the
+command line (see python main.py --help); without options it runs
+DESIRED_LATITUDES for 2023 at longitude 0. --refraction and --height switch
+to another refraction formula or a raised observer (see elevation_model.py).
+--bands calculates several light phases (blue hour, twilights or custom
+elevation ranges) in the same pass and writes one row per date and band.
 """
 
+import csv
 import multiprocessing
-from astral import LocationInfo
-from astral.sun import elevation
+from functools import partial
+from multiprocessing.pool import ThreadPool
+from typing import List, NamedTuple, Optional, Tuple
+import time
+from astral import LocationInfo, Observer
 from datetime import datetime, timedelta
-import csv  # todo: use pandas for xlsx
+from boundary_solver import band_segments, golden_hour_segments
+import elevation_model
+import light_bands
+import solar_engine
+import result_cache
+import duration_output
+import instrumentation
+import argparse
+import logging
 import os
-import psutil
+import cpus
 
-PRECISION = 1  # minutes
+PRECISION = 1 / 60  # minutes; tolerance of each golden hour boundary
+YEAR = 2023
+MIN_ELEVATION = -4  # degrees
+MAX_ELEVATION = 6  # degrees
+ENGINES = ("astral", "numpy")
+POOL_MODES = ("process", "thread", "serial")
+CHUNK_DAYS = 28  # days per task; small enough to keep every core busy
+CHUNKSIZE = 1  # tasks handed to a worker at a time
 DESIRED_LATITUDES = [59.91, 59.13, 59.97, 61.9, 63.25, 65.46, 66.74, 67.96, 69.49, 70.51, 70.2,
                      70.2, 68.55, 65.32, 62.52, 60.99, 59.91]
 
+class RunSettings(NamedTuple):
+    """Everything besides latitude and date that determines a duration."""
+    year: int = YEAR
+    longitude: float = 0.0
+    min_elevation: float = MIN_ELEVATION
+    max_elevation: float = MAX_ELEVATION
+    precision: float = PRECISION  # minutes
+    correction: Optional[elevation_model.ElevationModel] = None  # refraction, horizon dip
+    bands: Tuple[light_bands.Band, ...] = ()  # several bands instead of min/max elevation
+
 def validate_latitude(latitude: float) -> None:
     """Validate latitude is within valid range."""
     if not isinstance(latitude, (int, float)):
@@ -31,13 +67,41 @@ def validate_latitude(latitude: float) -> None:
     if not -90 <= latitude <= 90:
         raise ValueError("Latitude must be between -90 and 90 degrees")
 
-def twilight_hours_day(latitude: float, date: datetime) -> float:
+def validate_settings(settings: RunSettings) -> None:
+    """Validate longitude, thresholds and precision."""
+    if not -180 <= settings.longitude <= 180:
+        raise ValueError("Longitude must be between -180 and 180 degrees")
+    if not settings.min_elevation < settings.max_elevation:
+        raise ValueError("Minimum elevation must be below maximum elevation")
+    if not settings.precision > 0:
+        raise ValueError("Precision must be positive")
+    if settings.correction is not None:
+        settings.correction.validate()
+    if settings.bands:
+        light_bands.validate_bands(settings.bands)
+
+def days_in_year(year: int) -> int:
+    """Number of days in the year (366 in leap years)."""
+    return (datetime(year + 1, 1, 1) - datetime(year, 1, 1)).days
+
+def twilight_hours_day(latitude: float, date: datetime, longitude: float = 0,
+                       min_elevation: float = MIN_ELEVATION,
+                       max_elevation: float = MAX_ELEVATION,
+                       precision: float = PRECISION,
+                       correction: Optional[elevation_model.ElevationModel] = None) -> float:
     """
     Calculate total golden hour duration for a specific date and latitude.
     
     Args:
         latitude: Location's latitude in degrees (-90 to 90)
         date: Date to calculate golden hour for
+        longitude: Location's longitude in degrees, east positive
+        min_elevation: Lower edge of the golden hour band in degrees
+        max_elevation: Upper edge of the golden hour band in degrees
+        precision: Tolerance of each boundary in minutes
+        correction: Refraction formula and observer height the band edges
+                    are measured with (default: astral's refraction at sea
+                    level); applied to the edges, not to every sample
     
     Returns:
         float: Total hours of golden hour conditions, rounded to 2 decimals
@@ -45,56 +109,121 @@ def twilight_hours_day(latitude: float, date: datetime) -> float:
     validate_latitude(latitude)
     if not isinstance(date, datetime):
         raise TypeError("Date must be a datetime object")
+    low, high = elevation_model.band_thresholds(min_elevation, max_elevation, correction)
+    
+    def compute() -> float:
+        # Create a location to pass to astral.sun.elevation
+        with instrumentation.stage("twilight_hours_day.location"):
+            location = LocationInfo(
+                name="Custom Location",
+                region="Custom Region", 
+                latitude=latitude,
+                longitude=longitude
+            )
+        # find when the sun enters and leaves the golden hour band and add
+        # up the time spent inside it
+        with instrumentation.stage("twilight_hours_day.solve"):
+            segments = golden_hour_segments(location.observer, date, low, high,
+                                            timedelta(minutes=precision))
+        total_minutes = sum((end - start).total_seconds() / 60 for start, end in segments)
+        return round(total_minutes / 60, 2)
+    
+    # reuse the result of an earlier run if the persistent cache has it
+    params = (date.strftime("%Y-%m-%d"), float(latitude), float(longitude),
+              min_elevation, max_elevation, precision)
+    if correction is not None:
+        params += (tuple(correction),)
+    return result_cache.cached("twilight_hours_day", params, compute)
+
+def band_hours_day(latitude: float, date: datetime, bands: Tuple[light_bands.Band, ...],
+                   longitude: float = 0, precision: float = PRECISION,
+                   correction: Optional[elevation_model.ElevationModel] = None) -> List[float]:
+    """
+    Calculate the hours spent in each of several elevation bands on one day.
+    
+    Every band comes from the same search of the day (see light_bands.py),
+    so several bands cost little more than twilight_hours_day.
+    
+    Args:
+        latitude: Location's latitude in degrees (-90 to 90)
+        date: Date to calculate for
+        bands: light_bands.Band of each band
+        longitude: Location's longitude in degrees, east positive
+        precision: Tolerance of each boundary in minutes
+        correction: Refraction and horizon dip model for the band edges
+    
+    Returns:
+        list: Hours in each band, in order, rounded to 2 decimals
+    """
+    validate_latitude(latitude)
+    if not isinstance(date, datetime):
+        raise TypeError("Date must be a datetime object")
+    edges = light_bands.edges(bands, correction)
     
-    # Create a location to pass to astral.sun.elevation
-    location = LocationInfo(
-        name="Custom Location",
-        region="Custom Region", 
-        latitude=latitude,
-        longitude=0
-    )
-    start_time = datetime.combine(date, datetime.min.time())
-    end_time = datetime.combine(date, datetime.max.time())
-    
-    current_time = start_time
-    total_minutes = 0
-    
-    #loop through the day in increments of PRECISION minutes
-    while current_time <= end_time:
-        # todo: add refraction correction. Can only be accurately done
-        # when sun is 5 or more degrees above the horizon, so will only
-        # help with calculating when sun crosses the 6 degree point
-        
-        # find the elevation of the sun at the current time
-        elev = elevation(location.observer, current_time)  
-        
-        # if the sun is currently in the range, add the time slice to the sum
-        if -4 <= elev <= 6:
-            total_minutes += PRECISION
-            
-        # move to the next time slice
-        current_time += timedelta(minutes=PRECISION)
-    
-    return round(total_minutes / 60, 2)
-
-def twilight_hours_year(latitude: float) -> list:
+    def compute() -> List[float]:
+        with instrumentation.stage("band_hours_day.solve"):
+            results = band_segments(Observer(latitude, longitude), date, edges,
+                                    timedelta(minutes=precision))
+        return [round(sum((end - start).total_seconds() for start, end in segments) / 3600, 2)
+                for segments in results]
+    
+    params = (date.strftime("%Y-%m-%d"), float(latitude), float(longitude),
+              [tuple(band) for band in bands], precision)
+    if correction is not None:
+        params += (tuple(correction),)
+    return result_cache.cached("band_hours_day", params, compute)
+
+def day_hours(latitude: float, date: datetime, settings: RunSettings = RunSettings()):
+    """
+    Hours for one day under settings: a float for the min/max elevation band,
+    or a list with one entry per band when settings.bands is set.
+    """
+    if settings.bands:
+        return band_hours_day(latitude, date, settings.bands, settings.longitude,
+                              settings.precision, settings.correction)
+    return twilight_hours_day(latitude, date, settings.longitude, settings.min_elevation,
+                              settings.max_elevation, settings.precision, settings.correction)
+
+def twilight_hours_year(latitude: float, engine: str = "astral",
+                        settings: RunSettings = RunSettings()) -> list:
     """
     Calculate golden hour durations for an entire year at given latitude.
-    Uses 2023 as the base year.
+    Uses settings.year (2023 by default) as the base year.
     
     Args:
         latitude: Location's latitude in degrees (-90 to 90)
+        engine: "astral" solves each day with twilight_hours_day; "numpy"
+                solves the whole year at once with solar_engine
+        settings: Year, longitude, thresholds and precision
     
     Returns:
-        list: 365 entries of [date, latitude, hours] for each day of year
+        list: 365 (or 366) entries of [date, latitude, hours] for each day of
+              year (hours is a list per band when settings.bands is set)
     """
     validate_latitude(latitude)
-    data = []
-    for x in range(365):
-        date = datetime(2023, 1, 1) + timedelta(x)
-        hours_in_range = twilight_hours_day(latitude, date)
-        data.append([date.strftime('%Y-%m-%d'), latitude, hours_in_range])
-    return data
+    validate_settings(settings)
+    if engine not in ENGINES:
+        raise ValueError(f"Engine must be one of {ENGINES}")
+    dates = [datetime(settings.year, 1, 1) + timedelta(x)
+             for x in range(days_in_year(settings.year))]
+    
+    if engine == "numpy" and settings.bands:
+        hours = light_bands.band_durations(
+            dates, [latitude], settings.bands, settings.longitude, settings.correction,
+            tolerance=settings.precision * 60
+        )[:, :, 0].T.round(2).tolist()
+    elif engine == "numpy":
+        low, high = elevation_model.band_thresholds(
+            settings.min_elevation, settings.max_elevation, settings.correction)
+        hours = solar_engine.golden_hour_durations(
+            dates, [latitude], settings.longitude, low, high,
+            tolerance=settings.precision * 60
+        )[:, 0].round(2).tolist()
+    else:
+        hours = [day_hours(latitude, date, settings) for date in dates]
+    
+    return [[date.strftime('%Y-%m-%d'), float(latitude), hours_in_range]
+            for date, hours_in_range in zip(dates, hours)]
 
 def process_latitude(latitude: float) -> list:
     """
@@ -107,17 +236,133 @@ def process_latitude(latitude: float) -> list:
         list: Results from twilight_hours_year for the given latitude
     """
     validate_latitude(latitude)
-    return twilight_hours_year(latitude)
+    data = twilight_hours_year(latitude)
+    
+    # each worker process has its own cache connection and counters
+    cache = result_cache.get_cache()
+    if cache is not None:
+        cache.log_stats(f"Latitude {latitude}")
+    return data
+
+def make_tasks(latitudes: list, num_days: int = 365, chunk_days: int = CHUNK_DAYS,
+               first_day: int = 0) -> list:
+    """
+    Split the work into (latitude, first_day, num_days) tasks.
+    
+    Duplicate latitudes are only computed once, and each latitude's year is
+    cut into chunks so there are enough tasks to keep every worker busy.
+    Tasks are ordered day chunk first, so the earliest dates complete first
+    and can be written while later ones are still running.
+    
+    Args:
+        latitudes: Latitudes in degrees, possibly with duplicates
+        num_days: Number of days from January 1st to cover
+        chunk_days: Days per task
+        first_day: Day of the year to start from (0 = January 1st), used
+                   when resuming an interrupted run
+    
+    Returns:
+        list: Task tuples, ordered by day chunk then latitude
+    """
+    if chunk_days < 1:
+        raise ValueError("chunk_days must be at least 1")
+    unique_latitudes = list(dict.fromkeys(latitudes))
+    for latitude in unique_latitudes:
+        validate_latitude(latitude)
+    tasks = []
+    for chunk_start in range(first_day, num_days, chunk_days):
+        for latitude in unique_latitudes:
+            tasks.append((latitude, chunk_start, min(chunk_days, num_days - chunk_start)))
+    return tasks
 
-def create_filename() -> str:
+def process_chunk(task: tuple, settings: RunSettings = RunSettings()) -> tuple:
+    """
+    Worker function for one (latitude, first_day, num_days) task.
+    
+    Args:
+        task: Tuple from make_tasks
+        settings: Year, longitude, thresholds and precision for the run
+    
+    Returns:
+        tuple: (task, rows of [date, latitude, hours], seconds spent,
+                cache hits, cache misses, instrumentation stats or None)
+    """
+    latitude, first_day, num_days = task
+    start = time.perf_counter()
+    cache = result_cache.get_cache()
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    
+    rows = []
+    for x in range(first_day, first_day + num_days):
+        date = datetime(settings.year, 1, 1) + timedelta(x)
+        hours_in_range = day_hours(latitude, date, settings)
+        rows.append([date.strftime('%Y-%m-%d'), float(latitude), hours_in_range])
+    
+    if cache is not None:
+        hits, misses = cache.hits - hits, cache.misses - misses
+    seconds = time.perf_counter() - start
+    instrumentation.add_time("process_chunk", seconds)
+    return task, rows, seconds, hits, misses, instrumentation.collect()
+
+def run_tasks(tasks: list, mode: str = "process", workers: int = 1,
+              chunksize: int = CHUNKSIZE, settings: RunSettings = RunSettings()):
+    """
+    Run tasks and yield results as they complete (in no particular order).
+    
+    Args:
+        tasks: Tasks from make_tasks
+        mode: "process" for a process pool, "thread" for a thread pool or
+              "serial" to run in this process
+        workers: Pool size (ignored in serial mode)
+        chunksize: Tasks handed to a worker at a time
+        settings: Passed to every process_chunk call
+    
+    Yields:
+        tuple: Results of process_chunk
+    """
+    if mode not in POOL_MODES:
+        raise ValueError(f"Mode must be one of {POOL_MODES}")
+    worker = partial(process_chunk, settings=settings)
+    if mode == "serial":
+        yield from map(worker, tasks)
+        return
+    
+    pool_class = multiprocessing.Pool if mode == "process" else ThreadPool
+    with pool_class(processes=workers) as pool:
+        yield from pool.imap_unordered(worker, tasks, chunksize=chunksize)
+
+def scaling_report(mode: str, workers: int, num_tasks: int, wall_seconds: float,
+                   busy_seconds: float, hits: int, misses: int) -> str:
+    """
+    Summarize how well the run used its workers.
+    
+    Speedup is the total time spent inside tasks divided by the wall time;
+    efficiency is the speedup divided by the number of workers.
+    """
+    workers = 1 if mode == "serial" else workers
+    speedup = busy_seconds / wall_seconds if wall_seconds else 0
+    efficiency = 100 * speedup / workers
+    return (f"Scaling report: {num_tasks} tasks on {workers} {mode} worker(s)\n"
+            f"  wall time {wall_seconds:.2f} s, task time {busy_seconds:.2f} s\n"
+            f"  speedup {speedup:.2f}x, efficiency {efficiency:.0f}%\n"
+            f"  result cache {hits} hits, {misses} misses")
+
+def default_workers() -> int:
+    """Use 80% of available CPUs, but at least 1."""
+    return cpus.default_workers()
+
+def create_filename(extension: str = ".csv") -> str:
     """
     Create output directory and generate timestamped filename.
     
     Creates 'data_output' directory if it doesn't exist and generates a 
     unique filename using current timestamp.
     
+    Args:
+        extension: File extension of the output format
+    
     Returns:
-        str: Full path to output CSV file
+        str: Full path to output file
     """
     # Create output directory if it doesn't exist
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -126,51 +371,197 @@ def create_filename() -> str:
     
     # Generate timestamped filename
     timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    filename = os.path.join(output_dir, f"GH_duration_fullyear_{timestamp}.csv")
+    filename = os.path.join(output_dir, f"GH_duration_fullyear_{timestamp}{extension}")
     
     return filename
 
-def main():
+def latitude_range(start: float, stop: float, step: float) -> list:
+    """Latitudes from start to stop (inclusive) every step degrees."""
+    if step <= 0:
+        raise ValueError("Latitude step must be positive")
+    count = int((stop - start) / step + 1e-9) + 1
+    return [round(start + i * step, 6) for i in range(max(count, 0))]
+
+def read_latitude_file(path: str) -> list:
+    """
+    Read latitudes from a file.
+    
+    Either one latitude per line, or a CSV with a Latitude column such as
+    data_input/latitude_dates.csv. Degree signs, blank lines and lines
+    starting with # are ignored.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as file:
+        rows = [row for row in csv.reader(file)
+                if row and row[0].strip() and not row[0].startswith('#')]
+    column = 0
+    if rows and 'Latitude' in rows[0]:
+        column = rows[0].index('Latitude')
+        rows = rows[1:]
+    return [float(row[column].replace('\u00B0', '').strip()) for row in rows]
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    latitudes = parser.add_mutually_exclusive_group()
+    latitudes.add_argument("--latitudes", type=float, nargs="+", metavar="LAT",
+                           help="latitudes in degrees (default: DESIRED_LATITUDES)")
+    latitudes.add_argument("--lat-range", type=float, nargs=3,
+                           metavar=("START", "STOP", "STEP"),
+                           help="latitudes from START to STOP inclusive every STEP degrees")
+    latitudes.add_argument("--lat-file", help="file with one latitude per line, or a "
+                                              "CSV with a Latitude column")
+    parser.add_argument("--longitude", type=float, default=0.0,
+                        help="longitude in degrees, east positive (default: 0)")
+    parser.add_argument("--year", type=int, default=YEAR,
+                        help=f"year to calculate, 366 days in leap years (default: {YEAR})")
+    parser.add_argument("--min-elevation", type=float, default=MIN_ELEVATION,
+                        help=f"lower edge of golden hour in degrees (default: {MIN_ELEVATION})")
+    parser.add_argument("--max-elevation", type=float, default=MAX_ELEVATION,
+                        help=f"upper edge of golden hour in degrees (default: {MAX_ELEVATION})")
+    parser.add_argument("--precision", type=float, default=PRECISION,
+                        help="tolerance of each boundary in minutes (default: 1 second)")
+    parser.add_argument("--bands", nargs="+", metavar="BAND",
+                        help="calculate several bands in one pass, one output row per "
+                             "date and band: presets "
+                             f"({', '.join(light_bands.PRESETS)}) or name:min:max "
+                             "(replaces --min-elevation/--max-elevation)")
+    parser.add_argument("--refraction", choices=elevation_model.MODELS, default="astral",
+                        help="refraction formula for the band edges; bennett and "
+                             "saemundsson only apply above "
+                             f"{elevation_model.CUTOFF:g} degrees (default: astral)")
+    parser.add_argument("--height", type=float, default=0.0, metavar="METRES",
+                        help="observer height above the visible horizon, which dips "
+                             "the horizon (default: 0)")
+    parser.add_argument("--pressure", type=float, default=elevation_model.STANDARD_PRESSURE,
+                        help="air pressure in hPa for bennett and saemundsson "
+                             f"(default: {elevation_model.STANDARD_PRESSURE:g})")
+    parser.add_argument("--temperature", type=float,
+                        default=elevation_model.STANDARD_TEMPERATURE,
+                        help="air temperature in degrees C for bennett and saemundsson "
+                             f"(default: {elevation_model.STANDARD_TEMPERATURE:g})")
+    parser.add_argument("--workers", type=int,
+                        help="number of workers (default: 80%% of CPUs)")
+    parser.add_argument("--mode", choices=POOL_MODES, default="process",
+                        help="run on a process pool, thread pool or serially "
+                             "(default: process)")
+    parser.add_argument("--chunk-days", type=int, default=CHUNK_DAYS,
+                        help=f"days per task (default: {CHUNK_DAYS})")
+    parser.add_argument("--output", help="output file (default: timestamped file "
+                                         "in data_output)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted run in --output from its "
+                             "last complete date")
+    parser.add_argument("--format", dest="output_format", default="csv",
+                        choices=duration_output.FORMATS,
+                        help="output format; columnar picks parquet when pyarrow "
+                             "is installed, else npz (default: csv)")
+    parser.add_argument("--instrument", action="store_true",
+                        help="count elevation calls, time each stage and write a "
+                             "report to data_output at exit (same as "
+                             f"{instrumentation.ENV_VAR}=1)")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="also write a cProfile dump to FILE (implies --instrument)")
+    args = parser.parse_args(argv)
+    
+    try:
+        if args.lat_range:
+            args.latitudes = latitude_range(*args.lat_range)
+        elif args.lat_file:
+            args.latitudes = read_latitude_file(args.lat_file)
+        for latitude in args.latitudes or []:
+            validate_latitude(latitude)
+        correction = None
+        if args.refraction != "astral" or args.height:
+            correction = elevation_model.ElevationModel(
+                args.refraction, args.height, args.pressure, args.temperature)
+        bands = ()
+        if args.bands:
+            if (args.min_elevation, args.max_elevation) != (MIN_ELEVATION, MAX_ELEVATION):
+                raise ValueError("use either --bands or --min-elevation/--max-elevation")
+            bands = tuple(light_bands.parse_band(band) for band in args.bands)
+        args.settings = RunSettings(args.year, args.longitude, args.min_elevation,
+                                    args.max_elevation, args.precision, correction, bands)
+        validate_settings(args.settings)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if args.latitudes == []:
+        parser.error("no latitudes given")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    return args
+
+def main(mode: str = "process", workers: int = None, chunk_days: int = CHUNK_DAYS,
+         chunksize: int = CHUNKSIZE, output: str = None, resume: bool = False,
+         output_format: str = "csv", latitudes: list = None,
+         settings: RunSettings = RunSettings()):
     """
     Main program execution.
     
-    1. Sets up multiprocessing pool based on CPU count
-    2. Processes all latitudes in parallel
-    3. Combines results into a single dataset
-    4. Writes results to CSV with timestamps
-    5. Reports total execution time
+    1. Splits the unique latitudes into (latitude, day-chunk) tasks
+    2. Runs the tasks on a process pool, thread pool or serially
+    3. Writes each date to CSV as soon as every latitude has finished it
+       (columnar formats write the whole grid once it is complete)
+    4. Reports total execution time and how well the workers scaled
+    
+    With resume, an existing CSV output file is continued from the day after
+    its last complete date instead of being started over.
+    
+    Latitudes default to DESIRED_LATITUDES and settings to 2023, longitude
+    0, -4 to 6 degrees and PRECISION. With settings.bands every date gets
+    one row per band.
     """
     start_time = datetime.now()
-    latitudes = DESIRED_LATITUDES
-    
-    # Use 80% of available CPUs, but at least 1
-    num_cpus = max(1, int(psutil.cpu_count() * 0.8))
-    
-    with multiprocessing.Pool(processes=num_cpus) as pool:
-        results = pool.map(process_latitude, latitudes)
-    
-    # Combine results into a single dataset
-    all_data = {}
-    for data in results:
-        for entry in data:
-            date, latitude, hours = entry[0], entry[1], entry[2]
-            if date not in all_data:
-                all_data[date] = {}
-            all_data[date][latitude] = hours
-    
-    # Write results to CSV
-    with open(create_filename(), mode='w', newline='') as file:
-        writer = csv.writer(file)
-        header = ["Date"] + [f"{lat}\u00B0" for lat in latitudes]
-        writer.writerow(header)
-        
-        for date, lat_data in all_data.items():
-            row = [date] + [lat_data.get(lat, 0) for lat in latitudes]
-            writer.writerow(row)
+    instrumentation.start("main")
+    latitudes = latitudes or DESIRED_LATITUDES
+    validate_settings(settings)
+    year_start = datetime(settings.year, 1, 1)
+    workers = workers or default_workers()
+    if resume and not output:
+        raise ValueError("resume needs the output file of the interrupted run")
+    output_format = duration_output.resolve_format(output_format)
+    if resume and output_format != "csv":
+        raise ValueError("Only CSV output can be resumed")
+    output = output or create_filename(duration_output.EXTENSIONS[output_format])
+    band_names = [band.name for band in settings.bands] or None
+    
+    first_day = 0
+    if resume and os.path.exists(output):
+        last_date = duration_output.last_complete_date(output, latitudes, band_names)
+        if last_date is not None and last_date.year != settings.year:
+            raise ValueError(f"{output} holds dates from {last_date.year}, not {settings.year}")
+        if last_date is not None:
+            first_day = (last_date - year_start).days + 1
+            print(f"Resuming {output} after {last_date.strftime('%Y-%m-%d')}")
+    
+    tasks = make_tasks(latitudes, days_in_year(settings.year), chunk_days, first_day)
+    buffer = duration_output.ReorderBuffer(latitudes, [task[1] for task in tasks])
+    
+    busy_seconds, hits, misses = 0.0, 0, 0
+    wall_start = time.perf_counter()
+    with duration_output.open_writer(output, latitudes, output_format, resume,
+                                     band_names) as writer:
+        results = run_tasks(tasks, mode, workers, chunksize, settings)
+        for task, rows, seconds, task_hits, task_misses, stats in results:
+            busy_seconds += seconds
+            hits += task_hits
+            misses += task_misses
+            instrumentation.merge(stats)
+            with instrumentation.stage("main.write"):
+                writer.write(buffer.add(task, rows))
+    wall_seconds = time.perf_counter() - wall_start
+    instrumentation.add_time("main.run_tasks", wall_seconds)
     
     # Report total execution time
     end_time = datetime.now()
+    print(scaling_report(mode, workers, len(tasks), wall_seconds, busy_seconds, hits, misses))
+    print(f"Output written to {output}")
     print(f"Elapsed time: {end_time - start_time}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    if args.instrument or args.profile:
+        instrumentation.enable(args.profile)
+    main(mode=args.mode, workers=args.workers, chunk_days=args.chunk_days,
+         output=args.output, resume=args.resume, output_format=args.output_format,
+         latitudes=args.latitudes, settings=args.settings)
\ No newline at end of file
@@ -0,0 +1,426 @@
+"""
+Local HTTP/JSON service for golden hour queries.
+
+Every run of GH_daterange, idealtrip.py or main.py pays for importing
+astral, starting a pool and calculating its answers from scratch. The
+service pays for that once: it keeps a pool of workers running and
+remembers recent answers, so planning tools can ask it hundreds of
+questions a second over plain HTTP on localhost.
+
+Endpoints (GET, parameters in the query string, JSON responses):
+    /golden_hours  date (YYYY-MM-DD), latitude; optional longitude, tz
+                   (e.g. Europe/Oslo) and engine (astral, numpy or table)
+    /durations     latitude; optional year, longitude, engine (numpy by
+                   default) and bands (comma-separated light_bands presets
+                   or name:min:max)
+    /azimuth       latitude, longitude; optional target (degrees, 90 by
+                   default), event (rise or set) and year
+    /stats         request, cache and batch counters
+
+Requests that arrive together are batched: the ones queued within
+BATCH_WINDOW seconds (at most BATCH_SIZE) are shared out between the workers
+as a few pool tasks instead of one task each, and identical requests that
+are waiting or running share one calculation. The last CACHE_SIZE answers
+are kept in memory, in front of the persistent result_cache the workers
+use. Bad parameters give a 400 with an "error" message.
+
+Run python query_service.py [--port 8765] [--mode process] [--workers N].
+python -m bench.load_test measures it.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import signal
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from http import HTTPStatus
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+from astral import Observer
+import east_west_rise_set
+import idealtrip
+import light_bands
+import main
+
+HOST = "127.0.0.1"
+PORT = 8765
+POOL_MODES = ("process", "thread", "serial")
+BATCH_SIZE = 64  # jobs collected before a batch is sent without waiting
+BATCH_WINDOW = 0.002  # seconds a job waits for others to join its batch
+CACHE_SIZE = 10_000  # responses kept in memory
+MAX_HEADERS = 100
+DATE_FORMAT = "%Y-%m-%d"
+WARM_UP = ("/golden_hours", ("2023-06-21", 45.0, 0.0, None, "astral"))
+
+logger = logging.getLogger(__name__)
+
+Job = Tuple[str, tuple]  # (endpoint, parameters)
+Response = Tuple[int, bytes]  # (HTTP status, JSON body)
+
+_REQUIRED = object()
+
+
+def _encode(value) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def _error(status: int, message: str) -> Response:
+    return status, _encode({"error": message})
+
+
+def _number(query: Dict[str, str], name: str, default=_REQUIRED, kind: Callable = float):
+    """A numeric query parameter, or default when it's missing."""
+    if name not in query:
+        if default is _REQUIRED:
+            raise ValueError(f"Missing parameter: {name}")
+        return default
+    try:
+        return kind(query[name])
+    except ValueError:
+        raise ValueError(f"Parameter {name} must be a number") from None
+
+
+def _parse_golden_hours(query: Dict[str, str]) -> tuple:
+    date = query.get("date")
+    if date is None:
+        raise ValueError("Missing parameter: date")
+    try:
+        date = datetime.strptime(date, DATE_FORMAT).strftime(DATE_FORMAT)
+    except ValueError:
+        raise ValueError("Parameter date must be YYYY-MM-DD") from None
+    return (date, _number(query, "latitude"), _number(query, "longitude", 0.0),
+            query.get("tz") or None, query.get("engine", "astral"))
+
+
+def _parse_durations(query: Dict[str, str]) -> tuple:
+    bands = query.get("bands")
+    bands = tuple(light_bands.parse_band(name) for name in bands.split(",")) if bands else ()
+    if bands:
+        light_bands.validate_bands(bands)
+    return (_number(query, "latitude"), _number(query, "year", main.YEAR, int),
+            _number(query, "longitude", 0.0), query.get("engine", "numpy"), bands)
+
+
+def _parse_azimuth(query: Dict[str, str]) -> tuple:
+    return (_number(query, "latitude"), _number(query, "longitude"),
+            _number(query, "target", 90.0), query.get("event", "rise"),
+            _number(query, "year", datetime.now().year, int))
+
+
+def _golden_hours(date: str, latitude: float, longitude: float, tz: Optional[str],
+                  engine: str) -> Dict:
+    result = idealtrip.calculate_golden_hours(datetime.strptime(date, DATE_FORMAT), latitude,
+                                              engine, longitude, tz)
+    segments = [{"start": start.isoformat(), "end": end.isoformat(), "kind": kind}
+                for start, end, kind in result.segments]
+    return {"date": date, "latitude": latitude, "longitude": longitude, "tz": tz,
+            "segments": segments, "total_hours": round(result.total_hours, 4)}
+
+
+def _durations(latitude: float, year: int, longitude: float, engine: str,
+               bands: Tuple[light_bands.Band, ...]) -> Dict:
+    settings = main.RunSettings(year=year, longitude=longitude, bands=bands)
+    rows = main.twilight_hours_year(latitude, engine, settings)
+    result = {"latitude": latitude, "year": year, "longitude": longitude,
+              "dates": [row[0] for row in rows], "hours": [row[2] for row in rows]}
+    if bands:
+        result["bands"] = [band.name for band in bands]
+    return result
+
+
+def _azimuth(latitude: float, longitude: float, target: float, event: str, year: int) -> Dict:
+    idealtrip.validate_latitude(latitude)
+    idealtrip.validate_longitude(longitude)
+    days = east_west_rise_set.azimuth_crossings(Observer(latitude, longitude), target,
+                                                event, year)
+    crossings = [{"date": day.date.strftime(DATE_FORMAT), "time": day.time.isoformat(),
+                  "azimuth": round(day.azimuth, 4), "difference": round(day.difference, 4)}
+                 for day in days]
+    return {"latitude": latitude, "longitude": longitude, "target": target, "event": event,
+            "year": year, "crossings": crossings}
+
+
+ENDPOINTS: Dict[str, Tuple[Callable[[Dict[str, str]], tuple], Callable[..., Dict]]] = {
+    "/golden_hours": (_parse_golden_hours, _golden_hours),
+    "/durations": (_parse_durations, _durations),
+    "/azimuth": (_parse_azimuth, _azimuth),
+}
+
+
+def _run_batch(jobs: List[Job]) -> List[Response]:
+    """Answer a batch of jobs in a worker; each job gets its own status."""
+    responses = []
+    for path, params in jobs:
+        try:
+            responses.append((200, _encode(ENDPOINTS[path][1](*params))))
+        except (ValueError, TypeError) as e:
+            responses.append(_error(400, str(e)))
+        except Exception as e:  # one failing query mustn't fail the rest of its batch
+            logger.exception(f"{path} {params} failed")
+            responses.append(_error(500, f"{type(e).__name__}: {e}"))
+    return responses
+
+
+class LRUCache:
+    """Least recently used responses, kept in memory."""
+
+    def __init__(self, size: int = CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Job, Response]" = OrderedDict()
+
+    def get(self, key: Job) -> Optional[Response]:
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Job, value: Response) -> None:
+        if self.size <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Batcher:
+    """
+    Collects jobs that arrive together and runs them as a few pool tasks.
+
+    A job waits at most `window` seconds for others; the batch is then split
+    evenly between the workers. Identical jobs that are still waiting or
+    running share one future.
+    """
+
+    def __init__(self, executor: Optional[Executor], workers: int = 1,
+                 size: int = BATCH_SIZE, window: float = BATCH_WINDOW):
+        self.executor = executor
+        self.workers = workers
+        self.size = size
+        self.window = window
+        self.batches = 0  # pool tasks sent
+        self.jobs = 0  # jobs calculated
+        self.shared = 0  # jobs answered by an identical job in flight
+        self._queue: List[Job] = []
+        self._futures: Dict[Job, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def submit(self, job: Job) -> Response:
+        future = self._futures.get(job)
+        if future is not None:
+            self.shared += 1
+        else:
+            loop = asyncio.get_running_loop()
+            future = self._futures[job] = loop.create_future()
+            self._queue.append(job)
+            if len(self._queue) >= self.size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        jobs, self._queue = self._queue, []
+        step = max(1, -(-len(jobs) // self.workers))
+        for i in range(0, len(jobs), step):
+            batch = jobs[i:i + step]
+            self.batches += 1
+            self.jobs += len(batch)
+            if self.executor is None:
+                self._finish(batch, _run_batch(batch))
+            else:
+                task = asyncio.get_running_loop().run_in_executor(self.executor,
+                                                                  _run_batch, batch)
+                task.add_done_callback(partial(self._task_done, batch))
+
+    def _task_done(self, batch: List[Job], task: asyncio.Future) -> None:
+        try:
+            responses = task.result()
+        except Exception as e:  # e.g. a worker process died
+            responses = [_error(500, f"{type(e).__name__}: {e}")] * len(batch)
+        self._finish(batch, responses)
+
+    def _finish(self, batch: List[Job], responses: List[Response]) -> None:
+        for job, response in zip(batch, responses):
+            future = self._futures.pop(job)
+            if not future.done():
+                future.set_result(response)
+
+
+def _response(status: int, body: bytes, close: bool) -> bytes:
+    head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+class QueryService:
+    """The HTTP server with its worker pool, batcher and response cache."""
+
+    def __init__(self, host: str = HOST, port: int = PORT, mode: str = "process",
+                 workers: int = None, batch_size: int = BATCH_SIZE,
+                 batch_window: float = BATCH_WINDOW, cache_size: int = CACHE_SIZE):
+        if mode not in POOL_MODES:
+            raise ValueError(f"Mode must be one of {POOL_MODES}")
+        self.host = host
+        self.port = port
+        self.mode = mode
+        self.workers = 1 if mode == "serial" else workers or main.default_workers()
+        self.requests = 0
+        self.cache = LRUCache(cache_size)
+        self._batch_size = batch_size
+        self._batch_window = batch_window
+        self._executor: Optional[Executor] = None
+        self._batcher: Optional[Batcher] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> int:
+        """Start the pool, warm it up and listen; returns the port."""
+        if self.mode == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        elif self.mode == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._batcher = Batcher(self._executor, self.workers, self._batch_size,
+                                self._batch_window)
+        if self._executor is not None:
+            # start every worker (and its imports) before the first request
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[loop.run_in_executor(self._executor, _run_batch, [WARM_UP])
+                                   for _ in range(self.workers)])
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    def statistics(self) -> Dict:
+        batcher = self._batcher
+        return {"mode": self.mode, "workers": self.workers, "requests": self.requests,
+                "cache_hits": self.cache.hits, "cache_misses": self.cache.misses,
+                "cached": len(self.cache), "batches": batcher.batches if batcher else 0,
+                "calculated": batcher.jobs if batcher else 0,
+                "shared": batcher.shared if batcher else 0}
+
+    async def query(self, path: str, query: Dict[str, str]) -> Response:
+        """Answer one request from the cache or through the batcher."""
+        self.requests += 1
+        if path == "/stats":
+            return 200, _encode(self.statistics())
+        if path not in ENDPOINTS:
+            return _error(404, f"Unknown endpoint: {path}")
+        try:
+            job = (path, ENDPOINTS[path][0](query))
+        except ValueError as e:
+            return _error(400, str(e))
+        response = self.cache.get(job)
+        if response is None:
+            response = await self._batcher.submit(job)
+            if response[0] != 500:
+                self.cache.put(job, response)
+        return response
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve the requests of one connection, keeping it open between them."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                parts = line.decode("latin-1").split()
+                headers = {}
+                for _ in range(MAX_HEADERS):
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if len(parts) != 3 or not headers.get("content-length", "0").isdigit():
+                    writer.write(_response(*_error(400, "Malformed request"), close=True))
+                    break
+                method, target, version = parts
+                await reader.readexactly(int(headers.get("content-length", "0")))
+                close = version != "HTTP/1.1" or headers.get("connection", "").lower() == "close"
+                if method != "GET":
+                    status, body = _error(405, "Only GET is supported")
+                else:
+                    url = urlsplit(target)
+                    status, body = await self.query(url.path, dict(parse_qsl(url.query)))
+                writer.write(_response(status, body, close))
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(service: QueryService) -> None:
+    """Run the service until it's interrupted or terminated."""
+    await service.start()
+    print(f"Serving on http://{service.host}:{service.port} "
+          f"({service.mode}, {service.workers} workers)", flush=True)
+    stop = asyncio.get_running_loop().create_future()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.cancel)
+    except (NotImplementedError, AttributeError):  # Windows
+        pass
+    serving = asyncio.ensure_future(service.serve_forever())
+    try:
+        await asyncio.wait([serving, stop], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        serving.cancel()
+        await service.close()
+
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=HOST, help=f"address to listen on (default: {HOST})")
+    parser.add_argument("--port", type=int, default=PORT,
+                        help=f"port to listen on, 0 for any free one (default: {PORT})")
+    parser.add_argument("--mode", choices=POOL_MODES, default="process",
+                        help="run calculations on a process pool (default), a thread "
+                             "pool or in the server itself")
+    parser.add_argument("--workers", type=int, help="pool size (default: 80%% of CPUs)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"most requests in one batch (default: {BATCH_SIZE})")
+    parser.add_argument("--batch-window", type=float, default=BATCH_WINDOW,
+                        help=f"seconds a request waits for others to batch with "
+                             f"(default: {BATCH_WINDOW})")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE,
+                        help=f"responses kept in memory (default: {CACHE_SIZE})")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    try:
+        asyncio.run(serve(QueryService(args.host, args.port, args.mode, args.workers,
+                                       args.batch_size, args.batch_window, args.cache_size)))
+    except KeyboardInterrupt:
+        pass
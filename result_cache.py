@@ -0,0 +1,200 @@
+"""
+Persistent cache of golden hour results.
+
+Results are stored in a small SQLite database under data_output/.cache, keyed
+by a hash of everything that determines them: the function, date, latitude,
+longitude, elevation thresholds and precision. Entries are evicted least
+recently used first once the cache holds more than MAX_ENTRIES results, and
+the whole cache is cleared when ALGORITHM_VERSION changes.
+
+Environment variables:
+    GOLDENHOUR_CACHE: set to 0/off/false to disable the cache
+    GOLDENHOUR_CACHE_DIR: directory for the database (default
+                          data_output/.cache next to this file)
+
+Each process (and thread) keeps its own hit/miss counters; log_stats() writes
+them to the log.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional
+import instrumentation
+
+# Bump whenever a change to boundary_solver/solar_engine changes results
+ALGORITHM_VERSION = "2"
+MAX_ENTRIES = 200_000
+EVICT_EVERY = 500  # puts between size checks
+DB_NAME = "golden_hours.sqlite"
+TABLE_FILE = "golden_hour_table.npy"  # lookup_table's precomputed table
+
+logger = logging.getLogger(__name__)
+
+
+def default_directory() -> str:
+    """Cache directory from GOLDENHOUR_CACHE_DIR or data_output/.cache."""
+    directory = os.environ.get("GOLDENHOUR_CACHE_DIR")
+    if directory:
+        return directory
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(script_dir, "data_output", ".cache")
+
+
+def table_path() -> str:
+    """Location of lookup_table's default table, next to the database."""
+    return os.path.join(default_directory(), TABLE_FILE)
+
+
+def make_key(namespace: str, params: tuple) -> str:
+    """Content address for a result: hash of version, function and inputs."""
+    payload = json.dumps([ALGORITHM_VERSION, namespace, list(params)], default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """SQLite-backed LRU cache of JSON-serializable results."""
+
+    def __init__(self, path: str, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, value TEXT, last_access REAL)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS results_lru ON results (last_access)")
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE name = 'version'").fetchone()
+            if row is None or row[0] != ALGORITHM_VERSION:
+                self._conn.execute("DELETE FROM results")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('version', ?)", (ALGORITHM_VERSION,))
+
+    def get(self, namespace: str, params: tuple) -> Optional[Any]:
+        """Return the cached value, or None (and count a miss) if absent."""
+        key = make_key(namespace, params)
+        row = self._conn.execute(
+            "SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self._conn:
+            self._conn.execute(
+                "UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, namespace: str, params: tuple, value: Any) -> None:
+        """Store a JSON-serializable value, evicting old entries if needed."""
+        key = make_key(namespace, params)
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()))
+        self._puts += 1
+        if self._puts % EVICT_EVERY == 1:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop least recently used entries beyond max_entries."""
+        count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN "
+                "(SELECT key FROM results ORDER BY last_access LIMIT ?)", (excess,))
+        return excess
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def log_stats(self, label: str = "") -> None:
+        """Log the hit/miss counters for this process."""
+        total = self.hits + self.misses
+        rate = 100 * self.hits / total if total else 0
+        prefix = f"{label}: " if label else ""
+        logger.info(f"{prefix}result cache {self.hits} hits, {self.misses} misses "
+                    f"({rate:.0f}% hit rate)")
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+_local = threading.local()
+_inherited = []  # connections copied from the parent by fork; never used or closed
+
+
+def per_thread(path: str, factory: Callable[[str], Any]) -> Any:
+    """
+    The calling thread's open cache for a database file, created with
+    factory(path) on first use.
+
+    The caches live in thread-local storage, so when a thread exits (a
+    finished ThreadPool's workers, say) its connections are closed with it;
+    there is at most one connection per database and live thread. A forked
+    child opens its own rather than using its parent's.
+    """
+    if getattr(_local, "pid", None) != os.getpid():
+        if getattr(_local, "caches", None):
+            _inherited.append(_local.caches)
+        _local.pid, _local.caches = os.getpid(), {}
+    if path not in _local.caches:
+        _local.caches[path] = factory(path)
+    return _local.caches[path]
+
+
+def get_cache() -> Optional[ResultCache]:
+    """
+    Return this thread's cache, or None if caching is disabled.
+
+    Connections are opened per process and thread (and per directory), so
+    the cache is safe to use from multiprocessing and thread pool workers.
+    """
+    if os.environ.get("GOLDENHOUR_CACHE", "1").lower() in ("0", "off", "false", "no"):
+        return None
+    return per_thread(os.path.join(default_directory(), DB_NAME), ResultCache)
+
+
+def cached(namespace: str, params: tuple, compute: Callable[[], Any],
+           encode: Callable[[Any], Any] = lambda value: value,
+           decode: Callable[[Any], Any] = lambda value: value) -> Any:
+    """
+    Look a result up in the cache, computing and storing it on a miss.
+
+    Args:
+        namespace: Name of the calculation (usually the function name)
+        params: Every input that affects the result
+        compute: Called with no arguments on a cache miss
+        encode: Converts the result to something JSON-serializable
+        decode: Converts the stored value back into a result
+
+    Returns:
+        The cached or freshly computed result
+    """
+    cache = get_cache()
+    if cache is None:
+        return compute()
+    with instrumentation.stage("result_cache.get"):
+        stored = cache.get(namespace, params)
+    if stored is not None:
+        return decode(stored)
+    value = compute()
+    with instrumentation.stage("result_cache.put"):
+        cache.put(namespace, params, encode(value))
+    return value
@@ -0,0 +1,384 @@
+"""
+Road graph caching and shortest-path routing for trip_split.
+
+load_graph() downloads the OpenStreetMap road network for the area around a
+trip once and pickles it under data_output/.cache/graphs (GOLDENHOUR_CACHE_DIR),
+keyed by the network type and the bounding box snapped outward to GRID
+degrees, so trips in the same area share a download. osmnx is only imported
+when a graph actually has to be downloaded, and networkx when a route is
+searched, so importing this module (e.g. for split_sections) stays cheap.
+
+Each leg is routed with a single search that returns both the path and its
+travel time:
+- "astar" (default) uses the straight-line (haversine) distance at the
+  fastest speed in the graph as its heuristic, which never overestimates,
+  so the route is still the fastest one
+- "bidirectional" searches from both ends at once
+- "dijkstra" is the plain single-source search
+
+leg_matrix() works out travel times between every pair of stops with one
+search per stop, spread over a process or thread pool.
+
+Routes carry the cumulative travel time at each node, taken from the edge
+travel times. split_sections() and latitude_dates() use it to divide a route
+into pieces of equal driving time (binary search plus interpolation along the
+edge), and write_latitude_dates() saves the daily latitudes for idealtrip.py.
+"""
+
+import csv
+import logging
+import math
+import multiprocessing
+import os
+import pickle
+from datetime import datetime, timedelta
+from functools import partial
+from multiprocessing.pool import ThreadPool
+from typing import TYPE_CHECKING, Callable, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+import cpus
+import result_cache
+
+if TYPE_CHECKING:  # networkx is imported where a search needs it
+    import networkx as nx
+
+GRID = 0.01  # degrees; bounding boxes are snapped outward to this grid
+MARGIN = 0.02  # degrees of road network kept around the stops
+NETWORK_TYPE = "drive"
+WEIGHT = "travel_time"
+METHODS = ("astar", "bidirectional", "dijkstra")
+POOL_MODES = ("process", "thread", "serial")
+EARTH_RADIUS = 6_371_008.8  # meters
+DATE_FORMAT = "%Y-%m-%d"
+LATITUDE_DECIMALS = 2
+
+BoundingBox = Tuple[float, float, float, float]  # north, south, east, west
+
+logger = logging.getLogger(__name__)
+
+
+class Leg(NamedTuple):
+    """Fastest path between two graph nodes."""
+    source: int
+    target: int
+    nodes: List[int]
+    cost: float  # seconds (or whatever the weight measures)
+
+
+class Route(NamedTuple):
+    """A route through several stops."""
+    nodes: List[int]  # graph nodes, junctions between legs listed once
+    coordinates: List[List[float]]  # [latitude, longitude] of each node
+    total_time: float
+    legs: List[Leg]
+    times: List[float]  # cumulative travel time at each node
+
+
+class RoutePoint(NamedTuple):
+    """A point part way along a route."""
+    time: float  # travel time from the start
+    latitude: float
+    longitude: float
+    index: int  # the point lies on the edge from coordinates[index] to [index + 1]
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters (works on NumPy arrays too)."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+def bounding_box(coordinates: Sequence[Tuple[float, float]],
+                 margin: float = MARGIN) -> BoundingBox:
+    """(north, south, east, west) around the coordinates, snapped out to GRID."""
+    latitudes = [lat for lat, _ in coordinates]
+    longitudes = [lon for _, lon in coordinates]
+    snap_up = lambda value: round(math.ceil(round(value / GRID, 6)) * GRID, 6)
+    snap_down = lambda value: round(math.floor(round(value / GRID, 6)) * GRID, 6)
+    return (min(90.0, snap_up(max(latitudes) + margin)),
+            max(-90.0, snap_down(min(latitudes) - margin)),
+            min(180.0, snap_up(max(longitudes) + margin)),
+            max(-180.0, snap_down(min(longitudes) - margin)))
+
+
+def graph_directory() -> str:
+    return os.path.join(result_cache.default_directory(), "graphs")
+
+
+def graph_path(bbox: BoundingBox, network_type: str = NETWORK_TYPE,
+               directory: Optional[str] = None) -> str:
+    """Cache file for a bounding box and network type."""
+    name = "_".join([network_type] + [f"{value:.2f}" for value in bbox])
+    return os.path.join(directory or graph_directory(), f"graph_{name}.pickle")
+
+
+def download_graph(bbox: BoundingBox, network_type: str = NETWORK_TYPE) -> "nx.MultiDiGraph":
+    """Download a road network from OpenStreetMap with edge travel times."""
+    import osmnx as ox
+    north, south, east, west = bbox
+    if int(ox.__version__.split(".")[0]) >= 2:
+        graph = ox.graph_from_bbox((west, south, east, north), network_type=network_type)
+    else:
+        graph = ox.graph_from_bbox(north, south, east, west, network_type=network_type)
+    graph = ox.add_edge_speeds(graph)
+    return ox.add_edge_travel_times(graph)
+
+
+def load_graph(coordinates: Sequence[Tuple[float, float]], network_type: str = NETWORK_TYPE,
+               margin: float = MARGIN, directory: Optional[str] = None,
+               download: Callable[[BoundingBox, str], "nx.MultiDiGraph"] = download_graph
+               ) -> "nx.MultiDiGraph":
+    """
+    Road network covering the coordinates, from the cache or downloaded.
+
+    Args:
+        coordinates: (latitude, longitude) of the stops
+        network_type: osmnx network type, e.g. "drive"
+        margin: Degrees of network kept around the stops
+        directory: Cache directory (default: graph_directory())
+        download: Called with (bbox, network_type) on a cache miss
+
+    Returns:
+        networkx.MultiDiGraph: Nodes with y/x, edges with travel_time
+    """
+    bbox = bounding_box(coordinates, margin)
+    path = graph_path(bbox, network_type, directory)
+    if os.path.exists(path):
+        with open(path, "rb") as file:
+            return pickle.load(file)
+    logger.info(f"Downloading {network_type} network for {bbox}")
+    graph = download(bbox, network_type)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        pickle.dump(graph, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+    return graph
+
+
+def nearest_nodes(graph: "nx.Graph", coordinates: Sequence[Tuple[float, float]]) -> List[int]:
+    """Graph node closest to each (latitude, longitude)."""
+    nodes = list(graph.nodes)
+    latitudes = np.array([graph.nodes[node]["y"] for node in nodes])
+    longitudes = np.array([graph.nodes[node]["x"] for node in nodes])
+    return [nodes[int(np.argmin(haversine(lat, lon, latitudes, longitudes)))]
+            for lat, lon in coordinates]
+
+
+def max_speed(graph: "nx.Graph", weight: str = WEIGHT) -> float:
+    """Fastest length/weight over all edges (meters per second), cached on the graph."""
+    key = f"max_speed_{weight}"
+    if key not in graph.graph:
+        speeds = [data["length"] / data[weight] for _, _, data in graph.edges(data=True)
+                  if data.get(weight) and data.get("length") is not None]
+        graph.graph[key] = max(speeds) if speeds else 0.0
+    return graph.graph[key]
+
+
+def shortest_leg(graph: "nx.Graph", source: int, target: int, method: str = "astar",
+                 weight: str = WEIGHT) -> Leg:
+    """
+    Fastest path between two nodes and its cost, from one search.
+
+    Raises:
+        networkx.NetworkXNoPath: If the target can't be reached
+    """
+    import networkx as nx
+    if method not in METHODS:
+        raise ValueError(f"Method must be one of {METHODS}")
+    if method == "dijkstra":
+        cost, nodes = nx.single_source_dijkstra(graph, source, target, weight=weight)
+    elif method == "bidirectional":
+        cost, nodes = nx.bidirectional_dijkstra(graph, source, target, weight=weight)
+    else:
+        speed = max_speed(graph, weight)
+        end = graph.nodes[target]
+
+        def heuristic(node, _):
+            if not speed:
+                return 0.0
+            start = graph.nodes[node]
+            return float(haversine(start["y"], start["x"], end["y"], end["x"])) / speed
+
+        nodes = nx.astar_path(graph, source, target, heuristic=heuristic, weight=weight)
+        cost = nx.path_weight(graph, nodes, weight)  # O(path), not a second search
+    return Leg(source, target, nodes, cost)
+
+
+def route(graph: "nx.Graph", coordinates: Sequence[Tuple[float, float]],
+          method: str = "astar", weight: str = WEIGHT) -> Route:
+    """Fastest route visiting the coordinates in order."""
+    stops = nearest_nodes(graph, coordinates)
+    legs = [shortest_leg(graph, a, b, method, weight) for a, b in zip(stops, stops[1:])]
+    nodes = stops[:1]
+    for leg in legs:
+        nodes.extend(leg.nodes[1:])
+    points = [[graph.nodes[node]["y"], graph.nodes[node]["x"]] for node in nodes]
+    times = cumulative_times(graph, nodes, weight)
+    return Route(nodes, points, float(times[-1]), legs, times.tolist())
+
+
+def cumulative_times(graph: "nx.Graph", nodes: Sequence[int], weight: str = WEIGHT) -> np.ndarray:
+    """Travel time from the first node to each node along a path (fastest parallel edge)."""
+    if graph.is_multigraph():
+        steps = [min(data[weight] for data in graph[u][v].values())
+                 for u, v in zip(nodes, nodes[1:])]
+    else:
+        steps = [graph[u][v][weight] for u, v in zip(nodes, nodes[1:])]
+    return np.concatenate(([0.0], np.cumsum(steps, dtype=float)))
+
+
+def points_at(coordinates: Sequence[Sequence[float]], times: Sequence[float],
+              targets: Sequence[float]) -> List[RoutePoint]:
+    """
+    Where the route is at each target travel time.
+
+    Each target is found by binary search in the cumulative times and
+    interpolated linearly along its edge, so N points on an M-node route
+    cost O(N log M).
+
+    Args:
+        coordinates: [latitude, longitude] of each route node
+        times: Cumulative travel time at each node (non-decreasing)
+        targets: Travel times to locate; clamped to the route
+
+    Returns:
+        list: A RoutePoint for each target
+    """
+    coordinates = np.asarray(coordinates, dtype=float)
+    times = np.asarray(times, dtype=float)
+    if len(coordinates) != len(times):
+        raise ValueError("Need one cumulative time per coordinate")
+    if len(times) < 2:
+        return [RoutePoint(0.0, *coordinates[0], 0) for _ in targets]
+    targets = np.clip(np.asarray(targets, dtype=float), times[0], times[-1])
+    index = np.clip(np.searchsorted(times, targets, side="right") - 1, 0, len(times) - 2)
+    span = times[index + 1] - times[index]
+    fraction = np.divide(targets - times[index], span, out=np.zeros_like(targets),
+                         where=span > 0)
+    points = coordinates[index] + fraction[:, None] * (coordinates[index + 1]
+                                                        - coordinates[index])
+    return [RoutePoint(float(t), float(lat), float(lon), int(i))
+            for t, (lat, lon), i in zip(targets, points, index)]
+
+
+def split_points(coordinates: Sequence[Sequence[float]], times: Sequence[float],
+                 num_sections: int) -> List[RoutePoint]:
+    """The num_sections - 1 points that divide the route into equal travel times."""
+    if num_sections < 1:
+        raise ValueError("Number of sections must be at least 1")
+    total = times[-1] - times[0]
+    return points_at(coordinates, times,
+                     [times[0] + total * k / num_sections for k in range(1, num_sections)])
+
+
+def split_sections(coordinates: Sequence[Sequence[float]], times: Sequence[float],
+                   num_sections: int) -> List[List[List[float]]]:
+    """
+    Split a route into num_sections pieces of equal travel time.
+
+    Consecutive sections share their split point, which is interpolated
+    along the edge it falls on rather than snapped to a node.
+    """
+    coordinates = [list(map(float, point)) for point in coordinates]
+    sections, current, start = [], [coordinates[0]], 1
+    for point in split_points(coordinates, times, num_sections):
+        current.extend(coordinates[start:point.index + 1])
+        split = [point.latitude, point.longitude]
+        if split != current[-1]:
+            current.append(split)
+        sections.append(current)
+        current, start = [split], point.index + 1
+    current.extend(point for point in coordinates[start:] if point != current[-1])
+    sections.append(current)
+    return sections
+
+
+def latitude_dates(coordinates: Sequence[Sequence[float]], times: Sequence[float],
+                   num_days: int, start_date: datetime,
+                   position: float = 1.0) -> List[Tuple[datetime, float]]:
+    """
+    Split a route into num_days days of equal driving and give each day's latitude.
+
+    Args:
+        coordinates: [latitude, longitude] of each route node
+        times: Cumulative travel time at each node
+        num_days: Days to spread the driving over
+        start_date: Date of the first day
+        position: Where in each day's driving to take the latitude, from 0
+                  (start) to 1 (end, where the night is spent)
+
+    Returns:
+        list: (date, latitude) for each day, as idealtrip.read_latitude_data
+              returns them
+    """
+    if num_days < 1:
+        raise ValueError("Number of days must be at least 1")
+    if not 0 <= position <= 1:
+        raise ValueError("Position must be between 0 and 1")
+    total = times[-1] - times[0]
+    targets = [times[0] + total * (day + position) / num_days for day in range(num_days)]
+    points = points_at(coordinates, times, targets)
+    return [(start_date + timedelta(days=day), round(point.latitude, LATITUDE_DECIMALS))
+            for day, point in enumerate(points)]
+
+
+def write_latitude_dates(rows: Sequence[Tuple[datetime, float]], path: str) -> None:
+    """Write (date, latitude) rows in the format of data_input/latitude_dates.csv."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8-sig") as file:
+        writer = csv.writer(file, lineterminator="\n")
+        writer.writerow(["Date", "Latitude"])
+        for date, latitude in rows:
+            writer.writerow([date.strftime(DATE_FORMAT),
+                             f"{latitude:.{LATITUDE_DECIMALS}f}\u00b0"])
+
+
+_worker_graph = None
+
+
+def _set_worker_graph(graph: "nx.Graph") -> None:
+    global _worker_graph
+    _worker_graph = graph
+
+
+def _matrix_row(source: int, targets: List[int], weight: str,
+                graph: Optional["nx.Graph"] = None) -> List[float]:
+    """Costs from one node to every target (inf where unreachable), one search."""
+    import networkx as nx
+    graph = graph if graph is not None else _worker_graph
+    costs = nx.single_source_dijkstra_path_length(graph, source, weight=weight)
+    return [costs.get(target, math.inf) for target in targets]
+
+
+def leg_matrix(graph: "nx.Graph", nodes: Sequence[int], weight: str = WEIGHT,
+               mode: str = "process", workers: int = None) -> List[List[float]]:
+    """
+    Travel cost between every pair of nodes.
+
+    One Dijkstra search per node gives its whole row. Rows are spread over a
+    process pool (the graph is sent to each worker once), a thread pool or
+    run serially.
+
+    Returns:
+        list: matrix[i][j] is the cost from nodes[i] to nodes[j], inf if
+              there is no path
+    """
+    if mode not in POOL_MODES:
+        raise ValueError(f"Mode must be one of {POOL_MODES}")
+    nodes = list(nodes)
+    workers = workers or cpus.default_workers()
+    if mode == "serial" or workers == 1 or len(nodes) <= 1:
+        return [_matrix_row(node, nodes, weight, graph) for node in nodes]
+    processes = min(workers, len(nodes))
+    if mode == "process":
+        pool = multiprocessing.Pool(processes, initializer=_set_worker_graph,
+                                    initargs=(graph,))
+        row = partial(_matrix_row, targets=nodes, weight=weight)
+    else:
+        pool = ThreadPool(processes)
+        row = partial(_matrix_row, targets=nodes, weight=weight, graph=graph)
+    with pool:
+        return list(pool.imap(row, nodes))
@@ -0,0 +1,468 @@
+"""
+Vectorized solar position engine built on NumPy.
+
+astral.sun.elevation is a scalar call that recomputes the Julian day,
+declination and equation of time for every sample. Here those ephemeris terms
+are computed once per day boundary and linearly interpolated within the day,
+then broadcast across any number of latitudes/longitudes, so a whole year of
+samples for many locations is a handful of array operations.
+
+The formulas are the NOAA ones astral uses (including its refraction model and
+its clamping of latitude to +/-89.8 degrees). Interpolating the ephemeris
+inside a day adds at most a few arc-seconds of error; MAX_ERROR_ARCSEC is the
+bound checked against astral in the test suite.
+
+Golden hour crossings are bracketed on a GRID_STEP sample grid for every day
+and location at once and then bisected together, so like boundary_solver the
+only crossings that can be missed are pairs closer together than one grid
+step, which only happens within a degree or so of the poles.
+
+Times are numpy datetime64 values (or anything np.datetime64 accepts) and are
+treated as UTC, like the naive datetimes used elsewhere in this project.
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Sequence, Tuple
+import numpy as np
+import instrumentation
+
+MIN_ELEVATION = -4  # degrees
+MAX_ELEVATION = 6  # degrees
+GRID_STEP = 600  # seconds between samples used to bracket crossings
+TOLERANCE = 1.0  # seconds
+MAX_ERROR_ARCSEC = 10.0
+MAX_LATITUDE = 89.8  # astral clamps latitudes to this to avoid the poles
+
+SECONDS_PER_DAY = 86400
+DAY_END = SECONDS_PER_DAY - 1e-6  # matches datetime.max.time()
+UNIX_EPOCH_JD = 2440587.5
+
+
+def julian_century(times: np.ndarray) -> np.ndarray:
+    """Convert datetime64 values to Julian centuries since J2000.0."""
+    seconds = np.asarray(times, dtype='datetime64[us]').astype(np.int64) / 1e6
+    julian_day = seconds / SECONDS_PER_DAY + UNIX_EPOCH_JD
+    return (julian_day - 2451545.0) / 36525.0
+
+
+def ephemeris(jc: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate solar declination and equation of time.
+
+    Args:
+        jc: Julian centuries since J2000.0
+
+    Returns:
+        tuple: (declination in degrees, equation of time in minutes)
+    """
+    jc = np.asarray(jc, dtype=np.float64)
+    mean_long = np.radians((280.46646 + jc * (36000.76983 + 0.0003032 * jc)) % 360.0)
+    mean_anomaly = np.radians(357.52911 + jc * (35999.05029 - 0.0001537 * jc))
+    eccentricity = 0.016708634 - jc * (0.000042037 + 0.0000001267 * jc)
+
+    eq_of_center = (
+        np.sin(mean_anomaly) * (1.914602 - jc * (0.004817 + 0.000014 * jc))
+        + np.sin(2 * mean_anomaly) * (0.019993 - 0.000101 * jc)
+        + np.sin(3 * mean_anomaly) * 0.000289
+    )
+    omega = np.radians(125.04 - 1934.136 * jc)
+    apparent_long = np.radians(
+        np.degrees(mean_long) + eq_of_center - 0.00569 - 0.00478 * np.sin(omega)
+    )
+    mean_obliquity = 23.0 + (26.0 + (21.448 - jc * (
+        46.815 + jc * (0.00059 - jc * 0.001813))) / 60.0) / 60.0
+    obliquity = np.radians(mean_obliquity + 0.00256 * np.cos(omega))
+
+    declination = np.degrees(np.arcsin(np.sin(obliquity) * np.sin(apparent_long)))
+
+    y = np.tan(obliquity / 2.0) ** 2
+    eq_of_time = 4.0 * np.degrees(
+        y * np.sin(2 * mean_long)
+        - 2.0 * eccentricity * np.sin(mean_anomaly)
+        + 4.0 * eccentricity * y * np.sin(mean_anomaly) * np.cos(2 * mean_long)
+        - 0.5 * y * y * np.sin(4 * mean_long)
+        - 1.25 * eccentricity * eccentricity * np.sin(2 * mean_anomaly)
+    )
+    return declination, eq_of_time
+
+
+def refraction(elevation: np.ndarray) -> np.ndarray:
+    """Atmospheric refraction in degrees for a geometric elevation (as astral)."""
+    elevation = np.asarray(elevation, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        te = np.tan(np.radians(elevation))
+        high = 58.1 / te - 0.07 / te ** 3 + 0.000086 / te ** 5
+        low = 1735.0 + elevation * (-518.2 + elevation * (
+            103.4 + elevation * (-12.79 + elevation * 0.711)))
+        below = -20.774 / te
+    correction = np.where(elevation > 5.0, high, np.where(elevation > -0.575, low, below))
+    correction = np.where(elevation >= 85.0, 0.0, correction)
+    return correction / 3600.0
+
+
+def geometric_elevation(apparent: float) -> float:
+    """
+    Geometric elevation at which astral reports `apparent` (the inverse of
+    adding refraction), by bisection.
+
+    Apparent elevation rises with geometric elevation (apart from jumps of
+    a few arc-seconds where the refraction formula changes pieces), so the
+    sun crosses an apparent threshold exactly when it crosses this one.
+    """
+    low, high = apparent - 1.0, apparent
+    for _ in range(50):
+        middle = (low + high) / 2
+        if middle + float(refraction(middle)) < apparent:
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+SUN_APPARENT_RADIUS = 32.0 / 60.0 / 2.0  # degrees
+# geometric elevation of the sun's centre at astral's sunrise/sunset: the
+# upper limb on the horizon, lifted by refraction
+SUNRISE_ELEVATION = -(SUN_APPARENT_RADIUS + float(refraction(-SUN_APPARENT_RADIUS)))
+
+
+def rise_set_azimuths(dates, latitudes, longitudes=0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sunrise and sunset azimuths for every date and location at once.
+
+    Sunrise and sunset are defined as in astral (the upper limb on the
+    horizon, with refraction), and the event is the one that falls on the
+    given UTC date. Each event time is found with two fixed-point steps
+    on the hour angle, as astral does, and the azimuth follows from the
+    declination at that time.
+
+    Args:
+        dates: Array-like of dates (UTC)
+        latitudes: Array-like of latitudes in degrees
+        longitudes: Longitudes in degrees, east positive (scalar or one per
+                    latitude)
+
+    Returns:
+        tuple: (sunrise azimuths, sunset azimuths) in degrees clockwise from
+               north, shape (dates, locations), NaN where the sun doesn't
+               rise or set that day
+    """
+    days = np.atleast_1d(np.asarray(dates, dtype='datetime64[D]'))
+    latitudes = np.atleast_1d(np.asarray(latitudes, dtype=np.float64))
+    longitudes = np.broadcast_to(np.asarray(longitudes, dtype=np.float64),
+                                 latitudes.shape)[None, :]
+    latitudes = np.radians(np.clip(latitudes, -MAX_LATITUDE, MAX_LATITUDE))[None, :]
+    day_jc = julian_century(days)[:, None]
+    sin_h0, cos_h0 = np.sin(np.radians(SUNRISE_ELEVATION)), np.cos(np.radians(SUNRISE_ELEVATION))
+
+    azimuths = []
+    for direction in (-1, 1):  # rising, setting
+        minutes = 720.0 - 4.0 * longitudes
+        for _ in range(2):
+            declination, eq_of_time = ephemeris(day_jc + minutes / 1440.0 / 36525.0)
+            declination = np.radians(declination)
+            cos_hour_angle = ((sin_h0 - np.sin(latitudes) * np.sin(declination))
+                              / (np.cos(latitudes) * np.cos(declination)))
+            hour_angle = np.degrees(np.arccos(np.clip(cos_hour_angle, -1.0, 1.0)))
+            minutes = (720.0 - 4.0 * longitudes - eq_of_time
+                       + direction * 4.0 * hour_angle) % 1440.0
+        declination = np.radians(ephemeris(day_jc + minutes / 1440.0 / 36525.0)[0])
+        cos_azimuth = ((np.sin(declination) - sin_h0 * np.sin(latitudes))
+                       / (cos_h0 * np.cos(latitudes)))
+        azimuth = np.degrees(np.arccos(np.clip(cos_azimuth, -1.0, 1.0)))
+        if direction == 1:
+            azimuth = 360.0 - azimuth
+        azimuths.append(np.where(np.abs(cos_hour_angle) > 1.0, np.nan, azimuth))
+    return azimuths[0], azimuths[1]
+
+
+class DayEphemeris:
+    """
+    Declination and equation of time at the boundaries of consecutive days.
+
+    Values inside a day are linearly interpolated between the midnight before
+    and the midnight after, which is the per-day work shared by every
+    latitude and longitude.
+    """
+
+    def __init__(self, days: np.ndarray):
+        self.days = np.asarray(days, dtype='datetime64[D]')
+        n = len(self.days)
+        # Consecutive days share a boundary, but the days need not be
+        # consecutive, so evaluate both ends of every day
+        boundaries = np.concatenate([self.days, self.days + 1])
+        declination, eq_of_time = ephemeris(julian_century(boundaries))
+        self.declination_start = declination[:n]
+        self.declination_delta = declination[n:] - declination[:n]
+        self.eq_of_time_start = eq_of_time[:n]
+        self.eq_of_time_delta = eq_of_time[n:] - eq_of_time[:n]
+
+    def elevation(self, day_index: np.ndarray, seconds: np.ndarray,
+                  latitudes: np.ndarray, longitudes: np.ndarray = 0.0,
+                  with_refraction: bool = True) -> np.ndarray:
+        """
+        Solar elevation for broadcastable arrays of days, times and locations.
+
+        Args:
+            day_index: Index into self.days
+            seconds: Seconds since the start of that day (UTC)
+            latitudes: Latitudes in degrees
+            longitudes: Longitudes in degrees, east positive
+            with_refraction: Add atmospheric refraction, as astral does
+
+        Returns:
+            ndarray: Elevation in degrees, broadcast over all inputs
+        """
+        fraction = np.asarray(seconds, dtype=np.float64) / SECONDS_PER_DAY
+        declination = np.radians(self.declination_start[day_index]
+                                 + self.declination_delta[day_index] * fraction)
+        eq_of_time = self.eq_of_time_start[day_index] + self.eq_of_time_delta[day_index] * fraction
+
+        true_solar_time = fraction * 1440.0 + eq_of_time + 4.0 * np.asarray(longitudes)
+        hour_angle = np.radians(true_solar_time / 4.0 - 180.0)
+        latitudes = np.radians(np.clip(latitudes, -MAX_LATITUDE, MAX_LATITUDE))
+
+        cos_zenith = (np.cos(latitudes) * np.cos(declination) * np.cos(hour_angle)
+                      + np.sin(latitudes) * np.sin(declination))
+        elevation = 90.0 - np.degrees(np.arccos(np.clip(cos_zenith, -1.0, 1.0)))
+        if with_refraction:
+            elevation = elevation + refraction(elevation)
+        instrumentation.count("numpy_elevation_points", elevation.size)
+        return elevation
+
+
+def elevation_matrix(times: np.ndarray, latitudes: np.ndarray,
+                     longitudes: np.ndarray = 0.0,
+                     with_refraction: bool = True) -> np.ndarray:
+    """
+    Solar elevation for every combination of time and location.
+
+    Args:
+        times: 1-D array of datetime64 (UTC)
+        latitudes: 1-D array of latitudes in degrees
+        longitudes: Scalar or 1-D array (same length as latitudes)
+        with_refraction: Add atmospheric refraction, as astral does
+
+    Returns:
+        ndarray: Elevations in degrees with shape (len(times), len(latitudes))
+    """
+    times = np.atleast_1d(np.asarray(times, dtype='datetime64[us]'))
+    latitudes = np.atleast_1d(np.asarray(latitudes, dtype=np.float64))
+    days = times.astype('datetime64[D]')
+    unique_days, day_index = np.unique(days, return_inverse=True)
+    seconds = (times - days).astype(np.int64) / 1e6
+
+    engine = DayEphemeris(unique_days)
+    return engine.elevation(day_index[:, None], seconds[:, None], latitudes[None, :],
+                            np.asarray(longitudes, dtype=np.float64), with_refraction)
+
+
+def _crossings(engine: DayEphemeris, latitudes: np.ndarray, longitudes: np.ndarray,
+               thresholds: Tuple[float, ...], step: float, tolerance: float):
+    """
+    Bracket and bisect every threshold crossing for all days and latitudes.
+
+    The thresholds are apparent elevations, but the samples are geometric:
+    each threshold is converted once with geometric_elevation, which saves
+    evaluating the refraction formula at every sample and bisection step.
+
+    Returns:
+        tuple: (start_elevation, day, location, seconds, threshold index,
+                rising) where the last five are flat arrays with one entry
+                per crossing, and start_elevation has shape (days, locations)
+    """
+    n_days = len(engine.days)
+    offsets = np.append(np.arange(0.0, DAY_END, step), DAY_END)
+    day_index = np.arange(n_days)[:, None, None]
+    samples = engine.elevation(day_index, offsets[None, :, None],
+                               latitudes[None, None, :], longitudes[None, None, :],
+                               with_refraction=False)
+    levels = [geometric_elevation(threshold) for threshold in thresholds]
+
+    # bracket every threshold's crossings, then bisect them all together
+    days, steps, locations, kinds, low_above = [], [], [], [], []
+    for kind, threshold in enumerate(levels):
+        above = samples >= threshold
+        d, k, loc = np.nonzero(above[:, :-1] != above[:, 1:])
+        days.append(d)
+        steps.append(k)
+        locations.append(loc)
+        kinds.append(np.full(len(d), kind))
+        low_above.append(above[d, k, loc])
+    d, k, loc = np.concatenate(days), np.concatenate(steps), np.concatenate(locations)
+    kinds, low_above = np.concatenate(kinds), np.concatenate(low_above)
+
+    low, high = offsets[k], offsets[k + 1]
+    lat, lon = latitudes[loc], longitudes[loc]
+    level = np.asarray(levels, dtype=np.float64)[kinds]
+    while len(low) and np.max(high - low) > tolerance:
+        middle = (low + high) / 2
+        same_side = (engine.elevation(d, middle, lat, lon, with_refraction=False)
+                     >= level) == low_above
+        low = np.where(same_side, middle, low)
+        high = np.where(same_side, high, middle)
+
+    start = samples[:, 0, :]
+    return start + refraction(start), d, loc, high, kinds, ~low_above
+
+
+def _prepare(dates, latitudes, longitudes):
+    days = np.atleast_1d(np.asarray(dates, dtype='datetime64[D]'))
+    latitudes = np.atleast_1d(np.asarray(latitudes, dtype=np.float64))
+    longitudes = np.broadcast_to(np.asarray(longitudes, dtype=np.float64), latitudes.shape)
+    return DayEphemeris(days), latitudes, longitudes
+
+
+def golden_hour_durations(dates, latitudes, longitudes=0.0,
+                          min_elevation: float = MIN_ELEVATION,
+                          max_elevation: float = MAX_ELEVATION,
+                          step: float = GRID_STEP,
+                          tolerance: float = TOLERANCE) -> np.ndarray:
+    """
+    Hours spent in the golden hour band for every day and location.
+
+    Args:
+        dates: 1-D array of dates (anything np.datetime64 accepts)
+        latitudes: 1-D array of latitudes in degrees
+        longitudes: Scalar or 1-D array (same length as latitudes)
+        min_elevation: Lower edge of the band in degrees
+        max_elevation: Upper edge of the band in degrees
+        step: Seconds between the samples used to bracket crossings
+        tolerance: Maximum error of each boundary in seconds
+
+    Returns:
+        ndarray: Hours with shape (len(dates), len(latitudes))
+    """
+    return band_durations(dates, latitudes, longitudes, [(min_elevation, max_elevation)],
+                          step, tolerance)[0]
+
+
+def band_durations(dates, latitudes, longitudes=0.0,
+                   bands: Sequence[Tuple[float, float]] = ((MIN_ELEVATION, MAX_ELEVATION),),
+                   step: float = GRID_STEP, tolerance: float = TOLERANCE) -> np.ndarray:
+    """
+    Hours spent in each of several elevation bands for every day and location.
+
+    All band edges are bracketed on one grid of samples, which is most of
+    the work, so several bands cost little more than one.
+
+    Args:
+        dates: 1-D array of dates (anything np.datetime64 accepts)
+        latitudes: 1-D array of latitudes in degrees
+        longitudes: Scalar or 1-D array (same length as latitudes)
+        bands: (min_elevation, max_elevation) of each band in degrees
+        step: Seconds between the samples used to bracket crossings
+        tolerance: Maximum error of each boundary in seconds
+
+    Returns:
+        ndarray: Hours with shape (len(bands), len(dates), len(latitudes))
+    """
+    engine, latitudes, longitudes = _prepare(dates, latitudes, longitudes)
+    thresholds = np.array(sorted({edge for band in bands for edge in band}), dtype=np.float64)
+    _, days, locations, seconds, kinds, rising = _crossings(
+        engine, latitudes, longitudes, tuple(thresholds), step, tolerance)
+    crossed = thresholds[kinds]
+
+    # Time in band = sum of exit times - sum of entry times, with the day's
+    # start and end standing in for missing entries/exits
+    end = engine.elevation(np.arange(len(engine.days))[:, None], DAY_END,
+                           latitudes[None, :], longitudes[None, :])
+    hours = np.empty((len(bands), len(engine.days), len(latitudes)))
+    for b, (min_elevation, max_elevation) in enumerate(bands):
+        own = (crossed == min_elevation) | (crossed == max_elevation)
+        total = np.where((end >= min_elevation) & (end <= max_elevation), DAY_END, 0.0)
+        entering = rising[own] == (crossed[own] == min_elevation)
+        np.add.at(total, (days[own], locations[own]),
+                  np.where(entering, -seconds[own], seconds[own]))
+        hours[b] = total / 3600
+    return hours
+
+
+def golden_hour_boundaries(dates, latitudes, longitudes=0.0,
+                           min_elevation: float = MIN_ELEVATION,
+                           max_elevation: float = MAX_ELEVATION,
+                           step: float = GRID_STEP,
+                           tolerance: float = TOLERANCE,
+                           slots: int = 4) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    First few golden hour boundaries for every day and location, as arrays.
+
+    The boundaries are the flattened (start, end, start, end, ...) times of
+    the day's segments, in seconds since midnight, with the same conventions
+    as golden_hour_segments. This is the array form used to build lookup
+    tables without creating a datetime per boundary.
+
+    Returns:
+        tuple: (times, counts) where times has shape (days, locations,
+               slots) and is NaN-padded, and counts holds the total number of
+               boundaries (twice the number of segments) for each cell
+    """
+    engine, latitudes, longitudes = _prepare(dates, latitudes, longitudes)
+    start, days, locations, seconds, _, _ = _crossings(
+        engine, latitudes, longitudes, (min_elevation, max_elevation), step, tolerance)
+    n_days, n_locations = start.shape
+    end = engine.elevation(np.arange(n_days)[:, None], DAY_END,
+                           latitudes[None, :], longitudes[None, :])
+
+    # A day that starts or ends inside the band gets a boundary at midnight
+    start_days, start_locations = np.nonzero((start >= min_elevation) & (start <= max_elevation))
+    end_days, end_locations = np.nonzero((end >= min_elevation) & (end <= max_elevation))
+    cells = np.concatenate([days, start_days, end_days]) * n_locations + np.concatenate(
+        [locations, start_locations, end_locations])
+    times = np.concatenate([seconds, np.zeros(len(start_days)), np.full(len(end_days), DAY_END)])
+
+    order = np.lexsort((times, cells))
+    cells, times = cells[order], times[order]
+    counts = np.bincount(cells, minlength=n_days * n_locations)
+    rank = np.arange(len(cells)) - (np.cumsum(counts) - counts)[cells]
+    keep = rank < slots
+
+    table = np.full((n_days * n_locations, slots), np.nan)
+    table[cells[keep], rank[keep]] = times[keep]
+    return table.reshape(n_days, n_locations, slots), counts.reshape(n_days, n_locations)
+
+
+def golden_hour_segments(dates, latitudes, longitudes=0.0,
+                         min_elevation: float = MIN_ELEVATION,
+                         max_elevation: float = MAX_ELEVATION,
+                         step: float = GRID_STEP,
+                         tolerance: float = TOLERANCE) -> List[List[List[Tuple[datetime, datetime]]]]:
+    """
+    Golden hour segments for every day and location.
+
+    Same conventions as boundary_solver.golden_hour_segments: a segment in
+    progress at midnight starts at 00:00 and one still in progress at the end
+    of the day ends at 23:59:59.999999.
+
+    Returns:
+        list: result[day][location] is a list of (start, end) datetimes
+    """
+    engine, latitudes, longitudes = _prepare(dates, latitudes, longitudes)
+    start, days, locations, seconds, kinds, rising = _crossings(
+        engine, latitudes, longitudes, (min_elevation, max_elevation), step, tolerance)
+
+    order = np.lexsort((seconds, locations, days))
+    events = {}
+    for i in order:
+        events.setdefault((days[i], locations[i]), []).append(
+            (seconds[i], rising[i] == (kinds[i] == 0)))
+
+    result = []
+    for d, day in enumerate(engine.days.tolist()):
+        day_start = datetime.combine(day, datetime.min.time())
+        row = []
+        for loc in range(len(latitudes)):
+            in_range = min_elevation <= start[d, loc] <= max_elevation
+            segment_start = day_start if in_range else None
+            segments = []
+            for time, entering in events.get((d, loc), []):
+                time = day_start + timedelta(seconds=float(time))
+                if entering and not in_range:
+                    segment_start, in_range = time, True
+                elif not entering and in_range:
+                    segments.append((segment_start, time))
+                    in_range = False
+            if in_range:
+                segments.append((segment_start, datetime.combine(day, datetime.max.time())))
+            row.append(segments)
+        result.append(row)
+    return result
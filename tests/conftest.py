@@ -17,3 +17,8 @@ def sample_golden_hours():
         'evening_start': datetime(2023, 6, 21, 20, 30),
         'evening_end':   datetime(2023, 6, 21, 21, 30)
     }
+
+@pytest.fixture(autouse=True)
+def isolated_result_cache(tmp_path, monkeypatch):
+    """Keep the result cache and the lookup table out of data_output during tests"""
+    monkeypatch.setenv("GOLDENHOUR_CACHE_DIR", str(tmp_path / "cache"))
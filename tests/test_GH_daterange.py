@@ -1,5 +1,5 @@
 import pytest
-from datetime import datetime
+from datetime import datetime, timedelta
 from GH_daterange import format_golden_hours
 
 def test_format_golden_hours(sample_date, sample_golden_hours):
@@ -19,3 +19,130 @@ def test_format_golden_hours_no_morning():
     }
     result = format_golden_hours(datetime(2023, 6, 21), times)
     assert 'No morning golden hour' in result
+
+def test_golden_hours_for_range(monkeypatch):
+    """Every day in the range is answered, in order"""
+    import lookup_table
+    from GH_daterange import golden_hours_for_range
+    monkeypatch.setattr(lookup_table, "default_table", lambda: None)
+    start, end = datetime(2023, 6, 1), datetime(2023, 6, 10)
+    days = list(golden_hours_for_range(start, end, 45))
+    assert [date.day for date, _ in days] == list(range(1, 11))
+    for _, times in days:
+        assert times['morning_start'] < times['morning_end'] < times['evening_start']
+
+def test_format_marks_evening_after_midnight():
+    """An evening golden hour ending after midnight is marked"""
+    times = {
+        'morning_start': datetime(2023, 6, 21, 3, 13),
+        'morning_end': datetime(2023, 6, 21, 5, 45),
+        'evening_start': datetime(2023, 6, 21, 22, 17),
+        'evening_end': datetime(2023, 6, 22, 0, 48)
+    }
+    result = format_golden_hours(datetime(2023, 6, 21), times)
+    assert result.endswith('10:17 PM to 12:48 AM (next day)')
+
+def test_golden_hours_for_range_local_time(monkeypatch):
+    """A longitude and time zone give local days, skipping the longitude 0 table"""
+    import lookup_table
+    from GH_daterange import golden_hours_for_range
+    monkeypatch.setattr(lookup_table, "default_table", lambda: pytest.fail("table used"))
+    days = list(golden_hours_for_range(datetime(2023, 6, 20), datetime(2023, 6, 21),
+                                       61.22, -149.9, "America/Anchorage"))
+    assert len(days) == 2
+    for date, times in days:
+        assert times['morning_start'].date() == date.date()
+        assert times['evening_end'].date() == date.date() + timedelta(days=1)
+
+def test_format_polar_segments():
+    """Days that aren't a morning and an evening list every segment with its kind"""
+    from idealtrip import calculate_golden_hours
+    date = datetime(2023, 1, 1)
+    result = format_golden_hours(date, calculate_golden_hours(date, 70, "numpy"))
+    assert result.startswith('2023-01-01: Midday ')
+    date = datetime(2023, 6, 21)
+    result = format_golden_hours(date, calculate_golden_hours(date, 45))
+    assert 'Morning' not in result and 'No' not in result
+
+def test_parse_query():
+    """Query lines can be comma or space separated, or JSON; bad ones raise ValueError"""
+    from GH_daterange import Query, parse_query
+    assert parse_query("2024-06-01,2024-06-03,60") == \
+        Query(datetime(2024, 6, 1), datetime(2024, 6, 3), 60.0, 0.0, None)
+    assert parse_query("2024-06-01 2024-06-03 59.9 10.7 Europe/Oslo").tz == "Europe/Oslo"
+    assert parse_query('{"start": "2024-06-01", "end": "2024-06-01", "latitude": 70, '
+                       '"longitude": 25}').longitude == 25.0
+    for line in ("2024-06-03 2024-06-01 60", "2024-06-01 2024-06-03", "2024-06-01 x 60",
+                 "2024-06-01 2024-06-03 91", "2024-06-01 2024-06-03 60 0 Mars/Base", "{"):
+        with pytest.raises(ValueError):
+            parse_query(line)
+
+@pytest.mark.parametrize("mode", ["serial", "thread"])
+def test_run_batch_streams_every_query_in_order(mode, monkeypatch):
+    """Results come out per query in input order; bad queries go to errors"""
+    import io
+    import json
+    import lookup_table
+    from GH_daterange import golden_hours_for_range, run_batch
+    monkeypatch.setattr(lookup_table, "default_table", lambda: None)
+    lines = ["start,end,latitude,longitude,tz\n", "2024-06-01,2024-06-05,60\n", "\n",
+             "2024-06-01,2024-05-01,60\n", "2024-03-30 2024-04-02 59.9 10.7 Europe/Oslo\n"]
+    output, errors = io.StringIO(), io.StringIO()
+    assert run_batch(lines, output, "text", mode, workers=2, chunk_days=2,
+                     errors=errors) == 1
+    assert errors.getvalue() == "line 4: End date must be after start date\n"
+    expected = ["# 2: 60.0, 0.0 (UTC)"]
+    expected += [format_golden_hours(date, times) for date, times in
+                 golden_hours_for_range(datetime(2024, 6, 1), datetime(2024, 6, 5), 60)]
+    expected += ["# 5: 59.9, 10.7 (Europe/Oslo)"]
+    expected += [format_golden_hours(date, times) for date, times in
+                 golden_hours_for_range(datetime(2024, 3, 30), datetime(2024, 4, 2),
+                                        59.9, 10.7, "Europe/Oslo")]
+    assert output.getvalue().splitlines() == expected
+
+    output = io.StringIO()
+    assert run_batch(lines[1:2], output, "jsonl", mode, workers=2) == 0
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [r["date"] for r in records] == [f"2024-06-0{d}" for d in range(1, 6)]
+    assert records[0]["query"] == 1 and records[0]["segments"][0]["kind"] == "morning"
+
+def test_run_batch_keeps_few_chunks_in_flight(monkeypatch):
+    """Output starts before the input is used up, so memory doesn't grow with it"""
+    import GH_daterange
+    consumed = []
+
+    def queries():
+        for number in range(1, 41):
+            consumed.append(number)
+            yield f"2023-01-01 2023-01-10 {number}\n"
+
+    class FirstWrite:
+        def __init__(self):
+            self.seen = None
+        def write(self, text):
+            if self.seen is None:
+                self.seen = len(consumed)
+        def flush(self):
+            pass
+
+    output = FirstWrite()
+    assert GH_daterange.run_batch(queries(), output, mode="thread", workers=2,
+                                  chunk_days=1) == 0
+    # 10 chunks per query, at most IN_FLIGHT per worker queued
+    assert output.seen <= 2 + GH_daterange.IN_FLIGHT * 2 // 10
+
+def test_batch_command_line_uses_result_cache(tmp_path, capsys, monkeypatch):
+    """--batch reads a file without prompting; repeated queries come from the cache"""
+    import builtins
+    import lookup_table
+    import result_cache
+    from GH_daterange import main
+    monkeypatch.setattr(lookup_table, "default_table", lambda: None)
+    monkeypatch.setattr(builtins, "input", lambda *args: pytest.fail("prompted"))
+    queries = tmp_path / "queries.txt"
+    queries.write_text("2024-06-01 2024-06-20 65\n2024-06-01 2024-06-20 65\n")
+    assert main(["--batch", str(queries), "--format", "jsonl", "--mode", "serial"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 40 and lines[:20] == [l.replace('"query": 2', '"query": 1')
+                                               for l in lines[20:]]
+    assert result_cache.get_cache().hits >= 1
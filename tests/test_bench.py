@@ -0,0 +1,49 @@
+import json
+import pytest
+from bench import run as bench
+
+
+def results(**medians):
+    return {"benchmarks": {name: {"median": median, "min": median, "repeat": 1}
+                           for name, median in medians.items()}}
+
+
+def test_compare_flags_only_regressions_past_threshold():
+    """Slowdowns beyond the threshold fail; speedups, skips and new benchmarks don't"""
+    baseline = results(a=1.0, b=1.0, c=1.0)
+    current = results(a=1.2, b=1.3, c=0.5, d=9.0)
+    current["benchmarks"]["c"] = {"skipped": "missing dependency: osmnx"}
+    regressions = bench.compare(current, baseline, threshold=0.25)
+    assert len(regressions) == 1 and regressions[0].startswith("b:")
+
+
+def test_main_saves_baseline_and_detects_regression(tmp_path, monkeypatch):
+    """A stored baseline is compared on the next run and a slowdown exits non-zero"""
+    monkeypatch.setattr(bench, "BENCHMARKS", {"noop": lambda: (lambda: None)})
+    baseline = tmp_path / "baseline.json"
+    args = ["--repeat", "1", "--baseline", str(baseline), "--output", str(tmp_path / "run.json")]
+    assert bench.main(args + ["--save-baseline"]) == 0
+    stored = json.loads(baseline.read_text())
+    assert "median" in stored["benchmarks"]["noop"]
+
+    stored["benchmarks"]["noop"]["median"] = 1e-12
+    baseline.write_text(json.dumps(stored))
+    assert bench.main(args) == 1
+
+
+def test_benchmark_runs():
+    """The real benchmarks can be set up and timed"""
+    document = bench.run(["twilight_hours_day", "split_route"], repeat=1)
+    assert document["benchmarks"]["twilight_hours_day"]["median"] > 0
+    with pytest.raises(ValueError):
+        bench.run(["nope"])
+
+
+def test_main_without_baseline_says_comparison_skipped(tmp_path, monkeypatch, capsys):
+    """A missing baseline is reported, and is an error with --require-baseline"""
+    monkeypatch.setattr(bench, "BENCHMARKS", {"noop": lambda: (lambda: None)})
+    args = ["--repeat", "1", "--baseline", str(tmp_path / "missing.json"),
+            "--output", str(tmp_path / "run.json")]
+    assert bench.main(args) == 0
+    assert "comparison SKIPPED" in capsys.readouterr().out
+    assert bench.main(args + ["--require-baseline"]) == 2
@@ -0,0 +1,254 @@
+import pytest
+from datetime import datetime, timedelta
+from astral import Observer
+from astral.sun import elevation
+from boundary_solver import golden_hour_segments, golden_hours_range
+
+SCAN_STEP = timedelta(minutes=1)
+
+
+def scan_segments(observer, date, step=SCAN_STEP):
+    """Brute-force reference: sample every step, as main.py used to."""
+    start_time = datetime.combine(date, datetime.min.time())
+    end_time = datetime.combine(date, datetime.max.time())
+    segments = []
+    segment_start = None
+    current_time = start_time
+    while current_time <= end_time:
+        in_range = -4 <= elevation(observer, current_time) <= 6
+        if in_range and segment_start is None:
+            segment_start = current_time
+        elif not in_range and segment_start is not None:
+            segments.append((segment_start, current_time))
+            segment_start = None
+        current_time += step
+    if segment_start is not None:
+        segments.append((segment_start, end_time))
+    return segments
+
+
+@pytest.mark.parametrize("latitude, date", [
+    (0, datetime(2023, 6, 21)),
+    (45, datetime(2023, 12, 21)),
+    (-33.9, datetime(2023, 3, 1)),
+    (59.91, datetime(2023, 5, 11)),
+    (70.2, datetime(2023, 1, 15)),   # polar night with midday twilight
+    (70.2, datetime(2023, 6, 21)),   # midnight sun, no crossing of -4
+    (80, datetime(2023, 6, 21)),     # sun above the band all day
+    (89.5, datetime(2023, 3, 20)),   # sun inside the band all day
+    (85, datetime(2023, 9, 30)),
+])
+def test_matches_brute_force_scan(latitude, date):
+    """Every boundary is within one scan step of the brute-force result"""
+    observer = Observer(latitude=latitude, longitude=0)
+    expected = scan_segments(observer, date)
+    result = golden_hour_segments(observer, date)
+    assert len(result) == len(expected)
+    tolerance = SCAN_STEP + timedelta(seconds=1)
+    for (start, end), (exp_start, exp_end) in zip(result, expected):
+        assert abs(start - exp_start) <= tolerance
+        assert abs(end - exp_end) <= tolerance
+
+
+def test_no_crossing_days():
+    """Polar day above the band and polar night below it have no segments"""
+    assert golden_hour_segments(Observer(latitude=80, longitude=0), datetime(2023, 6, 21)) == []
+    assert golden_hour_segments(Observer(latitude=89, longitude=0), datetime(2023, 12, 21)) == []
+
+
+def test_whole_day_segment():
+    """A day spent entirely in the band is one midnight-to-midnight segment"""
+    date = datetime(2023, 3, 20)
+    segments = golden_hour_segments(Observer(latitude=89.5, longitude=0), date)
+    assert segments == [(date, datetime.combine(date, datetime.max.time()))]
+
+
+def test_boundaries_are_sub_second(monkeypatch):
+    """Each crossing is refined to the requested tolerance in a few dozen evaluations"""
+    import boundary_solver
+    calls = []
+
+    def counting_elevation(observer, when):
+        calls.append(when)
+        return elevation(observer, when)
+
+    monkeypatch.setattr(boundary_solver, "elevation", counting_elevation)
+    observer = Observer(latitude=45, longitude=0)
+    segments = golden_hour_segments(observer, datetime(2023, 6, 21))
+    assert len(segments) == 2
+    assert len(calls) < 100
+    in_band = lambda when: -4 <= elevation(observer, when) <= 6
+    for start, end in segments:
+        assert in_band(start) and not in_band(start - timedelta(seconds=2))
+        assert not in_band(end) and in_band(end - timedelta(seconds=2))
+
+
+@pytest.mark.parametrize("latitude, start", [
+    (45, datetime(2023, 1, 1)),
+    (66.6, datetime(2023, 5, 1)),    # segments merge across midnight
+    (70.2, datetime(2023, 1, 1)),    # polar night ends
+    (-80, datetime(2023, 2, 15)),
+])
+def test_range_matches_daily_solver(latitude, start):
+    """Seeded day-to-day tracking gives the same segments as solving each day"""
+    end = start + timedelta(days=59)
+    observer = Observer(latitude=latitude, longitude=0)
+    days = list(golden_hours_range(start, end, latitude))
+    assert [date for date, _ in days] == [start + timedelta(days=d) for d in range(60)]
+    for date, segments in days:
+        expected = golden_hour_segments(observer, date)
+        assert len(segments) == len(expected)
+        for (a, b), (exp_a, exp_b) in zip(segments, expected):
+            assert abs(a - exp_a) <= timedelta(seconds=2)
+            assert abs(b - exp_b) <= timedelta(seconds=2)
+
+
+def test_range_is_lazy_and_cheaper(monkeypatch):
+    """The range API is a generator and needs fewer evaluations per day"""
+    import boundary_solver
+    calls = []
+
+    def counting_elevation(observer, when):
+        calls.append(when)
+        return elevation(observer, when)
+
+    monkeypatch.setattr(boundary_solver, "elevation", counting_elevation)
+    days = golden_hours_range(datetime(2023, 1, 1), datetime(2023, 3, 1), 45)
+    assert not calls
+    list(days)
+    tracked = len(calls)
+    calls.clear()
+    observer = Observer(latitude=45, longitude=0)
+    for d in range(60):
+        golden_hour_segments(observer, datetime(2023, 1, 1) + timedelta(days=d))
+    assert tracked < 0.6 * len(calls)
+
+
+def test_local_day_window():
+    """Local days follow the time zone, including 23 and 25 hour DST days"""
+    from boundary_solver import day_window
+    start, end = day_window(datetime(2023, 6, 1), "America/Los_Angeles")
+    assert start == datetime(2023, 6, 1, 7)
+    assert end - start == timedelta(hours=24, microseconds=-1)
+    start, end = day_window(datetime(2023, 3, 26), "Europe/Oslo")
+    assert end - start == timedelta(hours=23, microseconds=-1)
+    start, end = day_window(datetime(2023, 10, 29), "Europe/Oslo")
+    assert end - start == timedelta(hours=25, microseconds=-1)
+    assert day_window(datetime(2023, 6, 1)) == (datetime(2023, 6, 1),
+                                               datetime.combine(datetime(2023, 6, 1),
+                                                                datetime.max.time()))
+    with pytest.raises(ValueError):
+        day_window(datetime(2023, 6, 1), "Mars/Olympus_Mons")
+
+
+@pytest.mark.parametrize("latitude, longitude, tz, date", [
+    (34.05, -118.24, "America/Los_Angeles", datetime(2023, 6, 21)),
+    (-36.85, 174.76, "Pacific/Auckland", datetime(2023, 1, 10)),  # noon near 00:00 UTC
+    (64.84, -147.72, "America/Anchorage", datetime(2023, 3, 12)),  # DST starts
+    (59.91, 10.75, "Europe/Oslo", datetime(2023, 10, 29)),  # DST ends
+])
+def test_local_segments_match_scan(latitude, longitude, tz, date):
+    """Local-day segments match a minute scan of the local day, in local time"""
+    from zoneinfo import ZoneInfo
+    from boundary_solver import day_window
+    observer = Observer(latitude=latitude, longitude=longitude)
+    segments = golden_hour_segments(observer, date, tz=tz)
+    start, end = day_window(date, tz)
+    expected = []
+    segment_start, current = None, start
+    while current <= end:
+        in_range = -4 <= elevation(observer, current) <= 6
+        if in_range and segment_start is None:
+            segment_start = current
+        elif not in_range and segment_start is not None:
+            expected.append((segment_start, current))
+            segment_start = None
+        current += SCAN_STEP
+    if segment_start is not None:
+        expected.append((segment_start, end))
+    assert len(segments) == len(expected)
+    for (a, b), (exp_a, exp_b) in zip(segments, expected):
+        assert a.tzinfo == ZoneInfo(tz) and a.date() == date.date()
+        assert abs(a.replace(tzinfo=None) - (exp_a + a.utcoffset())) <= SCAN_STEP
+        assert abs(b.replace(tzinfo=None) - (exp_b + b.utcoffset())) <= SCAN_STEP
+
+
+def test_whole_segments_cross_midnight():
+    """An evening golden hour running past local midnight is reported once, whole"""
+    start, end = datetime(2023, 6, 10), datetime(2023, 7, 9)
+    anchorage = (61.22, -149.9)
+    tz = "America/Anchorage"
+    clipped = list(golden_hours_range(start, end, *anchorage, tz=tz))
+    whole = list(golden_hours_range(start, end, *anchorage, tz=tz, whole_segments=True))
+    observer = Observer(*anchorage)
+    for date, segments in whole:
+        daily = golden_hour_segments(observer, date, tz=tz, whole_segments=True)
+        assert len(segments) == len(daily)
+        for (a, b), (exp_a, exp_b) in zip(segments, daily):
+            assert abs(a - exp_a) <= timedelta(seconds=2)
+            assert abs(b - exp_b) <= timedelta(seconds=2)
+        assert all(a.date() == date.date() for a, _ in segments)
+        assert segments[-1][1].date() == date.date() + timedelta(days=1)
+
+    # the same stretches of time, with the pieces either side of midnight joined
+    pieces = [segment for _, segments in clipped for segment in segments]
+    joined = []
+    for a, b in pieces:
+        if joined and a - joined[-1][1] <= timedelta(microseconds=1):
+            joined[-1] = (joined[-1][0], b)
+        else:
+            joined.append((a, b))
+    reported = [segment for _, segments in whole for segment in segments]
+    assert len(reported) == len(joined) - 1  # the first day's early piece belongs to June 9
+    for (a, b), (exp_a, exp_b) in zip(reported, joined[1:-1]):
+        assert abs(a - exp_a) <= timedelta(seconds=2)
+        assert abs(b - exp_b) <= timedelta(seconds=2)
+
+
+def test_local_range_costs_the_same(monkeypatch):
+    """A far-west location in its own time zone is no dearer than longitude 0"""
+    import boundary_solver
+    calls = []
+
+    def counting_elevation(observer, when):
+        calls.append(when)
+        return elevation(observer, when)
+
+    monkeypatch.setattr(boundary_solver, "elevation", counting_elevation)
+    list(golden_hours_range(datetime(2023, 1, 1), datetime(2023, 3, 1), 45))
+    utc = len(calls)
+    calls.clear()
+    list(golden_hours_range(datetime(2023, 1, 1), datetime(2023, 3, 1), 45, -122.7,
+                            tz="America/Los_Angeles", whole_segments=True))
+    assert len(calls) <= 1.2 * utc
+
+
+@pytest.mark.parametrize("latitude", [0, 45, 66.6, 70.2, -80])
+def test_false_position_matches_bisection(monkeypatch, latitude):
+    """Refining by false position finds the crossings bisection does, for fewer evaluations"""
+    import boundary_solver
+    calls = []
+
+    def counting_elevation(observer, when):
+        calls.append(when)
+        return elevation(observer, when)
+
+    def bisect(observer, threshold, low, high, low_elevation, high_elevation, tolerance):
+        return boundary_solver._bisect(observer, threshold, low, high, low_elevation, tolerance)
+
+    monkeypatch.setattr(boundary_solver, "elevation", counting_elevation)
+    observer = Observer(latitude=latitude, longitude=0)
+    dates = [datetime(2023, 1, 1) + timedelta(days=d) for d in range(0, 365, 13)]
+    search = lambda: [boundary_solver.find_crossings(observer, date, date + timedelta(days=1))
+                      for date in dates]
+    refined = search()
+    refined_calls = len(calls)
+    calls.clear()
+    monkeypatch.setattr(boundary_solver, "_refine", bisect)
+    bisected = search()
+    assert any(bisected)
+    assert refined_calls < len(calls)
+    for day, expected in zip(refined, bisected):
+        assert [(t, r) for _, t, r in day] == [(t, r) for _, t, r in expected]
+        for (time, _, _), (exp_time, _, _) in zip(day, expected):
+            assert abs(time - exp_time) <= 2 * boundary_solver.TOLERANCE
@@ -0,0 +1,111 @@
+import pytest
+import numpy as np
+from duration_output import (ReorderBuffer, DurationCSVWriter, last_complete_date,
+                             open_writer, read_columnar)
+
+
+def rows_for(latitude, first_day, num_days):
+    return [[f"2023-01-{day + 1:02d}", latitude, latitude / 10 + day]
+            for day in range(first_day, first_day + num_days)]
+
+
+def test_reorder_buffer_releases_dates_in_order():
+    """Chunks are held until every latitude has arrived, then released in date order"""
+    buffer = ReorderBuffer([45, 60, 45], [0, 3, 6])
+    assert buffer.add((60, 3, 3), rows_for(60, 3, 3)) == []
+    assert buffer.add((45, 3, 3), rows_for(45, 3, 3)) == []
+    ready = buffer.add((45, 0, 3), rows_for(45, 0, 3))
+    assert ready == []
+    ready = buffer.add((60, 0, 3), rows_for(60, 0, 3))
+    assert [date for date, _ in ready] == [f"2023-01-0{d}" for d in range(1, 7)]
+    assert ready[0][1] == {45: 4.5, 60: 6.0}
+    assert len(buffer) == 1
+
+
+def test_last_complete_date_trims_partial_line(tmp_path):
+    """A half-written final line is removed and the last full date returned"""
+    path = tmp_path / "out.csv"
+    with DurationCSVWriter(str(path), [45, 60]) as writer:
+        writer.write([("2023-01-01", {45: 1.0, 60: 2.0}), ("2023-01-02", {45: 1.5, 60: 2.5})])
+    with open(path, "a") as file:
+        file.write("2023-01-03,1.")
+    assert last_complete_date(str(path), [45, 60]).day == 2
+    assert path.read_text().endswith("2.5\n")
+    with pytest.raises(ValueError):
+        last_complete_date(str(path), [45, 61])
+
+
+@pytest.mark.parametrize("output_format", ["npz", "parquet"])
+def test_columnar_round_trip(tmp_path, output_format):
+    """Columnar files read back as float32 views with the written values"""
+    if output_format == "parquet":
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / f"out.{output_format}")
+    rows = [(f"2023-01-0{day}", {45: day / 4, 60: day / 3}) for day in range(1, 8)]
+    with open_writer(path, [45, 60, 45], output_format) as writer:
+        writer.write(rows[:3])
+        writer.write(rows[3:])
+
+    grid = read_columnar(path)
+    assert grid.dates[0] == np.datetime64("2023-01-01") and len(grid.dates) == 7
+    assert grid.latitudes.tolist() == [45.0, 60.0]
+    assert all(column.dtype == np.float32 for column in grid.columns)
+    assert all(not column.flags.writeable for column in grid.columns)
+    np.testing.assert_allclose(grid.hours()[:, 1], [day / 3 for day in range(1, 8)], rtol=1e-6)
+
+
+def test_npz_columns_are_memory_mapped(tmp_path):
+    """NPZ durations are mapped from the file rather than read into memory"""
+    path = str(tmp_path / "out.npz")
+    with open_writer(path, [45, 60], "npz") as writer:
+        writer.write([("2023-01-01", {45: 1.0, 60: 2.0})])
+    column = read_columnar(path).columns[1]
+    assert isinstance(column.base, np.memmap)
+    assert column[0] == 2.0
+
+
+def test_open_writer_rejects_columnar_resume(tmp_path):
+    with pytest.raises(ValueError):
+        open_writer(str(tmp_path / "out.npz"), [45], "npz", append=True)
+    with pytest.raises(ValueError):
+        open_writer(str(tmp_path / "out.xlsx"), [45], "xlsx")
+
+
+@pytest.mark.parametrize("output_format", ["csv", "npz", "parquet"])
+def test_band_rows(tmp_path, output_format):
+    """With bands every (date, band) is its own row, and CSV resumes on whole dates"""
+    if output_format == "parquet":
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / f"out.{output_format}")
+    bands = ["golden", "blue"]
+    rows = [(f"2023-01-0{day}", {45: [day, day / 10], 60: [day * 2, day / 5]})
+            for day in range(1, 4)]
+    with open_writer(path, [45, 60], output_format, bands=bands) as writer:
+        writer.write(rows)
+
+    if output_format == "csv":
+        with open(path, "a", encoding="utf-8") as file:
+            file.write("2023-01-04,golden,4,8\n2023-01-04,bl")
+        assert last_complete_date(path, [45, 60], bands).day == 3
+        lines = open(path, encoding="utf-8").read().splitlines()
+        assert lines[0] == "Date,Band,45°,60°"
+        assert lines[-2:] == ["2023-01-03,golden,3,6", "2023-01-03,blue,0.3,0.6"]
+        with pytest.raises(ValueError):
+            last_complete_date(path, [45, 60])
+        return
+
+    grid = read_columnar(path)
+    assert grid.bands.tolist() == bands * 3
+    assert grid.dates.tolist() == [d for d in grid.dates.tolist()[::2] for _ in bands]
+    np.testing.assert_allclose(grid.hours()[:, 1], [2, 0.2, 4, 0.4, 6, 0.6], rtol=1e-6)
+
+
+def test_columnar_writer_needs_a_save(tmp_path):
+    """A columnar writer that can't save fails when created, not when closed"""
+    import duration_output
+
+    class Unsaved(duration_output._ColumnarWriter):
+        pass
+
+    with pytest.raises(TypeError):
+        Unsaved(str(tmp_path / "out"), [45])
@@ -0,0 +1,123 @@
+import pytest
+from datetime import datetime, timedelta
+from heapq import nsmallest
+from astral import LocationInfo, Observer
+from astral.sun import sunrise, sunset, azimuth
+from east_west_rise_set import (find_due_east_sunrises, find_due_west_sunsets,
+                                find_closest_days, azimuth_crossings,
+                                azimuth_crossings_batch)
+
+
+def scan(observer, target, event, n, year):
+    """Check every day of the year, skipping days without the event"""
+    days = []
+    for i in range((datetime(year + 1, 1, 1) - datetime(year, 1, 1)).days):
+        date = datetime(year, 1, 1) + timedelta(days=i)
+        try:
+            when = (sunrise if event == "rise" else sunset)(observer, date)
+        except ValueError:
+            continue
+        difference = abs((azimuth(observer, when) - target + 180) % 360 - 180)
+        days.append((date, difference))
+    return nsmallest(n, days, key=lambda day: day[1])
+
+
+@pytest.mark.parametrize("latitude, longitude, target, event, year", [
+    (59.91, 10.75, 90, "rise", 2023),
+    (59.91, 10.75, 270, "set", 2024),
+    (40.78, -73.97, 299, "set", 2023),  # Manhattanhenge
+    (-33.87, 151.21, 60, "rise", 2023),
+    (78.22, 15.65, 90, "rise", 2023),  # polar night and polar day
+    (78.22, 15.65, 20, "set", 2023),
+    (10.0, 179.5, 100, "rise", 2023),  # sunrise close to midnight UTC
+])
+def test_closest_days_match_full_scan(latitude, longitude, target, event, year):
+    """The root finder picks the same days as checking the whole year"""
+    observer = Observer(latitude, longitude)
+    expected = scan(observer, target, event, 6, year)
+    result = find_closest_days(observer, target, event, 6, year)
+    assert [date for date, _ in result] == [date for date, _ in expected]
+    assert [difference for _, difference in result] == pytest.approx(
+        [difference for _, difference in expected])
+
+
+def test_due_east_and_west():
+    """Sunrises due east and sunsets due west fall near the equinoxes"""
+    oslo = LocationInfo("Oslo", "Norway", "Europe/Oslo", 59.91, 10.75)
+    for days in (find_due_east_sunrises(oslo, year=2023), find_due_west_sunsets(oslo, year=2023)):
+        assert len(days) == 6
+        assert {date.month for date, _ in days} <= {3, 9}
+        assert days[0][1] < 1
+
+
+def test_azimuth_crossings():
+    """Crossings are one day either side of the solstice, or none if never reached"""
+    manhattan = Observer(40.78, -73.97)
+    crossings = azimuth_crossings(manhattan, 299, "set", 2023)
+    assert [(day.date.month, day.date.day // 10) for day in crossings] == [(5, 2), (7, 1)]
+    assert all(day.difference < 0.5 for day in crossings)
+    assert azimuth_crossings(manhattan, 300, "rise", 2023) == []
+    with pytest.raises(ValueError):
+        azimuth_crossings(manhattan, 90, "noon")
+
+
+def test_azimuth_crossings_batch():
+    """Batch results are in input order and match one-at-a-time results"""
+    locations = [(59.91, 10.75), LocationInfo("Sydney", "Australia", "Australia/Sydney",
+                                             -33.87, 151.21), Observer(70.0, 25.0)]
+    expected = [azimuth_crossings(Observer(lat, lon), 120, "rise", 2023)
+                for lat, lon in [(59.91, 10.75), (-33.87, 151.21), (70.0, 25.0)]]
+    assert azimuth_crossings_batch(locations, 120, "rise", 2023, mode="thread",
+                                   workers=2) == expected
+    assert azimuth_crossings_batch(locations, 120, "rise", 2023, mode="serial") == expected
+    with pytest.raises(ValueError):
+        azimuth_crossings_batch(locations, mode="gpu")
+
+
+def test_rise_set_azimuths_match_astral():
+    """Vectorized sunrise/sunset azimuths agree with astral"""
+    import numpy as np
+    import solar_engine
+    dates = np.arange(np.datetime64("2023-01-05"), np.datetime64("2024-01-01"), 30)
+    latitudes, longitudes = [59.91, -33.87, 0.0, 40.78, 78.22], [10.75, 151.21, -60, -73.97, 15.65]
+    rise, set_ = solar_engine.rise_set_azimuths(dates, latitudes, longitudes)
+    for i, date in enumerate(dates.astype(datetime)):
+        for j, (lat, lon) in enumerate(zip(latitudes, longitudes)):
+            observer = Observer(lat, lon)
+            for result, event in ((rise, sunrise), (set_, sunset)):
+                try:
+                    expected = azimuth(observer, event(observer, date))
+                except ValueError:
+                    assert np.isnan(result[i, j])
+                    continue
+                assert result[i, j] == pytest.approx(expected, abs=0.05)
+
+
+def test_alignment_report_matches_exact_solver(tmp_path):
+    """Batch report days match the exact solver and the CSV sorts by any column"""
+    import csv
+    from astral.geocoder import all_locations, database
+    from east_west_rise_set import filter_locations, alignment_report, write_report
+    cities = filter_locations(list(all_locations(database())), region="Europe/")
+    assert len(cities) > 20 and all("Europe/" in city.timezone for city in cities)
+    assert [c.name for c in filter_locations(cities, name="^osl")] == ["Oslo"]
+    assert all(c.latitude >= 60 for c in filter_locations(cities, min_latitude=60))
+
+    rows = alignment_report(cities, 2023, mode="thread", workers=2, chunk=8)
+    assert [row["city"] for row in rows] == [city.name for city in cities]
+    for city, row in list(zip(cities, rows))[::5]:
+        for event, target, prefix in (("rise", 90, "sunrise"), ("set", 270, "sunset")):
+            exact = {date.strftime("%Y-%m-%d"): difference
+                     for date, difference in find_closest_days(city.observer, target, event,
+                                                               4, 2023)}
+            for half in ("1", "2"):
+                assert row[f"{prefix}_{half}"] in exact
+                assert row[f"{prefix}_{half}_offset"] == pytest.approx(
+                    exact[row[f"{prefix}_{half}"]], abs=0.02)
+
+    path = tmp_path / "report.csv"
+    write_report(rows, str(path), sort_by="latitude")
+    with open(path, newline="", encoding="utf-8") as file:
+        written = list(csv.DictReader(file))
+    latitudes = [float(row["latitude"]) for row in written]
+    assert latitudes == sorted(latitudes) and len(written) == len(rows)
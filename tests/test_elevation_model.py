@@ -0,0 +1,99 @@
+from datetime import datetime
+import pytest
+from astral import Observer
+from astral.sun import elevation
+import elevation_model
+import idealtrip
+import instrumentation
+import main
+from boundary_solver import golden_hour_segments
+from elevation_model import ElevationModel
+
+
+def visible_elevation(model, observer, time):
+    """Reference: refract and dip one geometric sample directly"""
+    geometric = elevation(observer, time, with_refraction=False)
+    low, high = geometric, geometric + 1.0
+    if model.refraction == "bennett" and geometric > model.cutoff - 0.5:
+        for _ in range(60):  # apparent elevation whose Bennett refraction lands on it
+            middle = (low + high) / 2
+            if middle - model.scale * elevation_model.bennett(middle) < geometric:
+                low = middle
+            else:
+                high = middle
+        apparent = high if high >= model.cutoff else geometric
+    else:
+        apparent = geometric
+    return apparent + elevation_model.dip(model.height)
+
+
+def test_default_model_changes_nothing():
+    """The astral model at sea level gives the uncorrected edges and durations"""
+    assert ElevationModel().thresholds(-4, 6) == (-4, 6)
+    assert elevation_model.band_thresholds(-4, 6) == (-4, 6)
+    date = datetime(2023, 6, 1)
+    assert main.twilight_hours_day(63.4, date, correction=ElevationModel()) == \
+        main.twilight_hours_day(63.4, date)
+
+
+@pytest.mark.parametrize("model", [ElevationModel("bennett", 300),
+                                   ElevationModel("bennett", 0, 1030, -20),
+                                   ElevationModel("none", 1500)])
+def test_boundaries_match_per_sample_correction(model):
+    """Moving the edges gives the times a per-sample correction would"""
+    observer = Observer(latitude=60.0, longitude=10.0)
+    low, high = model.thresholds(-4, 6)
+    segments = golden_hour_segments(observer, datetime(2023, 9, 10), low, high)
+    assert len(segments) == 2
+    boundaries = [t for segment in segments for t in segment]
+    for time, edge in zip(boundaries, [-4, 6, 6, -4]):
+        assert visible_elevation(model, observer, time) == pytest.approx(edge, abs=0.005)
+
+
+def test_corrections_move_the_edges_sensibly():
+    """A raised observer sees the band earlier in the morning; formulas agree above 5 degrees"""
+    assert elevation_model.dip(100) == pytest.approx(0.2933, abs=1e-4)
+    bennett, saemundsson = ElevationModel("bennett"), ElevationModel("saemundsson")
+    for visible in (5.5, 6, 10, 30):
+        assert bennett.geometric(visible) == pytest.approx(saemundsson.geometric(visible),
+                                                           abs=0.003)
+    assert bennett.geometric(-4) == -4  # below the cutoff edges are geometric
+    date = datetime(2023, 3, 20)
+    low = idealtrip.calculate_golden_hours(date, 45)
+    high = idealtrip.calculate_golden_hours(date, 45, correction=ElevationModel(height=1000))
+    assert 0 < (low["morning_start"] - high["morning_start"]).total_seconds() < 10 * 60
+    with pytest.raises(ValueError):
+        ElevationModel("ciddor").validate()
+    with pytest.raises(ValueError):
+        ElevationModel(height=-1).validate()
+
+
+def test_no_extra_elevation_calls(tmp_path, monkeypatch):
+    """A correction costs no extra elevation samples"""
+    monkeypatch.setenv("GOLDENHOUR_CACHE", "0")
+    monkeypatch.setenv(instrumentation.DIR_ENV_VAR, str(tmp_path))
+    counts = []
+    for correction in (None, ElevationModel("saemundsson", 250)):
+        instrumentation.reset()
+        instrumentation.enable()
+        try:
+            for day in range(1, 29):
+                main.twilight_hours_day(65.0, datetime(2023, 2, day), correction=correction)
+            counts.append(instrumentation.snapshot()["counters"]["elevation"])
+        finally:
+            instrumentation.disable()
+            instrumentation.reset()
+    assert counts[1] <= counts[0] * 1.05
+
+
+def test_command_line_and_table():
+    """--refraction/--height build a model; the lookup table refuses one"""
+    args = main.parse_args(["--latitudes", "60", "--refraction", "bennett", "--height", "300"])
+    assert args.settings.correction == ElevationModel("bennett", 300.0)
+    assert main.parse_args(["--latitudes", "60"]).settings.correction is None
+    with pytest.raises(SystemExit):
+        main.parse_args(["--latitudes", "60", "--height", "-5"])
+    rows = [(datetime(2023, 6, 21), 60.0)]
+    corrected = idealtrip.golden_hours_batch(rows, "table", mode="serial",
+                                             correction=ElevationModel(height=50))
+    assert corrected[0].times != idealtrip.calculate_golden_hours(rows[0][0], 60.0)
@@ -0,0 +1,126 @@
+import threading
+import time
+import geocoding
+from geocoding import (GazetteerBackend, GeocodeCache, GeocodeError, RateLimiter,
+                       geocode_addresses)
+
+PLACES = {
+    "Nordkapp, Norway": (71.17, 25.78),
+    "Tromsø, Norway": (69.65, 18.96),
+    "Oslo, Norway": (59.91, 10.75),
+}
+
+
+class CountingBackend(GazetteerBackend):
+    """Gazetteer that records every lookup and can fail a few times first"""
+
+    def __init__(self, places, failures=None):
+        super().__init__(places)
+        self.calls = []
+        self.failures = dict(failures or {})
+        self._lock = threading.Lock()
+
+    def geocode(self, address):
+        with self._lock:
+            self.calls.append(address)
+            remaining = self.failures.get(address, 0)
+            if remaining:
+                self.failures[address] = remaining - 1
+                raise GeocodeError("timed out")
+        return super().geocode(address)
+
+
+def test_results_in_input_order_with_errors(tmp_path):
+    """Every address gets a result in order; misses and blanks carry an error"""
+    backend = CountingBackend(PLACES)
+    addresses = ["Oslo, Norway", "Atlantis", "nordkapp,  norway", " ", "OSLO, Norway",
+                 "Tromsø, Norway"]
+    results = geocode_addresses(addresses, backend,
+                                cache=GeocodeCache(str(tmp_path / "geocode.sqlite")),
+                                workers=3)
+    assert [r.address for r in results] == addresses
+    assert [r.coordinates for r in results] == [
+        (59.91, 10.75), None, (71.17, 25.78), None, (59.91, 10.75), (69.65, 18.96)]
+    assert results[1].error == geocoding.NOT_FOUND
+    assert results[3].error == "empty address"
+    assert [r.ok for r in results] == [True, False, True, False, True, True]
+    # case and whitespace variants are looked up once
+    assert len(backend.calls) == 4
+
+
+def test_cache_ttl_and_negative_entries(tmp_path):
+    """Hits and misses are cached, each expiring after its own TTL"""
+    now = [1_000_000.0]
+    cache = GeocodeCache(str(tmp_path / "geocode.sqlite"), ttl=100, negative_ttl=10,
+                         clock=lambda: now[0])
+    backend = CountingBackend(PLACES)
+    geocode_addresses(["Oslo, Norway", "Atlantis"], backend, cache=cache, workers=1)
+    assert len(backend.calls) == 2
+
+    again = geocode_addresses(["Oslo, Norway", "Atlantis"], backend, cache=cache)
+    assert len(backend.calls) == 2
+    assert [r.cached for r in again] == [True, True]
+    assert again[0].coordinates == (59.91, 10.75)
+    assert again[1].error == geocoding.NOT_FOUND
+
+    now[0] += 50  # the negative entry has expired, the coordinates have not
+    geocode_addresses(["Oslo, Norway", "Atlantis"], backend, cache=cache)
+    assert backend.calls[2:] == ["Atlantis"]
+    now[0] += 200
+    assert cache.expire() == 2
+    assert len(cache) == 0
+
+
+def test_transient_errors_are_retried_and_not_cached(tmp_path):
+    """Timeouts are retried; a lookup that keeps failing is reported, not cached"""
+    cache = GeocodeCache(str(tmp_path / "geocode.sqlite"))
+    backend = CountingBackend(PLACES, failures={"Oslo, Norway": 1, "Tromsø, Norway": 5})
+    results = geocode_addresses(["Oslo, Norway", "Tromsø, Norway"], backend, cache=cache,
+                                retries=2, backoff=0)
+    assert results[0].coordinates == (59.91, 10.75)
+    assert results[1].coordinates is None
+    assert "unavailable after 3 attempt(s)" in results[1].error
+    assert backend.calls.count("Tromsø, Norway") == 3
+    assert cache.get("gazetteer", "Tromsø, Norway") == (False, None)
+    assert cache.get("gazetteer", "Oslo, Norway") == (True, (59.91, 10.75))
+
+
+def test_rate_limiter_spaces_requests_across_threads():
+    """Lookups from several threads start at least min_interval apart"""
+    backend = CountingBackend({f"Place {i}": (i, i) for i in range(5)})
+    backend.min_interval = 0.05
+    starts = []
+    original = backend.geocode
+    backend.geocode = lambda address: starts.append(time.monotonic()) or original(address)
+    results = geocode_addresses([f"Place {i}" for i in range(5)], backend, use_cache=False,
+                                workers=4)
+    assert all(r.ok for r in results)
+    gaps = [b - a for a, b in zip(sorted(starts), sorted(starts)[1:])]
+    assert min(gaps) >= 0.045
+
+    waits = []
+    limiter = RateLimiter(1.0, clock=lambda: 10.0, sleep=waits.append)
+    for _ in range(3):
+        limiter.wait()
+    assert waits == [1.0, 2.0]
+
+
+def test_default_cache_follows_environment(monkeypatch):
+    """The default cache lives in GOLDENHOUR_CACHE_DIR and can be turned off"""
+    assert geocoding.get_cache().path.endswith(geocoding.DB_NAME)
+    monkeypatch.setenv("GOLDENHOUR_CACHE", "0")
+    assert geocoding.get_cache() is None
+    backend = CountingBackend(PLACES)
+    geocode_addresses(["Oslo, Norway"], backend)
+    geocode_addresses(["Oslo, Norway"], backend)
+    assert len(backend.calls) == 2
+
+
+def test_gazetteer_from_csv(tmp_path):
+    """An offline gazetteer can be read from a CSV file"""
+    path = tmp_path / "places.csv"
+    path.write_text('Address,Latitude,Longitude\n"Tromsø, Norway",69.65,18.96\n',
+                    encoding="utf-8")
+    backend = GazetteerBackend.from_csv(str(path))
+    assert backend.geocode("tromsø,  NORWAY") == (69.65, 18.96)
+    assert backend.geocode("Atlantis") is None
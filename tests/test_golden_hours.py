@@ -0,0 +1,62 @@
+import pickle
+import sys
+from datetime import datetime
+import pytest
+import golden_hours
+from golden_hours import GoldenHours
+from idealtrip import calculate_golden_hours
+
+
+def test_ordinary_day_reads_like_the_old_dict():
+    """A morning and an evening fill the four legacy keys"""
+    result = calculate_golden_hours(datetime(2023, 6, 21), 45)
+    assert [kind for _, _, kind in result.segments] == ["morning", "evening"]
+    assert list(result) == list(golden_hours.LEGACY_KEYS)
+    assert result == dict(result.items())
+    assert result.total_hours == pytest.approx(sum(result.durations) / 3600)
+    empty = GoldenHours(datetime(2023, 6, 21))
+    assert list(empty.values()) == [None] * 4 and empty.segments == []
+
+
+@pytest.mark.parametrize("date, latitude, kinds", [
+    (datetime(2023, 1, 1), 70, ["midday"]),  # polar twilight
+    (datetime(2023, 6, 15), 70, ["midnight", "evening"]),  # midnight sun, in the band
+    (datetime(2023, 4, 16), 85, ["morning", "midnight"]),
+    (datetime(2023, 3, 12), 89.5, ["all day"]),
+])
+def test_polar_kinds(date, latitude, kinds):
+    """Segments where the sun turns inside the band are told apart from rising and setting"""
+    result = calculate_golden_hours(date, latitude, "numpy")
+    assert [kind for _, _, kind in result.segments] == kinds
+    assert len(result.of_kind(kinds[0])) == 1
+
+
+def test_more_than_two_segments_kept():
+    """Days with three segments keep the third instead of dropping it"""
+    day = datetime(2023, 5, 1)
+    segments = [(datetime(2023, 5, 1, 3, 0), datetime(2023, 5, 1, 5, 0)),
+                (datetime(2023, 5, 1, 19, 0), datetime(2023, 5, 1, 21, 0)),
+                (datetime(2023, 5, 1, 23, 0), datetime(2023, 5, 1, 23, 59))]
+    result = GoldenHours.from_segments(day, segments)
+    assert [kind for _, _, kind in result.segments] == ["morning", "evening", "midnight"]
+    assert result.durations == [7200.0, 7200.0, 3540.0]
+    assert result["evening_end"] == datetime(2023, 5, 1, 21, 0)
+    assert result.format_segments(first=2) == "midnight 23:00-23:59"
+
+
+def test_serializers_round_trip():
+    """JSON and pickle give the same segments back, local times included"""
+    local = calculate_golden_hours(datetime(2023, 3, 26), 59.9, longitude=10.7,
+                                   tz="Europe/Oslo")  # DST starts
+    tz = local["morning_start"].tzinfo
+    assert GoldenHours.from_json(local.to_json(), tz) == local
+    assert GoldenHours.from_json(local.to_json(), tz).segments == local.segments
+    assert pickle.loads(pickle.dumps(local)) == local
+
+
+
+def test_smaller_than_a_dict():
+    """The slotted result has no per-instance dict"""
+    result = calculate_golden_hours(datetime(2023, 6, 21), 45)
+    assert not hasattr(result, "__dict__")
+    assert sys.getsizeof(result) < sys.getsizeof(dict(result))
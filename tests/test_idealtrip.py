@@ -1,5 +1,5 @@
 import pytest
-from datetime import datetime
+from datetime import datetime, timedelta
 from idealtrip import calculate_golden_hours, read_latitude_data
 
 @pytest.fixture
@@ -41,3 +41,80 @@ def test_invalid_input_types():
         calculate_golden_hours(sample_date, "45")  # Invalid latitude type
     with pytest.raises(ValueError):
         calculate_golden_hours(sample_date, 91)  # Invalid latitude value
+
+def test_golden_hours_batch_order_and_duplicates():
+    """Batch results follow the input order, keep repeated dates and reuse work"""
+    from idealtrip import golden_hours_batch
+    date = datetime(2023, 6, 21)
+    rows = [(date, 60.0), (date, 45.0), (datetime(2023, 6, 22), 45.0),
+            (date, 60.0), (date, 45.0, 90.0)]
+    results = golden_hours_batch(rows, mode="thread", workers=2)
+    assert [(r.date, r.latitude, r.longitude) for r in results] == [
+        (date, 60, 0), (date, 45, 0), (datetime(2023, 6, 22), 45, 0), (date, 60, 0),
+        (date, 45, 90)]
+    assert [r.reused for r in results] == [False, False, False, True, False]
+    assert results[3].times == results[0].times
+    assert all(r.seconds >= 0 for r in results)
+    for r in results:
+        assert r.times == calculate_golden_hours(r.date, r.latitude, longitude=r.longitude)
+    # 90 degrees east sees the sun six hours earlier (in UTC)
+    assert results[4].times != results[1].times
+    assert any(abs(results[1].times['evening_start'] - t - timedelta(hours=6))
+               < timedelta(minutes=5) for t in results[4].times.values() if t)
+
+    serial = golden_hours_batch(rows, mode="serial")
+    assert [r.times for r in serial] == [r.times for r in results]
+    with pytest.raises(ValueError):
+        golden_hours_batch(rows, mode="gpu")
+    with pytest.raises(ValueError):
+        golden_hours_batch([(date, 45, 200)])
+
+def test_local_time_golden_hours():
+    """With a time zone, times are local and the evening can end after midnight"""
+    from zoneinfo import ZoneInfo
+    date = datetime(2023, 6, 21)
+    first = calculate_golden_hours(date, 61.22, longitude=-149.9, tz="America/Anchorage")
+    cached = calculate_golden_hours(date, 61.22, longitude=-149.9, tz="America/Anchorage")
+    assert cached == first
+    assert all(t.tzinfo == ZoneInfo("America/Anchorage") for t in cached.values())
+    assert first['morning_start'].hour == 3
+    assert first['evening_start'].date() == date.date()
+    assert first['evening_end'].date() == date.date() + timedelta(days=1)
+    with pytest.raises(ValueError):
+        calculate_golden_hours(date, 61.22, "table", tz="America/Anchorage")
+    with pytest.raises(ValueError):
+        calculate_golden_hours(date, 61.22, tz="Nowhere/Special")
+
+def test_golden_hours_range_batch():
+    """Each location's range comes back in input order and matches single days"""
+    from idealtrip import golden_hours_batch, golden_hours_range_batch
+    start, end = datetime(2023, 6, 19), datetime(2023, 6, 23)
+    locations = [(61.22, -149.9, "America/Anchorage"), (45.0, 0.0), (-33.87, 151.21,
+                                                                      "Australia/Sydney")]
+    results = golden_hours_range_batch(locations, start, end, mode="thread", workers=3)
+    assert len(results) == 3
+    assert golden_hours_range_batch(locations, start, end, mode="serial") == results
+    rows = [(date, *location) for location, days in zip(locations, results)
+            for date, _ in days]
+    batch = golden_hours_batch(rows, mode="serial")
+    expected = [times for days in results for _, times in days]
+    for row, result, times in zip(rows, batch, expected):
+        assert result.timezone == (row[3] if len(row) > 3 else None)
+        for key in times:
+            if times[key]:
+                assert abs(result.times[key] - times[key]) < timedelta(seconds=60)
+    sydney = results[2][0][1]
+    assert sydney['morning_start'].utcoffset() == timedelta(hours=10)
+
+def test_csv_row_keeps_extra_segments():
+    """Segments past the second go in the last column instead of being dropped"""
+    from idealtrip import BatchResult, csv_row
+    from golden_hours import GoldenHours
+    date = datetime(2023, 5, 1)
+    times = GoldenHours.from_segments(date, [
+        (datetime(2023, 5, 1, 0, 0), datetime(2023, 5, 1, 1, 0)),
+        (datetime(2023, 5, 1, 3, 0), datetime(2023, 5, 1, 5, 0)),
+        (datetime(2023, 5, 1, 19, 0), datetime(2023, 5, 1, 21, 0))])
+    row = csv_row(BatchResult(date, 78.0, 0.0, times, 0.0, False))
+    assert row == ['2023-05-01', 78.0, '00:00', '01:00', '03:00', '05:00',
+                   'evening 19:00-21:00']
@@ -0,0 +1,97 @@
+import json
+import pstats
+import pytest
+from datetime import datetime
+from astral import Observer
+import instrumentation
+from boundary_solver import golden_hour_segments
+
+
+@pytest.fixture
+def instrumented(tmp_path, monkeypatch):
+    """Turn instrumentation on for one test, with reports in tmp_path"""
+    monkeypatch.setenv(instrumentation.DIR_ENV_VAR, str(tmp_path))
+    instrumentation.reset()
+    instrumentation.enable()
+    yield tmp_path
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_disabled_is_a_no_op():
+    """Nothing is recorded unless instrumentation is turned on"""
+    assert not instrumentation.enabled()
+    instrumentation.count("elevation")
+    with instrumentation.stage("anything"):
+        pass
+    assert instrumentation.collect() is None
+    assert instrumentation.snapshot()["counters"] == {}
+
+
+def test_counts_elevation_calls_per_day(instrumented):
+    """boundary_solver's elevation calls and days are counted"""
+    observer = Observer(latitude=45, longitude=0)
+    for day in (20, 21):
+        golden_hour_segments(observer, datetime(2023, 6, day))
+    report = instrumentation.snapshot()
+    assert report["counters"]["days"] == 2
+    assert 20 < report["derived"]["elevations_per_day"] < 100
+
+
+def test_collect_and_merge(instrumented):
+    """Worker stats are drained by collect() and added back by merge()"""
+    instrumentation.count("days", 3)
+    instrumentation.add_time("solve", 0.5)
+    stats = instrumentation.collect()
+    assert instrumentation.snapshot()["counters"] == {}
+    instrumentation.merge(stats)
+    instrumentation.merge(stats)
+    report = instrumentation.snapshot()
+    assert report["counters"]["days"] == 6
+    assert report["stages"]["solve"] == {"calls": 2, "seconds": 1.0, "mean_ms": 500.0}
+
+
+def test_thread_workers_lose_no_counts(instrumented):
+    """Threads counting, collecting and merging at once add up exactly"""
+    import sys
+    from multiprocessing.pool import ThreadPool
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads as often as possible
+
+    def task(_):
+        for _ in range(2000):
+            instrumentation.count("elevation")
+            instrumentation.add_time("solve", 0.001)
+        return instrumentation.collect()
+
+    try:
+        with ThreadPool(8) as pool:
+            for stats in pool.imap_unordered(task, range(16)):
+                instrumentation.merge(stats)
+    finally:
+        sys.setswitchinterval(interval)
+    report = instrumentation.snapshot()
+    assert report["counters"]["elevation"] == 16 * 2000
+    assert report["stages"]["solve"]["calls"] == 16 * 2000
+
+
+@pytest.mark.parametrize("mode", ["serial", "thread"])
+def test_main_report_and_profile(instrumented, monkeypatch, mode):
+    """An instrumented main.py run writes a JSON report and a pstats dump"""
+    import main
+    dump = instrumented / "main.pstats"
+    instrumentation.enable(str(dump))
+    main.main(mode=mode, workers=2, chunk_days=100, output=str(instrumented / "out.csv"),
+              latitudes=[45, 60])
+    report = instrumentation.report()
+
+    assert report["label"] == "main"
+    assert report["counters"]["days"] == 2 * 365
+    assert report["counters"]["elevation"] > 20 * 2 * 365
+    for name in ("main.run_tasks", "main.write", "process_chunk",
+                 "twilight_hours_day.location", "twilight_hours_day.solve",
+                 "result_cache.get"):
+        assert report["stages"][name]["calls"] > 0
+    written = list(instrumented.glob("profile_main_*.json"))
+    assert len(written) == 1 and json.loads(written[0].read_text()) == report
+    assert pstats.Stats(str(dump)).total_calls > 0
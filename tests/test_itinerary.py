@@ -0,0 +1,93 @@
+import itertools
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+import itinerary
+import solar_engine
+
+# a drive north through Norway, 40 hours at a steady pace
+ROUTE = [[58.0 + 13.0 * i / 400, 8.0 + 12.0 * i / 400] for i in range(401)]
+ROUTE_TIMES = [40 * 3600 * i / 400 for i in range(401)]
+
+
+def brute_force(stops, hours, starts, num_days, limit):
+    """Best total by trying every start and every increasing sequence of stops"""
+    best = -np.inf
+    for start in range(starts):
+        for middle in itertools.combinations(range(1, len(stops) - 1), num_days - 1):
+            path = (0,) + middle + (len(stops) - 1,)
+            if any(stops[j].time - stops[i].time > limit + 1e-6
+                   for i, j in zip(path, path[1:])):
+                continue
+            best = max(best, sum(hours[start + day, j] for day, j in enumerate(path[1:])))
+    return best
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_matches_brute_force(seed):
+    """The DP finds the same best total as trying every itinerary"""
+    rng = np.random.default_rng(seed)
+    coordinates = [[60.0 + i, 10.0] for i in range(10)]
+    times = np.concatenate(([0.0], np.cumsum(rng.uniform(1800, 7200, 9)))).tolist()
+    table = {}
+
+    def durations(dates, latitudes):
+        key = (len(dates), len(latitudes))
+        table.setdefault(key, rng.uniform(0, 5, key))
+        return table[key]
+
+    num_days, max_drive = 4, 4.0
+    result = itinerary.optimize_itinerary(
+        coordinates, datetime(2023, 5, 1), datetime(2023, 5, 6), times=times,
+        num_days=num_days, max_drive_hours=max_drive, spacing=2700, durations=durations)
+    stops = itinerary.candidate_stops(coordinates, times, 2700)
+    hours = next(iter(table.values()))
+    assert result.total_golden_hours == pytest.approx(
+        brute_force(stops, hours, 6, num_days, max_drive * 3600))
+
+    assert len(result.days) == num_days
+    assert result.days[-1].stop.time == pytest.approx(times[-1])
+    assert all(0 < day.drive_hours <= max_drive + 1e-9 for day in result.days)
+    assert [day.date for day in result.days] == [
+        result.start_date + timedelta(days=d) for d in range(num_days)]
+    assert sum(day.golden_hours for day in result.days) == pytest.approx(
+        result.total_golden_hours)
+
+
+def test_best_start_date_in_window():
+    """The chosen start beats every other start date in the window"""
+    window = [datetime(2023, 3, 1) + timedelta(days=d) for d in range(0, 28, 3)]
+    result = itinerary.optimize_itinerary(ROUTE, window[0], window[-1], times=ROUTE_TIMES,
+                                          max_drive_hours=8)
+    assert len(result.days) == 5
+    single = [itinerary.optimize_itinerary(ROUTE, date, date, times=ROUTE_TIMES,
+                                           max_drive_hours=8).total_golden_hours
+              for date in window]
+    assert result.total_golden_hours >= max(single) - 1e-9
+    assert result.start_date >= window[0]
+    expected = solar_engine.golden_hour_durations(
+        [result.days[-1].date], [result.days[-1].stop.latitude])[0, 0]
+    assert result.days[-1].golden_hours == pytest.approx(expected, abs=0.02)
+    assert result.latitude_dates()[-1] == (result.days[-1].date, 71.0)
+
+
+def test_hundreds_of_stops():
+    """Several hundred candidate stops over a four-week window (timed in bench.run)"""
+    result = itinerary.optimize_itinerary(ROUTE, datetime(2023, 5, 1), datetime(2023, 5, 28),
+                                          times=ROUTE_TIMES, num_days=7, max_drive_hours=7,
+                                          spacing=400)
+    assert len(itinerary.candidate_stops(ROUTE, ROUTE_TIMES, 400)) > 300
+    assert len(result.days) == 7
+
+
+def test_infeasible_limits():
+    """Too few days for the daily limit, or no driving times, are errors"""
+    with pytest.raises(ValueError):
+        itinerary.optimize_itinerary(ROUTE, datetime(2023, 5, 1), datetime(2023, 5, 2),
+                                     times=ROUTE_TIMES, num_days=2, max_drive_hours=8)
+    with pytest.raises(ValueError):
+        itinerary.optimize_itinerary(ROUTE, datetime(2023, 5, 1), datetime(2023, 5, 2))
+    result = itinerary.optimize_itinerary(ROUTE, datetime(2023, 5, 1), datetime(2023, 5, 1),
+                                          total_time=40 * 3600, max_drive_hours=10)
+    assert len(result.days) == 4
+    assert all(day.drive_hours == pytest.approx(10) for day in result.days)
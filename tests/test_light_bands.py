@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from astral import Observer
+import instrumentation
+import light_bands
+import main
+from boundary_solver import band_segments, golden_hour_segments
+from light_bands import Band, PRESETS
+
+ALL = tuple(PRESETS.values())
+
+
+@pytest.mark.parametrize("latitude", [0, 45, 63.4, 70, 78])
+def test_bands_match_separate_searches(latitude):
+    """One search for every band gives the segments of one search per band"""
+    observer = Observer(latitude=latitude, longitude=12)
+    for date in (datetime(2023, 3, 1), datetime(2023, 6, 21), datetime(2023, 11, 5)):
+        edges = [(band.min_elevation, band.max_elevation) for band in ALL]
+        together = band_segments(observer, date, edges)
+        for (low, high), segments in zip(edges, together):
+            separate = golden_hour_segments(observer, date, low, high)
+            assert len(segments) == len(separate)
+            for (a, b), (c, d) in zip(segments, separate):
+                assert abs(a - c) <= timedelta(seconds=2) and abs(b - d) <= timedelta(seconds=2)
+
+
+def test_band_durations_match_solar_engine():
+    """The vectorized bands agree with golden_hour_durations band by band"""
+    import solar_engine
+    dates = np.arange("2023-01-01", "2023-12-31", 7, dtype="datetime64[D]")
+    latitudes = [30.0, 60.0, 69.6]
+    hours = light_bands.band_durations(dates, latitudes, ALL)
+    assert hours.shape == (len(ALL), len(dates), len(latitudes))
+    for b, band in enumerate(ALL):
+        expected = solar_engine.golden_hour_durations(dates, latitudes, 0.0,
+                                                      band.min_elevation, band.max_elevation)
+        np.testing.assert_allclose(hours[b], expected, atol=1e-3)
+
+
+def test_five_bands_cost_less_than_separate_searches(tmp_path, monkeypatch):
+    """Extra bands only add crossing refinement, not another sample grid"""
+    monkeypatch.setenv(instrumentation.DIR_ENV_VAR, str(tmp_path))
+    observer = Observer(latitude=60, longitude=10)
+    edges = [(b.min_elevation, b.max_elevation) for b in ALL]
+    counts = []
+    for searches in ([edges], [[edge] for edge in edges]):
+        instrumentation.reset()
+        instrumentation.enable()
+        try:
+            for day in range(1, 15):
+                for bands in searches:
+                    band_segments(observer, datetime(2023, 4, day), bands)
+            counts.append(instrumentation.snapshot()["counters"]["elevation"])
+        finally:
+            instrumentation.disable()
+            instrumentation.reset()
+    assert counts[0] < 0.5 * counts[1]
+
+
+def test_segments_by_name_and_parsing():
+    """Results are GoldenHours keyed by band name; bands parse from text"""
+    result = light_bands.band_segments(datetime(2023, 6, 21), 45,
+                                       [PRESETS["blue"], PRESETS["golden"]])
+    assert list(result) == ["blue", "golden"]
+    blue, golden = result["blue"], result["golden"]
+    assert [kind for _, _, kind in blue.segments] == ["morning", "evening"]
+    assert blue["morning_end"] == pytest.approx(golden["morning_start"],
+                                                abs=timedelta(seconds=2))
+
+    assert light_bands.parse_band("civil") == PRESETS["civil"]
+    assert light_bands.parse_band("low:-2:3") == Band("low", -2.0, 3.0)
+    assert light_bands.parse_band("-2:3") == Band("-2:3", -2.0, 3.0)
+    for bad in ("purple", "x:3:-2", "x:a:b"):
+        with pytest.raises(ValueError):
+            light_bands.parse_band(bad)
+    with pytest.raises(ValueError):
+        light_bands.validate_bands([PRESETS["blue"], PRESETS["blue"]])
+
+
+def test_main_writes_a_row_per_band(tmp_path):
+    """--bands gives each date one row per band, from either engine"""
+    args = main.parse_args(["--latitudes", "60", "70", "--bands", "golden", "blue",
+                            "--year", "2024"])
+    assert [band.name for band in args.settings.bands] == ["golden", "blue"]
+    with pytest.raises(SystemExit):
+        main.parse_args(["--bands", "golden", "--min-elevation", "-6"])
+
+    output = tmp_path / "bands.csv"
+    main.main(mode="serial", chunk_days=200, output=str(output), latitudes=[60, 70],
+              settings=args.settings)
+    lines = output.read_text(encoding="utf-8").splitlines()
+    assert lines[0] == "Date,Band,60°,70°"
+    assert len(lines) == 1 + 2 * 366
+    assert lines[1].startswith("2024-01-01,golden,") and lines[2].startswith("2024-01-01,blue,")
+    golden = main.twilight_hours_day(70, datetime(2024, 1, 1))
+    assert lines[1].split(",")[3] == str(golden)
+
+    year = main.twilight_hours_year(60, "numpy", args.settings)
+    assert len(year) == 366 and len(year[0][2]) == 2
+    assert year[0][2][0] == pytest.approx(float(lines[1].split(",")[2]), abs=0.02)
@@ -0,0 +1,92 @@
+import pytest
+import random
+import numpy as np
+from datetime import datetime, timedelta
+from astral import Observer
+from boundary_solver import golden_hour_segments
+import lookup_table
+from lookup_table import GoldenHourTable
+
+
+@pytest.fixture(scope="module")
+def table(tmp_path_factory):
+    """A small table around the Arctic Circle, saved and memory-mapped back"""
+    path = str(tmp_path_factory.mktemp("table") / "table.npy")
+    GoldenHourTable.build(63.0, 69.0, 0.1).save(path)
+    return GoldenHourTable.load(path)
+
+
+def test_interpolation_error_bound(table):
+    """Trusted interpolations are within MAX_ERROR_MINUTES of the exact times"""
+    rng = random.Random(1)
+    checked = 0
+    for _ in range(150):
+        latitude = rng.uniform(63.0, 69.0)
+        date = datetime(2022, 1, 1) + timedelta(days=rng.randrange(3 * 365))
+        hours, boundaries, safe = table.query(date, latitude)
+        if not safe:
+            continue
+        checked += 1
+        segments = golden_hour_segments(Observer(latitude=latitude, longitude=0), date)
+        exact = [t for segment in segments for t in segment]
+        day_start = datetime.combine(date, datetime.min.time())
+        interpolated = [day_start + timedelta(minutes=float(m))
+                        for m in boundaries if not np.isnan(m)]
+        assert len(interpolated) == len(exact)
+        for a, b in zip(interpolated, exact):
+            assert abs((a - b).total_seconds()) / 60 <= lookup_table.MAX_ERROR_MINUTES
+    assert checked > 100
+
+
+def test_polar_transition_falls_back_to_exact(table):
+    """Where morning and evening golden hour merge the exact solver is used"""
+    # Mid-May at 66.6N the two segments join up across midnight
+    date, latitude = datetime(2023, 5, 16), 66.6
+    _, _, safe = table.query(date, latitude)
+    assert not safe
+    segments = golden_hour_segments(Observer(latitude=latitude, longitude=0), date)
+    times = [t for segment in segments for t in segment]
+    result = table.golden_hours(date, latitude)
+    assert [t for t in result.values() if t] == times[:4]
+
+
+def test_range_query_matches_exact(table):
+    """Vectorized durations over a date range match the exact solver"""
+    dates = np.arange(np.datetime64('2024-01-01'), np.datetime64('2025-01-01'))
+    hours = table.durations(dates, 65.5)
+    for i in range(0, len(dates), 17):
+        date = dates[i].astype(datetime)
+        segments = golden_hour_segments(Observer(latitude=65.5, longitude=0), date)
+        expected = sum((end - start).total_seconds() for start, end in segments) / 3600
+        assert hours[i] == pytest.approx(expected, abs=1 / 60)
+
+
+def test_outside_table_falls_back(table):
+    """Latitudes outside the table are computed exactly"""
+    _, _, safe = table.query(datetime(2023, 6, 21), 45)
+    assert not safe
+    result = table.golden_hours(datetime(2023, 6, 21), 45)
+    assert result['morning_start'] < result['morning_end']
+
+
+def test_calculate_golden_hours_table_engine(table, monkeypatch):
+    """idealtrip can answer from the table, and says so when it's missing"""
+    from idealtrip import calculate_golden_hours
+    monkeypatch.setattr(lookup_table, "_default_table", {"table": table})
+    monkeypatch.setattr(lookup_table, "default_path", lambda: "table")
+    date = datetime(2023, 8, 1)
+    result = calculate_golden_hours(date, 65.0, engine="table")
+    exact = calculate_golden_hours(date, 65.0)
+    for key in exact:
+        assert abs(result[key] - exact[key]) <= timedelta(minutes=lookup_table.MAX_ERROR_MINUTES)
+
+    monkeypatch.setattr(lookup_table, "_default_table", {"table": None})
+    with pytest.raises(FileNotFoundError):
+        calculate_golden_hours(date, 65.0, engine="table")
+
+
+def test_default_table_follows_the_cache_directory(tmp_path, monkeypatch):
+    """The default table lives in GOLDENHOUR_CACHE_DIR, so tests don't see a local one"""
+    monkeypatch.setenv("GOLDENHOUR_CACHE_DIR", str(tmp_path))
+    assert lookup_table.default_path() == str(tmp_path / "golden_hour_table.npy")
+    assert lookup_table.default_table() is None
@@ -1,3 +1,4 @@
+import os
 import pytest
 from datetime import datetime
 from main import twilight_hours_day, twilight_hours_year, process_latitude
@@ -39,3 +40,93 @@ def test_invalid_date_type():
     """Test handling of invalid date type"""
     with pytest.raises(TypeError):
         twilight_hours_day(45, "2023-06-21")
+
+def test_make_tasks_dedupes_and_chunks():
+    """Duplicate latitudes are computed once and years split into chunks"""
+    from main import make_tasks
+    tasks = make_tasks([70.2, 60, 70.2], num_days=365, chunk_days=100)
+    assert tasks == [(70.2, 0, 100), (60, 0, 100), (70.2, 100, 100), (60, 100, 100),
+                     (70.2, 200, 100), (60, 200, 100), (70.2, 300, 65), (60, 300, 65)]
+    assert make_tasks([60], chunk_days=100, first_day=250) == [(60, 250, 100), (60, 350, 15)]
+    with pytest.raises(ValueError):
+        make_tasks([60], chunk_days=0)
+
+def test_run_tasks_modes_agree():
+    """Serial and thread pool runs give the same rows"""
+    from main import make_tasks, run_tasks
+    tasks = make_tasks([45, 70.2], num_days=6, chunk_days=4)
+    serial = sorted(row for result in run_tasks(tasks, "serial") for row in result[1])
+    threaded = sorted(row for result in run_tasks(tasks, "thread", workers=2) for row in result[1])
+    assert serial == threaded
+    assert len(serial) == 12
+    with pytest.raises(ValueError):
+        list(run_tasks(tasks, "gpu"))
+
+def test_main_streams_and_resumes(tmp_path, monkeypatch):
+    """An interrupted output file is completed to match a fresh run"""
+    import main
+    monkeypatch.setattr(main, "DESIRED_LATITUDES", [45, 60, 45])
+    fresh = tmp_path / "fresh.csv"
+    main.main(mode="serial", chunk_days=50, output=str(fresh))
+    lines = fresh.read_text().splitlines(keepends=True)
+    assert len(lines) == 366
+    assert lines[0].startswith("Date,45\u00B0,60\u00B0,45\u00B0")
+    
+    # Keep the header, 100 dates and half of the next line
+    partial = tmp_path / "partial.csv"
+    partial.write_text("".join(lines[:101]) + lines[101][:8])
+    main.main(mode="serial", chunk_days=50, output=str(partial), resume=True)
+    assert partial.read_text() == fresh.read_text()
+
+def test_main_columnar_matches_csv(tmp_path, monkeypatch):
+    """NPZ output holds the same durations as the CSV"""
+    import csv
+    import main
+    from duration_output import read_columnar
+    monkeypatch.setattr(main, "DESIRED_LATITUDES", [45, 60])
+    main.main(mode="serial", chunk_days=100, output=str(tmp_path / "out.csv"))
+    main.main(mode="serial", chunk_days=100, output=str(tmp_path / "out.npz"),
+              output_format="npz")
+    with open(tmp_path / "out.csv", newline='') as file:
+        rows = list(csv.reader(file))[1:]
+    grid = read_columnar(str(tmp_path / "out.npz"))
+    assert [str(date) for date in grid.dates] == [row[0] for row in rows]
+    expected = [[float(v) for v in row[1:]] for row in rows]
+    assert grid.hours().ravel().tolist() == pytest.approx(sum(expected, []), abs=1e-6)
+
+def test_parse_args_latitude_sources(tmp_path):
+    """Latitudes come from a list, a range or a file"""
+    from main import parse_args, DESIRED_LATITUDES
+    args = parse_args(["--lat-range", "60", "61", "0.25", "--year", "2024",
+                       "--longitude", "15", "--min-elevation", "-6", "--precision", "0.5"])
+    assert args.latitudes == [60, 60.25, 60.5, 60.75, 61]
+    assert args.settings == (2024, 15, -6, 6, 0.5, None, ())
+    assert parse_args(["--latitudes", "45", "-30.5"]).latitudes == [45, -30.5]
+    assert parse_args([]).latitudes is None
+
+    latitude_file = tmp_path / "latitudes.txt"
+    latitude_file.write_text("# trip\n59.91\n\n70.2°\n", encoding="utf-8")
+    assert parse_args(["--lat-file", str(latitude_file)]).latitudes == [59.91, 70.2]
+    trip_file = os.path.join(os.path.dirname(__file__), "..", "data_input", "latitude_dates.csv")
+    result = parse_args(["--lat-file", trip_file]).latitudes
+    assert result[:2] == DESIRED_LATITUDES[:2]
+
+    for bad in (["--latitudes", "91"], ["--lat-range", "60", "70", "0"],
+                ["--min-elevation", "7"], ["--longitude", "200"], ["--precision", "0"]):
+        with pytest.raises(SystemExit):
+            parse_args(bad)
+
+def test_main_leap_year_and_settings(tmp_path):
+    """A leap year gets all 366 days and the settings reach the workers"""
+    import main
+    output = tmp_path / "leap.csv"
+    settings = main.RunSettings(year=2024, longitude=90, min_elevation=-6, max_elevation=6)
+    main.main(mode="serial", chunk_days=100, output=str(output), latitudes=[45],
+              settings=settings)
+    lines = output.read_text().splitlines()
+    assert len(lines) == 367
+    assert lines[1].startswith("2024-01-01,") and lines[-1].startswith("2024-12-31,")
+    
+    expected = main.twilight_hours_day(45, datetime(2024, 2, 29), 90, -6, 6)
+    assert lines[60] == f"2024-02-29,{expected}"
+    assert expected > twilight_hours_day(45, datetime(2024, 2, 29))
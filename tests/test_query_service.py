@@ -0,0 +1,105 @@
+import asyncio
+import json
+from datetime import datetime
+import pytest
+from astral import Observer
+import east_west_rise_set
+import main
+from light_bands import PRESETS
+import query_service
+from bench import load_test
+from idealtrip import calculate_golden_hours
+from query_service import QueryService
+
+
+def run_service(session, **options):
+    """Run session(service, port) against a service started on a free port"""
+    async def wrapper():
+        service = QueryService(port=0, **{"mode": "thread", "workers": 2, **options})
+        port = await service.start()
+        try:
+            return await session(service, port)
+        finally:
+            await service.close()
+    return asyncio.run(wrapper())
+
+
+def test_endpoints_answer_like_the_library():
+    """Each endpoint returns the library's answer; errors are JSON with a status"""
+    async def session(service, port):
+        reader, writer = await asyncio.open_connection(query_service.HOST, port)
+        replies = []
+        for target in ("/golden_hours?date=2023-03-26&latitude=59.9&longitude=10.7"
+                       "&tz=Europe/Oslo",
+                       "/durations?latitude=66.5&year=2024&bands=golden,blue",
+                       "/azimuth?latitude=40.78&longitude=-73.97&target=299&event=set"
+                       "&year=2023",
+                       "/golden_hours?date=2023-03-26&latitude=95",
+                       "/golden_hours?latitude=45",
+                       "/durations?latitude=60&bands=purple",
+                       "/nowhere"):
+            status, body = await load_test.fetch(reader, writer, target)
+            replies.append((status, json.loads(body)))
+        writer.close()
+        return replies
+
+    replies = run_service(session)
+    status, golden = replies[0]
+    expected = calculate_golden_hours(datetime(2023, 3, 26), 59.9, longitude=10.7,
+                                      tz="Europe/Oslo")
+    assert status == 200
+    assert [(s["start"], s["end"], s["kind"]) for s in golden["segments"]] == \
+        [(start.isoformat(), end.isoformat(), kind) for start, end, kind in expected.segments]
+
+    status, durations = replies[1]
+    year = main.twilight_hours_year(66.5, "numpy", main.RunSettings(
+        year=2024, bands=(PRESETS["golden"], PRESETS["blue"])))
+    assert durations["bands"] == ["golden", "blue"]
+    assert durations["hours"] == [row[2] for row in year] and len(durations["dates"]) == 366
+
+    status, azimuth = replies[2]
+    days = east_west_rise_set.azimuth_crossings(Observer(40.78, -73.97), 299, "set", 2023)
+    assert [c["date"] for c in azimuth["crossings"]] == \
+        [day.date.strftime("%Y-%m-%d") for day in days]
+
+    assert [status for status, _ in replies[3:]] == [400, 400, 400, 404]
+    assert "Latitude" in replies[3][1]["error"] and "date" in replies[4][1]["error"]
+
+
+@pytest.mark.parametrize("mode", ["serial", "thread"])
+def test_concurrent_requests_are_batched_and_cached(mode):
+    """A burst goes to the pool in a few batches, duplicates share one calculation"""
+    async def session(service, port):
+        queries = [{"date": f"2023-06-{day:02d}", "latitude": "62"} for day in range(1, 21)]
+        first = await asyncio.gather(*[service.query("/golden_hours", q)
+                                       for q in queries * 3])
+        stats = service.statistics()
+        again = await asyncio.gather(*[service.query("/golden_hours", q) for q in queries])
+        return first, stats, again, service.statistics()
+
+    first, stats, again, after = run_service(session, mode=mode, batch_window=0.05)
+    assert all(status == 200 for status, _ in first)
+    assert first[:20] == first[20:40] == again
+    assert stats["calculated"] == 20 and stats["shared"] == 40
+    assert stats["batches"] <= 2
+    assert after["cache_hits"] == 20 and after["calculated"] == 20
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """The in-memory cache keeps the most recently used responses"""
+    cache = query_service.LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and len(cache) == 2
+
+
+def test_load_test_against_localhost(tmp_path):
+    """The load test starts the service, answers every request and records the run"""
+    output = tmp_path / "load.json"
+    assert load_test.main(["--requests", "300", "--concurrency", "8", "--mode", "thread",
+                           "--workers", "2", "--output", str(output)]) == 0
+    result = json.loads(output.read_text())["load_test"]
+    assert result["requests"] == 300 and result["statuses"] == {"200": 300}
+    assert result["per_second"] > 0
@@ -0,0 +1,77 @@
+import pytest
+from datetime import datetime
+import result_cache
+from result_cache import ResultCache
+from main import twilight_hours_day
+from idealtrip import calculate_golden_hours
+
+
+def test_get_put_counts_hits_and_misses(tmp_path):
+    """Misses are counted until a value is stored"""
+    cache = ResultCache(str(tmp_path / "cache.sqlite"))
+    assert cache.get("f", (1, 2)) is None
+    cache.put("f", (1, 2), {"hours": 1.5})
+    assert cache.get("f", (1, 2)) == {"hours": 1.5}
+    assert cache.get("f", (1, 3)) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_lru_eviction(tmp_path):
+    """The least recently used entries are dropped first"""
+    cache = ResultCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.put("f", (1,), 1)
+    cache.put("f", (2,), 2)
+    cache.get("f", (1,))
+    cache.put("f", (3,), 3)
+    assert cache.evict() == 1
+    assert len(cache) == 2
+    assert cache.get("f", (2,)) is None
+    assert cache.get("f", (1,)) == 1
+
+
+def test_version_change_invalidates(tmp_path, monkeypatch):
+    """Bumping ALGORITHM_VERSION clears old results"""
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(path)
+    cache.put("f", (1,), 1)
+    cache.close()
+    monkeypatch.setattr(result_cache, "ALGORITHM_VERSION", "test")
+    assert len(ResultCache(path)) == 0
+
+
+def test_functions_use_cache():
+    """Second identical call is served from the cache"""
+    date = datetime(2023, 6, 21)
+    cache = result_cache.get_cache()
+    first = twilight_hours_day(45, date)
+    assert twilight_hours_day(45.0, date) == first
+    times = calculate_golden_hours(date, 45)
+    assert calculate_golden_hours(date, 45) == times
+    assert cache.hits == 2 and cache.misses == 2
+
+
+def test_cache_can_be_disabled(monkeypatch):
+    """GOLDENHOUR_CACHE=0 turns the cache off"""
+    monkeypatch.setenv("GOLDENHOUR_CACHE", "0")
+    assert result_cache.get_cache() is None
+    assert twilight_hours_day(45, datetime(2023, 6, 21)) > 0
+
+
+def test_thread_pool_connections_close_with_their_threads():
+    """Each pool thread gets its own cache, which is closed once the pool is gone"""
+    import gc
+    import weakref
+    from multiprocessing.pool import ThreadPool
+    main_cache = result_cache.get_cache()
+    opened = []
+    for _ in range(3):
+        with ThreadPool(4) as pool:
+            caches = pool.map(lambda _: result_cache.get_cache(), range(16))
+            pool.close()
+            pool.join()
+        assert main_cache not in caches and len(set(map(id, caches))) <= 4
+        opened += [weakref.ref(cache) for cache in caches]
+        del caches
+    gc.collect()
+    assert not [ref for ref in opened if ref() is not None]
+    assert result_cache.get_cache() is main_cache
@@ -0,0 +1,149 @@
+import math
+import random
+import pytest
+
+nx = pytest.importorskip("networkx")
+import routing
+
+
+def grid_graph(size=12, seed=3):
+    """Synthetic road grid near Tromsø with random speeds and a few one-way streets"""
+    rng = random.Random(seed)
+    graph = nx.MultiDiGraph()
+    for i in range(size):
+        for j in range(size):
+            graph.add_node(i * size + j, y=69.6 + i * 0.005, x=18.9 + j * 0.01)
+    for i in range(size):
+        for j in range(size):
+            node = i * size + j
+            for di, dj in ((0, 1), (1, 0)):
+                if i + di >= size or j + dj >= size:
+                    continue
+                other = (i + di) * size + j + dj
+                a, b = graph.nodes[node], graph.nodes[other]
+                length = float(routing.haversine(a["y"], a["x"], b["y"], b["x"])) * 1.1
+                speed = rng.choice([8.3, 13.9, 22.2])
+                graph.add_edge(node, other, length=length, travel_time=length / speed)
+                if rng.random() > 0.1:
+                    graph.add_edge(other, node, length=length, travel_time=length / speed)
+    # a slower parallel edge, as in OSM multigraphs
+    graph.add_edge(0, 1, length=1000.0, travel_time=500.0)
+    return graph
+
+
+def test_methods_agree_with_networkx():
+    """Every method finds a fastest path whose cost matches networkx"""
+    graph = grid_graph()
+    rng = random.Random(7)
+    for _ in range(20):
+        source, target = rng.sample(list(graph.nodes), 2)
+        expected = nx.shortest_path_length(graph, source, target, weight="travel_time")
+        for method in routing.METHODS:
+            leg = routing.shortest_leg(graph, source, target, method)
+            assert leg.cost == pytest.approx(expected)
+            assert leg.nodes[0] == source and leg.nodes[-1] == target
+            assert nx.path_weight(graph, leg.nodes, "travel_time") == pytest.approx(expected)
+    with pytest.raises(ValueError):
+        routing.shortest_leg(graph, 0, 1, "teleport")
+
+
+def test_route_joins_legs():
+    """A multi-stop route visits the nearest nodes in order without repeating junctions"""
+    graph = grid_graph()
+    stops = [(69.6, 18.9), (69.65, 18.95), (69.601, 19.01)]
+    result = routing.route(graph, stops)
+    assert len(result.legs) == 2
+    assert result.nodes[0] == 0 and result.nodes[-1] == 11
+    assert len(result.nodes) == sum(len(leg.nodes) for leg in result.legs) - 1
+    assert result.total_time == pytest.approx(sum(leg.cost for leg in result.legs))
+    assert result.coordinates[0] == [69.6, 18.9]
+
+
+def test_graph_cache_round_trip(tmp_path):
+    """The graph is downloaded once per snapped bounding box and reloaded afterwards"""
+    downloads = []
+
+    def fake_download(bbox, network_type):
+        downloads.append((bbox, network_type))
+        return grid_graph(4)
+
+    stops = [(69.6512, 18.9554), (69.6801, 18.9712)]
+    first = routing.load_graph(stops, directory=str(tmp_path), download=fake_download)
+    nearby = [(69.6513, 18.9555), (69.6802, 18.9713)]
+    second = routing.load_graph(nearby, directory=str(tmp_path), download=fake_download)
+    assert len(downloads) == 1
+    north, south, east, west = downloads[0][0]
+    assert north >= 69.6801 + routing.MARGIN and south <= 69.6512 - routing.MARGIN
+    assert east >= 18.9712 + routing.MARGIN and west <= 18.9554 - routing.MARGIN
+    assert nx.utils.graphs_equal(first, second)
+    routing.load_graph(stops, network_type="walk", directory=str(tmp_path),
+                       download=fake_download)
+    assert len(downloads) == 2
+
+
+@pytest.mark.parametrize("mode", ["serial", "thread", "process"])
+def test_leg_matrix_matches_pairwise(mode):
+    """Each row comes from one search and matches pairwise shortest paths"""
+    graph = grid_graph(8)
+    nodes = [0, 9, 27, 63, 40]
+    graph.add_node(999, y=70.0, x=19.0)  # unreachable
+    matrix = routing.leg_matrix(graph, nodes + [999], mode=mode, workers=3)
+    for i, source in enumerate(nodes):
+        for j, target in enumerate(nodes):
+            expected = nx.shortest_path_length(graph, source, target, weight="travel_time")
+            assert matrix[i][j] == pytest.approx(expected)
+        assert matrix[i][-1] == math.inf
+    assert matrix[-1][:-1] == [math.inf] * len(nodes)
+
+
+def test_split_points_follow_edge_travel_times():
+    """Splits are placed by cumulative travel time, interpolated inside an edge"""
+    coordinates = [[60.0, 10.0], [61.0, 10.0], [62.0, 10.0], [63.0, 10.0]]
+    times = [0.0, 100.0, 700.0, 800.0]  # the middle edge is slow
+    points = routing.split_points(coordinates, times, 4)
+    assert [p.time for p in points] == [200.0, 400.0, 600.0]
+    assert [p.index for p in points] == [1, 1, 1]
+    assert [p.latitude for p in points] == pytest.approx([61 + 1 / 6, 61.5, 61 + 5 / 6])
+
+    sections = routing.split_sections(coordinates, times, 2)
+    assert sections == [[[60.0, 10.0], [61.0, 10.0], [61.5, 10.0]],
+                        [[61.5, 10.0], [62.0, 10.0], [63.0, 10.0]]]
+    # a split exactly on a node isn't repeated
+    assert routing.split_sections(coordinates, [0.0, 1.0, 2.0, 3.0], 3) == [
+        coordinates[:2], coordinates[1:3], coordinates[2:]]
+    assert routing.split_sections(coordinates, times, 1) == [coordinates]
+    with pytest.raises(ValueError):
+        routing.split_points(coordinates, times, 0)
+
+
+def test_split_points_match_linear_scan():
+    """Binary search gives the same split edges as walking the route"""
+    graph = grid_graph()
+    result = routing.route(graph, [(69.6, 18.9), (69.655, 19.01), (69.62, 18.93)])
+    assert result.times[-1] == pytest.approx(result.total_time)
+    assert result.times == sorted(result.times)
+    for sections in (2, 5, 9):
+        for k, point in enumerate(routing.split_points(result.coordinates, result.times,
+                                                       sections), 1):
+            target = result.total_time * k / sections
+            scan = next(i for i in range(len(result.times) - 1)
+                        if result.times[i] <= target < result.times[i + 1])
+            assert point.index == scan
+            assert point.time == pytest.approx(target)
+
+
+def test_latitude_dates_file(tmp_path):
+    """Daily latitudes are written like data_input/latitude_dates.csv"""
+    from datetime import datetime
+    coordinates = [[59.91, 10.75], [63.43, 10.39], [69.65, 18.96]]
+    times = [0.0, 30_000.0, 90_000.0]
+    rows = routing.latitude_dates(coordinates, times, 3, datetime(2023, 5, 11))
+    assert rows == [(datetime(2023, 5, 11), 63.43), (datetime(2023, 5, 12), 66.54),
+                    (datetime(2023, 5, 13), 69.65)]
+    start = routing.latitude_dates(coordinates, times, 3, datetime(2023, 5, 11), position=0)
+    assert [latitude for _, latitude in start] == [59.91, 63.43, 66.54]
+
+    path = tmp_path / "latitude_dates.csv"
+    routing.write_latitude_dates(rows, str(path))
+    assert path.read_bytes() == ("Date,Latitude\n2023-05-11,63.43°\n2023-05-12,66.54°\n"
+                                 "2023-05-13,69.65°\n").encode("utf-8-sig")
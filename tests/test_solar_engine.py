@@ -0,0 +1,85 @@
+import pytest
+import random
+import numpy as np
+from datetime import datetime, timedelta
+from astral import Observer
+from astral.sun import elevation
+import solar_engine
+from boundary_solver import golden_hour_segments
+from idealtrip import calculate_golden_hours
+from main import twilight_hours_year
+
+LATITUDES = [-89.9, -60, -23.4, 0, 33.3, 59.91, 70.2, 85, 89.9]
+
+
+@pytest.mark.parametrize("with_refraction", [True, False])
+def test_elevation_matches_astral(with_refraction):
+    """Elevation matrix stays within MAX_ERROR_ARCSEC of astral"""
+    rng = random.Random(0)
+    times = [datetime(2023, 1, 1) + timedelta(seconds=rng.randrange(3 * 365 * 86400))
+             for _ in range(200)]
+    longitudes = np.linspace(-170, 170, len(LATITUDES))
+    result = solar_engine.elevation_matrix(
+        np.array(times, dtype='datetime64[s]'), LATITUDES, longitudes, with_refraction
+    )
+    assert result.shape == (len(times), len(LATITUDES))
+
+    worst = 0.0
+    for i, time in enumerate(times):
+        for j, (lat, lon) in enumerate(zip(LATITUDES, longitudes)):
+            expected = elevation(Observer(latitude=lat, longitude=lon), time, with_refraction)
+            worst = max(worst, abs(expected - result[i, j]) * 3600)
+    assert worst < solar_engine.MAX_ERROR_ARCSEC
+
+
+def test_segments_match_boundary_solver():
+    """Vectorized crossings agree with the scalar solver to within seconds"""
+    dates = [datetime(2023, 1, 1) + timedelta(days=d) for d in range(0, 365, 29)]
+    result = solar_engine.golden_hour_segments(dates, LATITUDES)
+    for d, date in enumerate(dates):
+        for j, lat in enumerate(LATITUDES):
+            expected = golden_hour_segments(Observer(latitude=lat, longitude=0), date)
+            assert len(result[d][j]) == len(expected)
+            for (start, end), (exp_start, exp_end) in zip(result[d][j], expected):
+                assert abs(start - exp_start) <= timedelta(seconds=5)
+                assert abs(end - exp_end) <= timedelta(seconds=5)
+
+
+def test_durations_match_segments():
+    """Durations are the summed length of the segments"""
+    dates = np.arange(np.datetime64('2023-03-01'), np.datetime64('2023-04-01'))
+    hours = solar_engine.golden_hour_durations(dates, LATITUDES)
+    segments = solar_engine.golden_hour_segments(dates, LATITUDES)
+    for d in range(len(dates)):
+        for j in range(len(LATITUDES)):
+            expected = sum((end - start).total_seconds() for start, end in segments[d][j]) / 3600
+            assert hours[d, j] == pytest.approx(expected, abs=1e-3)
+
+
+def test_twilight_hours_year_engines_agree():
+    """main.twilight_hours_year gives the same table with either engine"""
+    scalar = twilight_hours_year(70.2)
+    vectorized = twilight_hours_year(70.2, engine="numpy")
+    assert [row[0] for row in scalar] == [row[0] for row in vectorized]
+    for a, b in zip(scalar, vectorized):
+        assert a[2] == pytest.approx(b[2], abs=0.011)
+
+
+def test_calculate_golden_hours_numpy_engine():
+    """idealtrip.calculate_golden_hours runs on the NumPy engine"""
+    date = datetime(2023, 6, 21)
+    scalar = calculate_golden_hours(date, 45)
+    vectorized = calculate_golden_hours(date, 45, engine="numpy")
+    for key, value in scalar.items():
+        assert abs(vectorized[key] - value) <= timedelta(seconds=5)
+    with pytest.raises(ValueError):
+        calculate_golden_hours(date, 45, engine="gpu")
+
+
+def test_geometric_elevation_inverts_refraction():
+    """Geometric thresholds plus refraction give back the apparent elevation"""
+    for apparent in np.arange(-18.0, 12.0, 0.25):
+        geometric = solar_engine.geometric_elevation(apparent)
+        assert geometric <= apparent
+        assert geometric + float(solar_engine.refraction(geometric)) == \
+            pytest.approx(apparent, abs=1e-4)
@@ -0,0 +1,35 @@
+import os
+import pytest
+import cpus
+from bench import startup
+
+
+@pytest.mark.parametrize("entry_point", sorted(startup.BUDGETS_MS))
+def test_entry_points_defer_heavy_imports(entry_point):
+    """No entry point imports the optional dependencies (or NumPy, where it can) at startup"""
+    assert startup.eager_imports(entry_point) == []
+
+
+@pytest.mark.parametrize("query", ["2023-06-01, 2023-06-10, 45",
+                                   "2023-06-01, 2023-06-03, 61.2, -149.9, America/Anchorage"])
+def test_first_query_without_a_table_needs_no_numpy(query):
+    """GH_daterange answers from boundary_solver without loading NumPy when there's no table"""
+    then = (f"query = GH_daterange.parse_query({query!r})\n"
+            "assert len(GH_daterange.cached_range(*query)) > 1")
+    assert startup.eager_imports("GH_daterange", then) == []
+
+
+def test_check_rejects_unknown_entry_points():
+    with pytest.raises(ValueError):
+        startup.check(["nowhere"])
+
+
+def test_workers_follow_the_affinity_mask(monkeypatch):
+    """Pools are sized from the CPUs the process may use, not the machine's"""
+    if not hasattr(os, "sched_getaffinity"):
+        pytest.skip("no CPU affinity on this platform")
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: {0, 1, 2, 3, 4})
+    assert cpus.available_cpus() == 5
+    assert cpus.default_workers() == 4
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: {0})
+    assert cpus.default_workers() == 1
@@ -1,99 +1,68 @@
-import osmnx as ox
-import networkx as nx
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut
+from datetime import datetime
 from typing import List, Tuple
-import folium
-import time
-import requests
 import os
-from dotenv import load_dotenv
+import geocoding
+import routing
 
-# Load environment variables
-load_dotenv()
+# folium (maps) and python-dotenv (.env files) are imported when they're
+# first needed, so importing this module doesn't pay for them
 GEOCODING_API_KEY = os.getenv('GEOCODING_API_KEY')
 
-def get_coordinates(addresses: List[str]) -> List[Tuple[float, float]]:
-    """Get coordinates for a list of addresses using OpenStreetMap."""
-    coordinates = []
-    geolocator = Nominatim(user_agent="goldenhour_v2_trip_planner/1.0 (your@email.com)")
-    
-    for address in addresses:
-        try:
-            # Rate limiting to comply with OSM usage policy
-            time.sleep(1)
-            location = geolocator.geocode(address)
-            
-            if location:
-                coordinates.append((location.latitude, location.longitude))
-            else:
-                raise ValueError(f"Could not find coordinates for address: {address}")
-                
-        except GeocoderTimedOut:
-            print(f"Timeout for address: {address}, retrying...")
-            time.sleep(2)
-            try:
-                location = geolocator.geocode(address)
-                if location:
-                    coordinates.append((location.latitude, location.longitude))
-            except Exception as e:
-                raise Exception(f"Failed to geocode address after retry: {address}") from e
-        except Exception as e:
-            raise Exception(f"Error geocoding address {address}: {str(e)}") from e
-            
-    return coordinates
+def load_environment():
+    """Load variables from a .env file, if python-dotenv is installed."""
+    global GEOCODING_API_KEY
+    try:
+        from dotenv import load_dotenv
+    except ImportError:  # .env support is optional
+        return
+    load_dotenv()
+    GEOCODING_API_KEY = os.getenv('GEOCODING_API_KEY')
 
-def get_route(coordinates: List[Tuple[float, float]]) -> Tuple[List[List[float]], float]:
-    """Find the route between coordinates and calculate total time."""
-    # Get road network for the area
-    G = ox.graph_from_points(coordinates, network_type='drive')
-    
-    # Convert coordinates to nearest nodes
-    nodes = []
-    for coord in coordinates:
-        node = ox.nearest_nodes(G, coord[1], coord[0])
-        nodes.append(node)
-    
-    # Get route between consecutive points
-    route_coords = []
-    total_time = 0
-    
-    for i in range(len(nodes)-1):
-        route = nx.shortest_path(G, nodes[i], nodes[i+1], weight='travel_time')
-        path_coords = [[G.nodes[node]['y'], G.nodes[node]['x']] for node in route]
-        route_coords.extend(path_coords)
-        
-        # Calculate time for this segment
-        segment_time = nx.shortest_path_length(G, nodes[i], nodes[i+1], weight='travel_time')
-        total_time += segment_time
-    
-    return route_coords, total_time
+def get_coordinates(addresses: List[str], backend=None) -> List[Tuple[float, float]]:
+    """
+    Get coordinates for a list of addresses using OpenStreetMap.
 
-def split_route(route_coords: List[List[float]], total_time: float, num_sections: int) -> List[List[List[float]]]:
-    """Split the route into sections with equal estimated driving time."""
-    time_per_section = total_time / num_sections
-    sections = []
-    current_section = []
-    current_time = 0
-    
-    for coord in route_coords:
-        current_section.append(coord)
-        # Approximate time based on position in route
-        current_time = (len(current_section) / len(route_coords)) * total_time
-        
-        if current_time >= time_per_section:
-            sections.append(current_section)
-            current_section = [coord]  # Start new section with overlap point
-            current_time = 0
-    
-    # Add any remaining coordinates to the last section
-    if current_section:
-        sections.append(current_section)
-    
-    return sections
+    Lookups are cached and rate limited by geocoding.geocode_addresses;
+    pass a backend (e.g. geocoding.GazetteerBackend) to geocode offline.
+    Raises ValueError naming every address that could not be geocoded.
+    """
+    results = geocoding.geocode_addresses(addresses, backend)
+    failures = [f"{result.address}: {result.error}" for result in results if not result.ok]
+    if failures:
+        raise ValueError("Could not geocode address(es):\n  " + "\n  ".join(failures))
+    return [result.coordinates for result in results]
+
+def get_route(coordinates: List[Tuple[float, float]],
+              method: str = "astar") -> Tuple[List[List[float]], float]:
+    """
+    Find the route between coordinates and calculate total time.
+
+    The road network comes from routing.load_graph, which downloads it only
+    once per area, and each leg is found with a single search (A* by default).
+    """
+    G = routing.load_graph(coordinates)
+    result = routing.route(G, coordinates, method)
+    return result.coordinates, result.total_time
+
+def split_route(route_coords: List[List[float]], total_time: float, num_sections: int,
+                times: List[float] = None) -> List[List[List[float]]]:
+    """
+    Split the route into sections with equal driving time.
+
+    times is the cumulative travel time at each point (routing.Route.times);
+    without it the time is assumed to be spread evenly over the points.
+    Split points are interpolated along the edge they fall on and shared by
+    the sections either side of them.
+    """
+    if times is None:
+        last = max(len(route_coords) - 1, 1)
+        times = [total_time * i / last for i in range(len(route_coords))]
+    return routing.split_sections(route_coords, times, num_sections)
 
 def visualize_route(sections: List[List[List[float]]], output_file: str = 'route_map.html'):
     """Create a folium map visualizing the split route."""
+    import folium
+    
     # Create map centered on first coordinate
     m = folium.Map(location=sections[0][0], zoom_start=12)
     
@@ -112,6 +81,8 @@ def visualize_route(sections: List[List[List[float]]], output_file: str = 'route
     m.save(output_file)
 
 def main():
+    load_environment()
+    
     # Example usage
     addresses = [
         "123 Main St, City, State",
@@ -119,20 +90,30 @@ def main():
         "789 Pine Rd, City, State"
     ]
     num_sections = 2
+    start_date = datetime(2023, 5, 11)
     
     # Get coordinates for addresses
     coordinates = get_coordinates(addresses)
     
-    # Get route and total time
-    route_coords, total_time = get_route(coordinates)
+    # Get route with the travel time to each point
+    route = routing.route(routing.load_graph(coordinates), coordinates)
     
     # Split route into sections
-    sections = split_route(route_coords, total_time, num_sections)
+    sections = split_route(route.coordinates, route.total_time, num_sections, route.times)
     
     # Visualize the route
     visualize_route(sections)
     
-    print(f"Route split into {num_sections} sections of approximately {total_time/num_sections:.2f} seconds each")
+    # Latitude at the end of each day's driving, for idealtrip.py
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    output_file = os.path.join(script_dir, 'data_output',
+                               f'latitude_dates_{datetime.now().strftime("%Y%m%d%H%M%S")}.csv')
+    routing.write_latitude_dates(
+        routing.latitude_dates(route.coordinates, route.times, num_sections, start_date),
+        output_file)
+    
+    print(f"Route split into {num_sections} sections of approximately {route.total_time/num_sections:.2f} seconds each")
+    print(f"Daily latitudes written to {output_file}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file